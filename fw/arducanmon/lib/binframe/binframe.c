@@ -0,0 +1,75 @@
+#include "binframe.h"
+
+#include <string.h>
+
+uint16_t binframe_crc16(const uint8_t *data, size_t len) {
+  // CRC-16/CCITT-FALSE, bitwise to keep the table out of the Uno's RAM
+  uint16_t crc = 0xFFFF;
+  for (size_t i = 0; i < len; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (uint8_t bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x8000) ? (uint16_t)((crc << 1) ^ 0x1021) : (uint16_t)(crc << 1);
+    }
+  }
+  return crc;
+}
+
+size_t binframe_cobs_encode(const uint8_t *in, size_t len, uint8_t *out) {
+  size_t write = 1;
+  size_t codeIdx = 0;
+  uint8_t code = 1;
+
+  for (size_t read = 0; read < len; read++) {
+    if (in[read] == 0) {
+      out[codeIdx] = code;
+      code = 1;
+      codeIdx = write++;
+    } else {
+      out[write++] = in[read];
+      code++;
+      if (code == 0xFF) {
+        out[codeIdx] = code;
+        code = 1;
+        codeIdx = write++;
+      }
+    }
+  }
+  out[codeIdx] = code;
+  return write;
+}
+
+static size_t finish(uint8_t *raw, size_t len, uint8_t *out) {
+  uint16_t crc = binframe_crc16(raw, len);
+  raw[len++] = crc & 0xFF;
+  raw[len++] = crc >> 8;
+
+  size_t n = binframe_cobs_encode(raw, len, out);
+  out[n++] = 0x00; // Delimitador de registro
+  return n;
+}
+
+size_t binframe_can(uint8_t type, uint32_t id, uint8_t dlc, const uint8_t *payload,
+                    uint32_t timestamp_us, uint8_t *out) {
+  uint8_t raw[1 + 4 + 1 + 8 + 4 + 2];
+  size_t len = 0;
+
+  if (dlc > 8) dlc = 8;
+  raw[len++] = type;
+  for (uint8_t i = 0; i < 4; i++) raw[len++] = (id >> (8 * i)) & 0xFF;
+  raw[len++] = dlc;
+  memcpy(&raw[len], payload, dlc);
+  len += dlc;
+  for (uint8_t i = 0; i < 4; i++) raw[len++] = (timestamp_us >> (8 * i)) & 0xFF;
+
+  return finish(raw, len, out);
+}
+
+size_t binframe_text(const char *text, uint8_t *out) {
+  uint8_t raw[BINFRAME_MAX_RAW];
+  size_t len = 0;
+
+  raw[len++] = BINFRAME_RECORD_TEXT;
+  while (*text && len < 1 + BINFRAME_MAX_TEXT) raw[len++] = (uint8_t)*text++;
+
+  return finish(raw, len, out);
+}
@@ -0,0 +1,43 @@
+// Binary output mode of arducanmon: COBS framed records with CRC-16.
+//
+// Raw record layout (little endian) before COBS encoding:
+//   CAN RX / CAN TX: type(1) id(4) dlc(1) payload(dlc) timestamp_us(4) crc16(2)
+//   Text:            type(1) text(n) crc16(2)
+// The CRC (CRC-16/CCITT-FALSE) covers every byte before it. Each encoded
+// record is terminated by a 0x00 delimiter, which COBS guarantees never
+// appears inside a record.
+#ifndef BINFRAME_H
+#define BINFRAME_H
+
+#include <stddef.h>
+#include <stdint.h>
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+#define BINFRAME_RECORD_CAN_RX 0x01
+#define BINFRAME_RECORD_CAN_TX 0x02
+#define BINFRAME_RECORD_TEXT   0x03
+
+#define BINFRAME_MAX_TEXT 64
+
+// Largest raw record (a text record) and its encoded size: COBS adds one
+// code byte per 254 data bytes plus the leading one, then the delimiter
+#define BINFRAME_MAX_RAW (1 + BINFRAME_MAX_TEXT + 2)
+#define BINFRAME_MAX_ENCODED (BINFRAME_MAX_RAW + BINFRAME_MAX_RAW / 254 + 2)
+
+uint16_t binframe_crc16(const uint8_t *data, size_t len);
+size_t binframe_cobs_encode(const uint8_t *in, size_t len, uint8_t *out);
+
+// Build a complete encoded record (including the 0x00 delimiter) into out,
+// which must hold BINFRAME_MAX_ENCODED bytes. Return the number of bytes.
+size_t binframe_can(uint8_t type, uint32_t id, uint8_t dlc, const uint8_t *payload,
+                    uint32_t timestamp_us, uint8_t *out);
+size_t binframe_text(const char *text, uint8_t *out);
+
+#ifdef __cplusplus
+}
+#endif
+
+#endif // BINFRAME_H
@@ -0,0 +1,112 @@
+#include "cmdparse.h"
+
+#include <stddef.h>
+
+void cmd_reset(CmdBuffer *cmd) {
+  cmd->len = 0;
+  cmd->overflow = false;
+  cmd->buf[0] = '\0';
+}
+
+CmdStatus cmd_feed(CmdBuffer *cmd, char c) {
+  if (c == '\n') {
+    if (cmd->overflow) {
+      cmd_reset(cmd);
+      return CMD_OVERFLOW;
+    }
+
+    // Quitar espacios y '\r' al final, y espacios al principio (como String::trim)
+    while (cmd->len > 0 && (cmd->buf[cmd->len - 1] == '\r' || cmd->buf[cmd->len - 1] == ' ')) cmd->len--;
+    cmd->buf[cmd->len] = '\0';
+    uint8_t start = 0;
+    while (start < cmd->len && cmd->buf[start] == ' ') start++;
+    if (start > 0) {
+      for (uint8_t i = start; i <= cmd->len; i++) cmd->buf[i - start] = cmd->buf[i];
+      cmd->len -= start;
+    }
+
+    cmd->len = 0; // El próximo carácter empieza una línea nueva
+    return CMD_READY;
+  }
+
+  if (cmd->overflow) return CMD_PENDING;
+  if (cmd->len >= CMD_MAX_LEN) {
+    cmd->overflow = true; // Descartar hasta el próximo '\n'
+    return CMD_PENDING;
+  }
+  cmd->buf[cmd->len++] = c;
+  return CMD_PENDING;
+}
+
+bool cmd_starts_with(const char *str, const char *prefix) {
+  while (*prefix) {
+    if (*str++ != *prefix++) return false;
+  }
+  return true;
+}
+
+char *cmd_next_token(char **cursor) {
+  char *start = *cursor;
+  if (start == NULL) return NULL;
+
+  char *p = start;
+  while (*p && *p != '_') p++;
+  if (*p == '_') {
+    *p = '\0';
+    *cursor = p + 1;
+  } else {
+    *cursor = NULL;
+  }
+  return start;
+}
+
+bool cmd_parse_hex(const char *str, uint32_t *value) {
+  uint32_t result = 0;
+  uint8_t digits = 0;
+
+  for (; *str; str++, digits++) {
+    char c = *str;
+    uint8_t nibble;
+    if (c >= '0' && c <= '9') nibble = c - '0';
+    else if (c >= 'A' && c <= 'F') nibble = c - 'A' + 10;
+    else if (c >= 'a' && c <= 'f') nibble = c - 'a' + 10;
+    else return false;
+    if (digits >= 8) return false;
+    result = (result << 4) | nibble;
+  }
+  if (digits == 0) return false;
+
+  *value = result;
+  return true;
+}
+
+bool cmd_parse_send(char *args, uint32_t *id, uint8_t *data, uint8_t *len) {
+  char *cursor = args;
+  char *token = cmd_next_token(&cursor);
+  if (token == NULL || !cmd_parse_hex(token, id)) return false;
+
+  uint8_t count = 0;
+  while ((token = cmd_next_token(&cursor)) != NULL) {
+    uint32_t byteValue;
+    if (count >= 8 || !cmd_parse_hex(token, &byteValue) || byteValue > 0xFF) return false;
+    data[count++] = (uint8_t)byteValue;
+  }
+  *len = count;
+  return true;
+}
+
+bool cmd_parse_tp2_angle(char *args, uint8_t *data, uint8_t *len) {
+  char *cursor = args;
+  char *angleType = cmd_next_token(&cursor);
+  if (angleType == NULL || angleType[0] == '\0' || angleType[1] != '\0' || cursor == NULL) return false;
+
+  // El resto de la línea (puede incluir un signo) es el valor en ASCII
+  const char *angleValue = cursor;
+  if (*angleValue == '\0') return false;
+
+  uint8_t idx = 0;
+  data[idx++] = (uint8_t)angleType[0];
+  while (*angleValue && idx < 8) data[idx++] = (uint8_t)*angleValue++;
+  *len = idx;
+  return true;
+}
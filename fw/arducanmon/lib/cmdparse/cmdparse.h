@@ -0,0 +1,58 @@
+// Allocation-free parsing of the serial commands sent by the GUI.
+//
+// Characters are accumulated into a fixed buffer; complete lines are split in
+// place (separators are overwritten with '\0') so no String or heap memory
+// is involved. Lines longer than CMD_MAX_LEN are discarded as a whole.
+#ifndef CMDPARSE_H
+#define CMDPARSE_H
+
+#include <stdbool.h>
+#include <stdint.h>
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+#define CMD_MAX_LEN 63
+
+typedef enum {
+  CMD_PENDING = 0,  // Line not complete yet
+  CMD_READY,        // buf holds a complete, trimmed command
+  CMD_OVERFLOW      // The line exceeded CMD_MAX_LEN and was discarded
+} CmdStatus;
+
+typedef struct {
+  char buf[CMD_MAX_LEN + 1];
+  uint8_t len;
+  bool overflow;
+} CmdBuffer;
+
+void cmd_reset(CmdBuffer *cmd);
+
+// Add one received character; returns CMD_READY/CMD_OVERFLOW on '\n'.
+// After CMD_READY the command stays in buf until the next cmd_feed().
+CmdStatus cmd_feed(CmdBuffer *cmd, char c);
+
+// True if str starts with prefix
+bool cmd_starts_with(const char *str, const char *prefix);
+
+// Return the next '_' separated token of *cursor (modifying it in place)
+// or NULL when there are no more tokens.
+char *cmd_next_token(char **cursor);
+
+// Parse 1-8 hex digits; false on empty, invalid or too long input
+bool cmd_parse_hex(const char *str, uint32_t *value);
+
+// SEND_<id>_<b0>_..._<b7>: args points after "SEND_". Fills id, data (up to
+// 8 bytes) and len; false if any field is invalid.
+bool cmd_parse_send(char *args, uint32_t *id, uint8_t *data, uint8_t *len);
+
+// TP2_ANGLE_<type>_<value>: args points after "TP2_ANGLE_". Fills the TP2
+// payload (type char followed by the ASCII value, up to 8 bytes) and len.
+bool cmd_parse_tp2_angle(char *args, uint8_t *data, uint8_t *len);
+
+#ifdef __cplusplus
+}
+#endif
+
+#endif // CMDPARSE_H
@@ -1,6 +1,8 @@
 #include <Arduino.h>
 #include <mcp_can.h>
 #include <SPI.h>
+#include <binframe.h>
+#include <cmdparse.h>
 
 // CAN TX Variables
 unsigned long prevTX = 0;
@@ -12,11 +14,12 @@ long unsigned int rxId;
 unsigned char len;
 unsigned char rxBuf[8];
 
-// Serial Buffer
-char msgString[128];
-char incomingByte;
-String inputString = "";
-bool stringComplete = false;
+// Serial Buffer (buffer fijo, sin String ni memoria dinámica)
+CmdBuffer command;
+
+// Salida binaria (registros COBS, ver lib/binframe); ASCII por defecto para depurar
+bool binaryOutput = false;
+uint8_t frameBuf[BINFRAME_MAX_ENCODED];
 
 // CAN0 INT and CS
 #define CAN0_INT 2 // Set INT to pin 2
@@ -39,41 +42,43 @@ void setup() {
   
   pinMode(CAN0_INT, INPUT); // Configuring pin for /INT input
   
+  cmd_reset(&command);
+  
   Serial.println("TP2_CAN_MONITOR_READY");
 }
 
-// Extrae el ID y datos para enviar un mensaje CAN
-void sendCANMessage(String cmd) {
+// Envía una respuesta de estado en el formato de salida activo
+void reply(const char *msg) {
+  if (binaryOutput) {
+    size_t n = binframe_text(msg, frameBuf);
+    Serial.write(frameBuf, n);
+  } else {
+    Serial.println(msg);
+  }
+}
+
+// Envía un mensaje CAN con el ID y datos del comando
+void sendCANMessage(char *args) {
   // Formato: SEND_ID_HEX_BYTE1_BYTE2_...
   // Ejemplo: "SEND_100_52_2D_33_34" envía ID=0x100, data=R-34
+  // args apunta a lo que sigue a "SEND_"
   
-  int firstSplit = cmd.indexOf('_', 5); // Busca después de "SEND_"
-  if (firstSplit == -1) return;
-  
-  String idStr = cmd.substring(5, firstSplit);
-  long id = strtol(idStr.c_str(), NULL, 16); // Convertir ID de hex a long
-  
-  // Extraer los bytes de datos
-  int startIdx = firstSplit + 1;
-  int byteCount = 0;
+  uint32_t id;
+  uint8_t byteCount;
   
   memset(data, 0, sizeof(data)); // Limpiar el array de datos
-  
-  while (startIdx < cmd.length() && byteCount < 8) {
-    int nextSplit = cmd.indexOf('_', startIdx);
-    if (nextSplit == -1) nextSplit = cmd.length();
-    
-    String byteStr = cmd.substring(startIdx, nextSplit);
-    data[byteCount] = strtol(byteStr.c_str(), NULL, 16);
-    
-    byteCount++;
-    startIdx = nextSplit + 1;
+  if (!cmd_parse_send(args, &id, data, &byteCount)) {
+    reply("CMD_INVALID");
+    return;
   }
   
   // Enviar mensaje CAN
   byte sndStat = CAN0.sendMsgBuf(id, 0, byteCount, data);
   
-  if (sndStat == CAN_OK) {
+  if (sndStat == CAN_OK && binaryOutput) {
+    size_t n = binframe_can(BINFRAME_RECORD_CAN_TX, id, byteCount, data, micros(), frameBuf);
+    Serial.write(frameBuf, n);
+  } else if (sndStat == CAN_OK) {
     Serial.print("CAN_TX_OK_");
     Serial.print(id, HEX);
     Serial.print("_");
@@ -83,90 +88,91 @@ void sendCANMessage(String cmd) {
     }
     Serial.println();
   } else {
-    Serial.println("CAN_TX_FAIL");
+    reply("CAN_TX_FAIL");
   }
 }
 
-// Procesa comandos recibidos por serial
-void processCommand(String cmd) {
-  cmd.trim();
-  
-  if (cmd.startsWith("SEND_")) {
-    sendCANMessage(cmd);
+// Procesa comandos recibidos por serial (cmd se modifica al separar campos)
+void processCommand(char *cmd) {
+  if (cmd_starts_with(cmd, "SEND_")) {
+    sendCANMessage(cmd + 5);
   } 
-  else if (cmd == "MODE_NORMAL") {
+  else if (strcmp(cmd, "MODE_NORMAL") == 0) {
     CAN0.setMode(MCP_NORMAL);
-    Serial.println("MODE_SET_NORMAL");
+    reply("MODE_SET_NORMAL");
   }
-  else if (cmd == "MODE_LOOPBACK") {
+  else if (strcmp(cmd, "MODE_LOOPBACK") == 0) {
     CAN0.setMode(MCP_LOOPBACK);
-    Serial.println("MODE_SET_LOOPBACK");
+    reply("MODE_SET_LOOPBACK");
   }
-  else if (cmd == "AUTO_ON") {
+  else if (strcmp(cmd, "AUTO_ON") == 0) {
     autoSend = true;
-    Serial.println("AUTO_SEND_ON");
+    reply("AUTO_SEND_ON");
   }
-  else if (cmd == "AUTO_OFF") {
+  else if (strcmp(cmd, "AUTO_OFF") == 0) {
     autoSend = false;
-    Serial.println("AUTO_SEND_OFF");
+    reply("AUTO_SEND_OFF");
+  }
+  else if (strcmp(cmd, "OUTPUT_BINARY") == 0) {
+    // La confirmación es la última línea ASCII; lo que sigue son registros binarios
+    Serial.println("OUTPUT_SET_BINARY");
+    binaryOutput = true;
+  }
+  else if (strcmp(cmd, "OUTPUT_ASCII") == 0) {
+    // La confirmación es el último registro binario; lo que sigue son líneas ASCII
+    reply("OUTPUT_SET_ASCII");
+    binaryOutput = false;
   }
-  else if (cmd.startsWith("TP2_ANGLE_")) {
+  else if (cmd_starts_with(cmd, "TP2_ANGLE_")) {
     // Formato: TP2_ANGLE_TYPE_VALUE
     // Ejemplo: TP2_ANGLE_R_-45
-    int firstSplit = cmd.indexOf('_', 9);
-    if (firstSplit != -1) {
-      String angleType = cmd.substring(9, firstSplit);
-      String angleValue = cmd.substring(firstSplit + 1);
-      
-      // Preparar datos para el formato del TP2
-      memset(data, 0, sizeof(data)); // Limpiar array
-      
-      // Primero byte: tipo de ángulo (R, C, O)
-      data[0] = angleType.charAt(0);
-      
-      // Siguientes bytes: valor ASCII del ángulo
-      int idx = 1;
-      for (int i = 0; i < angleValue.length() && idx < 8; i++) {
-        data[idx++] = angleValue.charAt(i);
-      }
-      
-      // Enviar con ID 0x100 (se puede personalizar)
-      byte sndStat = CAN0.sendMsgBuf(0x100, 0, idx, data);
-      
-      if (sndStat == CAN_OK) {
-        Serial.println("TP2_ANGLE_SENT_OK");
-      } else {
-        Serial.println("TP2_ANGLE_SENT_FAIL");
-      }
+    uint8_t idx;
+    
+    memset(data, 0, sizeof(data)); // Limpiar array
+    if (!cmd_parse_tp2_angle(cmd + 10, data, &idx)) {
+      reply("CMD_INVALID");
+      return;
+    }
+    
+    // Enviar con ID 0x100 (se puede personalizar)
+    byte sndStat = CAN0.sendMsgBuf(0x100, 0, idx, data);
+    
+    if (sndStat == CAN_OK) {
+      reply("TP2_ANGLE_SENT_OK");
+    } else {
+      reply("TP2_ANGLE_SENT_FAIL");
     }
   }
   else {
-    Serial.println("UNKNOWN_COMMAND");
+    reply("UNKNOWN_COMMAND");
   }
 }
 
 void loop() {
-  // Verificar datos recibidos por serial
+  // Verificar datos recibidos por serial; se procesa como máximo un comando
+  // por vuelta para no demorar la lectura de mensajes CAN
   while (Serial.available()) {
-    char inChar = (char)Serial.read();
-    if (inChar == '\n') {
-      stringComplete = true;
-    } else {
-      inputString += inChar;
+    CmdStatus status = cmd_feed(&command, (char)Serial.read());
+    if (status == CMD_READY) {
+      if (command.buf[0] != '\0') processCommand(command.buf);
+      break;
+    }
+    if (status == CMD_OVERFLOW) {
+      reply("CMD_OVERFLOW");
+      break;
     }
-  }
-  
-  // Procesar comando completo
-  if (stringComplete) {
-    processCommand(inputString);
-    inputString = "";
-    stringComplete = false;
   }
   
   // Verificar mensajes CAN recibidos
   if (!digitalRead(CAN0_INT)) {
     CAN0.readMsgBuf(&rxId, &len, rxBuf);
     
+    if (binaryOutput) {
+      size_t n = binframe_can(BINFRAME_RECORD_CAN_RX, rxId, len, rxBuf, micros(), frameBuf);
+      Serial.write(frameBuf, n);
+      return;
+    }
+    
     // Formato de salida: CAN_RX_ID_LEN_BYTE1_BYTE2_...
     Serial.print("CAN_RX_");
     Serial.print(rxId, HEX);
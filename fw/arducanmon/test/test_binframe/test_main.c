@@ -0,0 +1,85 @@
+// Host tests for the binary output encoder: pio test -e native
+// The expected byte streams were recorded from gui/binproto.py, so both ends
+// of the link are checked against the same data.
+#include <string.h>
+#include <unity.h>
+
+#include <binframe.h>
+
+void setUp(void) {}
+void tearDown(void) {}
+
+static void assert_stream(const uint8_t *expected, size_t expectedLen, const uint8_t *actual, size_t actualLen) {
+  TEST_ASSERT_EQUAL_UINT32(expectedLen, actualLen);
+  TEST_ASSERT_EQUAL_HEX8_ARRAY(expected, actual, expectedLen);
+}
+
+void test_crc16_check_value(void) {
+  TEST_ASSERT_EQUAL_HEX16(0x29B1, binframe_crc16((const uint8_t *)"123456789", 9));
+}
+
+void test_cobs_removes_zeros(void) {
+  const uint8_t in[] = {0x11, 0x00, 0x00, 0x22};
+  const uint8_t expected[] = {0x02, 0x11, 0x01, 0x02, 0x22};
+  uint8_t out[8];
+  size_t n = binframe_cobs_encode(in, sizeof(in), out);
+  assert_stream(expected, sizeof(expected), out, n);
+}
+
+void test_cobs_long_block(void) {
+  uint8_t in[300];
+  uint8_t out[310];
+  for (int i = 0; i < 300; i++) in[i] = (uint8_t)(i % 255 + 1);
+  size_t n = binframe_cobs_encode(in, sizeof(in), out);
+  TEST_ASSERT_EQUAL_UINT32(302, n);
+  TEST_ASSERT_EQUAL_HEX8(0xFF, out[0]);
+  for (size_t i = 0; i < n; i++) TEST_ASSERT_NOT_EQUAL(0, out[i]);
+}
+
+void test_can_rx_record(void) {
+  const uint8_t payload[] = {'R', '-', '3', '4'};
+  const uint8_t expected[] = {0x04, 0x01, 0x01, 0x01, 0x01, 0x09, 0x04, 0x52, 0x2d, 0x33,
+                              0x34, 0x40, 0xe2, 0x01, 0x03, 0xb4, 0x3f, 0x00};
+  uint8_t out[BINFRAME_MAX_ENCODED];
+  size_t n = binframe_can(BINFRAME_RECORD_CAN_RX, 0x101, 4, payload, 123456, out);
+  assert_stream(expected, sizeof(expected), out, n);
+}
+
+void test_can_tx_record_with_zero_payload(void) {
+  const uint8_t payload[] = {0x00, 0x00, 'C', '0'};
+  const uint8_t expected[] = {0x02, 0x02, 0x02, 0x01, 0x01, 0x02, 0x04, 0x01, 0x04, 0x43,
+                              0x30, 0x07, 0x01, 0x01, 0x03, 0x01, 0x39, 0x00};
+  uint8_t out[BINFRAME_MAX_ENCODED];
+  size_t n = binframe_can(BINFRAME_RECORD_CAN_TX, 0x100, 4, payload, 7, out);
+  assert_stream(expected, sizeof(expected), out, n);
+}
+
+void test_text_record(void) {
+  const uint8_t expected[] = {0x14, 0x03, 'O', 'U', 'T', 'P', 'U', 'T', '_', 'S', 'E', 'T',
+                              '_', 'A', 'S', 'C', 'I', 'I', 0xce, 0x64, 0x00};
+  uint8_t out[BINFRAME_MAX_ENCODED];
+  size_t n = binframe_text("OUTPUT_SET_ASCII", out);
+  assert_stream(expected, sizeof(expected), out, n);
+}
+
+void test_text_record_is_truncated(void) {
+  char text[BINFRAME_MAX_TEXT + 20];
+  uint8_t out[BINFRAME_MAX_ENCODED];
+  memset(text, 'A', sizeof(text) - 1);
+  text[sizeof(text) - 1] = '\0';
+  size_t n = binframe_text(text, out);
+  TEST_ASSERT_TRUE(n <= BINFRAME_MAX_ENCODED);
+  TEST_ASSERT_EQUAL_HEX8(0x00, out[n - 1]);
+}
+
+int main(void) {
+  UNITY_BEGIN();
+  RUN_TEST(test_crc16_check_value);
+  RUN_TEST(test_cobs_removes_zeros);
+  RUN_TEST(test_cobs_long_block);
+  RUN_TEST(test_can_rx_record);
+  RUN_TEST(test_can_tx_record_with_zero_payload);
+  RUN_TEST(test_text_record);
+  RUN_TEST(test_text_record_is_truncated);
+  return UNITY_END();
+}
@@ -0,0 +1,153 @@
+// Host tests for the serial command parser: pio test -e native
+#include <stdio.h>
+#include <string.h>
+#include <time.h>
+#include <unity.h>
+
+#include <cmdparse.h>
+
+static CmdBuffer cmd;
+
+void setUp(void) { cmd_reset(&cmd); }
+void tearDown(void) {}
+
+static CmdStatus feed_line(const char *line) {
+  CmdStatus status = CMD_PENDING;
+  for (const char *p = line; *p; p++) status = cmd_feed(&cmd, *p);
+  return status;
+}
+
+void test_line_is_pending_until_newline(void) {
+  TEST_ASSERT_EQUAL_INT(CMD_PENDING, feed_line("MODE_NORMAL"));
+  TEST_ASSERT_EQUAL_INT(CMD_READY, cmd_feed(&cmd, '\n'));
+  TEST_ASSERT_EQUAL_STRING("MODE_NORMAL", cmd.buf);
+}
+
+void test_line_is_trimmed(void) {
+  TEST_ASSERT_EQUAL_INT(CMD_READY, feed_line("  AUTO_ON \r\n"));
+  TEST_ASSERT_EQUAL_STRING("AUTO_ON", cmd.buf);
+}
+
+void test_consecutive_lines(void) {
+  TEST_ASSERT_EQUAL_INT(CMD_READY, feed_line("AUTO_ON\n"));
+  TEST_ASSERT_EQUAL_STRING("AUTO_ON", cmd.buf);
+  TEST_ASSERT_EQUAL_INT(CMD_READY, feed_line("AUTO_OFF\n"));
+  TEST_ASSERT_EQUAL_STRING("AUTO_OFF", cmd.buf);
+}
+
+void test_overflow_discards_whole_line(void) {
+  for (int i = 0; i < CMD_MAX_LEN + 10; i++) TEST_ASSERT_EQUAL_INT(CMD_PENDING, cmd_feed(&cmd, 'A'));
+  TEST_ASSERT_EQUAL_INT(CMD_OVERFLOW, cmd_feed(&cmd, '\n'));
+  TEST_ASSERT_EQUAL_INT(CMD_READY, feed_line("MODE_LOOPBACK\n"));
+  TEST_ASSERT_EQUAL_STRING("MODE_LOOPBACK", cmd.buf);
+}
+
+void test_max_length_line_fits(void) {
+  char line[CMD_MAX_LEN + 2];
+  memset(line, 'B', CMD_MAX_LEN);
+  line[CMD_MAX_LEN] = '\n';
+  line[CMD_MAX_LEN + 1] = '\0';
+  TEST_ASSERT_EQUAL_INT(CMD_READY, feed_line(line));
+  TEST_ASSERT_EQUAL_UINT32(CMD_MAX_LEN, strlen(cmd.buf));
+}
+
+void test_parse_hex(void) {
+  uint32_t value;
+  TEST_ASSERT_TRUE(cmd_parse_hex("7FF", &value));
+  TEST_ASSERT_EQUAL_UINT32(0x7FF, value);
+  TEST_ASSERT_TRUE(cmd_parse_hex("2d", &value));
+  TEST_ASSERT_EQUAL_UINT32(0x2D, value);
+  TEST_ASSERT_FALSE(cmd_parse_hex("", &value));
+  TEST_ASSERT_FALSE(cmd_parse_hex("1G", &value));
+  TEST_ASSERT_FALSE(cmd_parse_hex("123456789", &value));
+}
+
+void test_parse_send(void) {
+  char line[] = "100_52_2D_33_34";
+  uint32_t id;
+  uint8_t data[8];
+  uint8_t len;
+  const uint8_t expected[] = {'R', '-', '3', '4'};
+  TEST_ASSERT_TRUE(cmd_parse_send(line, &id, data, &len));
+  TEST_ASSERT_EQUAL_UINT32(0x100, id);
+  TEST_ASSERT_EQUAL_UINT32(4, len);
+  TEST_ASSERT_EQUAL_HEX8_ARRAY(expected, data, 4);
+}
+
+void test_parse_send_without_data(void) {
+  char line[] = "107";
+  uint32_t id;
+  uint8_t data[8];
+  uint8_t len;
+  TEST_ASSERT_TRUE(cmd_parse_send(line, &id, data, &len));
+  TEST_ASSERT_EQUAL_UINT32(0x107, id);
+  TEST_ASSERT_EQUAL_UINT32(0, len);
+}
+
+void test_parse_send_rejects_bad_fields(void) {
+  uint32_t id;
+  uint8_t data[8];
+  uint8_t len;
+  char badByte[] = "100_ZZ";
+  char wideByte[] = "100_123";
+  char tooMany[] = "100_1_2_3_4_5_6_7_8_9";
+  char noId[] = "";
+  TEST_ASSERT_FALSE(cmd_parse_send(badByte, &id, data, &len));
+  TEST_ASSERT_FALSE(cmd_parse_send(wideByte, &id, data, &len));
+  TEST_ASSERT_FALSE(cmd_parse_send(tooMany, &id, data, &len));
+  TEST_ASSERT_FALSE(cmd_parse_send(noId, &id, data, &len));
+}
+
+void test_parse_tp2_angle(void) {
+  char line[] = "R_-45";
+  uint8_t data[8];
+  uint8_t len;
+  const uint8_t expected[] = {'R', '-', '4', '5'};
+  TEST_ASSERT_TRUE(cmd_parse_tp2_angle(line, data, &len));
+  TEST_ASSERT_EQUAL_UINT32(4, len);
+  TEST_ASSERT_EQUAL_HEX8_ARRAY(expected, data, 4);
+
+  char noValue[] = "R_";
+  char longType[] = "RC_10";
+  TEST_ASSERT_FALSE(cmd_parse_tp2_angle(noValue, data, &len));
+  TEST_ASSERT_FALSE(cmd_parse_tp2_angle(longType, data, &len));
+}
+
+void test_timing(void) {
+  // Feed + parse a typical SEND command many times and report the cost per command
+  const char *line = "SEND_101_52_2D_31_33_38\n";
+  const int iterations = 200000;
+  uint32_t id = 0;
+  uint8_t data[8];
+  uint8_t len = 0;
+  char report[96];
+
+  clock_t start = clock();
+  for (int i = 0; i < iterations; i++) {
+    if (feed_line(line) == CMD_READY && cmd_starts_with(cmd.buf, "SEND_")) {
+      cmd_parse_send(cmd.buf + 5, &id, data, &len);
+    }
+  }
+  double elapsed = (double)(clock() - start) / CLOCKS_PER_SEC;
+
+  TEST_ASSERT_EQUAL_UINT32(0x101, id);
+  TEST_ASSERT_EQUAL_UINT32(5, len);
+  snprintf(report, sizeof(report), "SEND parse: %.1f ns/command on host", elapsed * 1e9 / iterations);
+  TEST_MESSAGE(report);
+}
+
+int main(void) {
+  UNITY_BEGIN();
+  RUN_TEST(test_line_is_pending_until_newline);
+  RUN_TEST(test_line_is_trimmed);
+  RUN_TEST(test_consecutive_lines);
+  RUN_TEST(test_overflow_discards_whole_line);
+  RUN_TEST(test_max_length_line_fits);
+  RUN_TEST(test_parse_hex);
+  RUN_TEST(test_parse_send);
+  RUN_TEST(test_parse_send_without_data);
+  RUN_TEST(test_parse_send_rejects_bad_fields);
+  RUN_TEST(test_parse_tp2_angle);
+  RUN_TEST(test_timing);
+  return UNITY_END();
+}
@@ -0,0 +1,167 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+
+from ioengine import LOOP_READERS
+from profiling import stage
+from serialreader import SerialReader
+from tp2parser import parse_lines
+
+_parse_stage = stage("parse")
+
+
+def adapter_name(device):
+    """Short label for a serial device ("/dev/ttyACM0" -> "ttyACM0", "COM3" -> "COM3")"""
+    return os.path.basename(device) or device
+
+
+class Adapter:
+    """One arducanmon adapter: its open port, reader, writer and counters.
+
+    With an IOEngine the port is read and written from the engine's event
+    loop; without one it gets its own SerialReader thread and is written
+    directly. Lines are parsed where they are read and only the decoded
+    batches go to the merger.
+    """
+
+    def __init__(self, name, port, merger, on_error=None, engine=None):
+        self.name = name
+        self.port = port
+        self.merger = merger
+        self.on_error = on_error  # Called from the reader with (adapter, exception)
+        # Engine readers all run in the loop thread, so their batches arrive in order
+        self.threaded = engine is None or not LOOP_READERS
+        if engine is not None:
+            self.reader = engine.reader(port, self.on_lines, on_error=self.on_read_error, on_frames=self.on_frames)
+            self.writer = engine.writer(port, on_error=self.on_write_error)
+        else:
+            self.reader = SerialReader(port, self.on_lines, on_error=self.on_read_error, on_frames=self.on_frames)
+            self.writer = port
+        self.read_errors = 0
+        self.write_errors = 0
+        self.frames_total = 0
+
+    def start(self):
+        self.merger.add_source(self)
+        self.reader.start()
+
+    def stop(self):
+        self.reader.stop()
+        if self.writer is not self.port:
+            self.writer.close()
+        self.merger.remove_source(self)
+
+    def write(self, data):
+        """Queues data for the port; False if the engine's writer dropped it (queue full)"""
+        return self.writer.write(data) is not False
+
+    def on_lines(self, lines):
+        start = time.perf_counter()
+        frames = parse_lines(lines)
+        _parse_stage.add(time.perf_counter() - start)
+        self.on_frames(frames)
+
+    def on_frames(self, frames):
+        self.frames_total += len(frames)
+        self.merger.push(time.time(), self, frames)
+
+    def on_read_error(self, error):
+        self.read_errors += 1
+        if self.on_error:
+            self.on_error(self, error)
+
+    def on_write_error(self, error):
+        self.write_errors += 1
+        if self.on_error:
+            self.on_error(self, error)
+
+
+class FrameMerger:
+    """Merges the frame batches of several adapters into one time-ordered stream.
+
+    Every batch is stamped with its arrival time in the reader thread. With a
+    single source, or when all sources are read by the I/O engine thread,
+    batches are already in order and pass straight through; otherwise they
+    wait in a heap for `hold` seconds (so a batch stamped earlier by another
+    reader can still overtake them) and a merge thread delivers them in
+    timestamp order. Batches that arrive after newer ones were already delivered are
+    passed on anyway and counted in late_batches.
+    """
+
+    def __init__(self, on_frames, hold=0.02):
+        self.on_frames = on_frames  # Called with (timestamp, source, frames)
+        self.hold = hold
+        self.sources = []
+        self.heap = []
+        self.counter = itertools.count()  # Tie breaker, keeps equal timestamps in push order
+        self.cond = threading.Condition()
+        self.thread = None
+        self.last_delivered = 0.0
+
+        # Counters
+        self.merged_batches = 0
+        self.late_batches = 0
+        self.max_pending = 0
+
+    def add_source(self, source):
+        with self.cond:
+            self.sources.append(source)
+            if self.merging() and self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+
+    def remove_source(self, source):
+        with self.cond:
+            if source in self.sources:
+                self.sources.remove(source)
+            self.cond.notify()
+
+    def push(self, timestamp, source, frames):
+        """Called from the reader threads"""
+        with self.cond:
+            if self.thread is None:
+                # Single adapter: no reordering needed
+                direct = True
+            else:
+                direct = False
+                heapq.heappush(self.heap, (timestamp, next(self.counter), source, frames))
+                self.max_pending = max(self.max_pending, len(self.heap))
+                if len(self.heap) == 1:
+                    self.cond.notify()
+        if direct:
+            self.on_frames(timestamp, source, frames)
+
+    def merging(self):
+        """True when batches from different threads have to be put in order"""
+        return len(self.sources) > 1 and any(source.threaded for source in self.sources)
+
+    def due(self, now):
+        heap = self.heap
+        return heap and (heap[0][0] <= now - self.hold or not self.merging())
+
+    def run(self):
+        """Merge thread: delivers held batches in timestamp order while merging is needed"""
+        heap = self.heap
+        while True:
+            with self.cond:
+                now = time.time()
+                while not self.due(now):
+                    if not heap and not self.merging():
+                        # Back to pass-through once a single threaded adapter is left
+                        self.thread = None
+                        return
+                    self.cond.wait(heap[0][0] + self.hold - now if heap else None)
+                    now = time.time()
+                ready = []
+                while self.due(now):
+                    ready.append(heapq.heappop(heap))
+
+            for timestamp, _, source, frames in ready:
+                if timestamp < self.last_delivered:
+                    self.late_batches += 1
+                else:
+                    self.last_delivered = timestamp
+                self.merged_batches += 1
+                self.on_frames(timestamp, source, frames)
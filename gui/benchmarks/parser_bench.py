@@ -0,0 +1,68 @@
+# Microbenchmark for the firmware line parser (tp2parser).
+#
+# Usage: python benchmarks/parser_bench.py [--frames N] [--repeat R] [--min-rate FPS]
+# Prints frames/s for per-line and batch parsing; with --min-rate the script
+# exits with status 1 when the batch rate falls below the given value.
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tp2parser import parse_line, parse_lines, format_rx_line, format_tx_line  # noqa: E402
+
+
+def make_traffic(count, seed=0):
+    """Synthetic mix of firmware lines resembling a TP2 session"""
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        group_id = rng.randrange(8)
+        payload = f"{rng.choice('RCO')}{rng.randint(-179, 180)}".encode("ascii")
+        roll = rng.random()
+        if roll < 0.85:
+            lines.append(format_rx_line(0x100 + group_id, payload))
+        elif roll < 0.97:
+            lines.append(format_tx_line(0x100 + group_id, payload))
+        elif roll < 0.99:
+            lines.append("TP2_ANGLE_SENT_OK")
+        else:
+            lines.append(rng.choice(["MODE_SET_NORMAL", "UNKNOWN_COMMAND", "CAN_TX_FAIL"]))
+    return lines
+
+
+def best_rate(func, lines, repeat):
+    """Returns the best frames/s over several runs"""
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(lines)
+        elapsed = time.perf_counter() - start
+        best = max(best, len(lines) / elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="tp2parser throughput benchmark")
+    parser.add_argument("--frames", type=int, default=200000, help="lines per run")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (best is reported)")
+    parser.add_argument("--min-rate", type=float, default=None, help="fail if batch frames/s is lower")
+    args = parser.parse_args()
+
+    lines = make_traffic(args.frames)
+    single = best_rate(lambda batch: [parse_line(line) for line in batch], lines, args.repeat)
+    batch = best_rate(parse_lines, lines, args.repeat)
+
+    print(f"parse_line : {single:12,.0f} frames/s")
+    print(f"parse_lines: {batch:12,.0f} frames/s")
+
+    if args.min_rate is not None and batch < args.min_rate:
+        print(f"FAIL: batch rate below {args.min_rate:,.0f} frames/s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+# End-to-end benchmark of the ingestion pipeline (Linux, needs a pty).
+#
+# Synthetic firmware lines are written to a pseudo-terminal at increasing
+# rates and go through the GUI's own receive path: SerialReader into a
+# ReceivePipeline (parse, bus statistics, TP2 check, TP2 table model and plot
+# store) and, in a thread that mimics the Tk drain, ReceivePipeline.store_queued()
+# (message log, search index, optional LogFilter) plus the TP2 and bus
+# statistics views rendering into stand-in widgets. Stage times come from the
+# same profiling timers as the Diagnostics window. "Latency" is
+# frame-to-screen: from the write to the pty until the drain that would render
+# the line.
+#
+# Usage: python benchmarks/pipeline_bench.py [--rates 100,480,link,unpaced]
+#        [--duration S] [--filter IDS] [--json FILE|-]
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import tty
+from array import array
+from datetime import datetime
+
+import numpy as np
+import serial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser_bench import make_traffic  # noqa: E402
+import profiling  # noqa: E402
+from busstats import BusStatsView  # noqa: E402
+from logsearch import LogFilter, parse_id_set  # noqa: E402
+from pipeline import ReceivePipeline  # noqa: E402
+from serialreader import SerialReader  # noqa: E402
+from tp2table import TP2TableView  # noqa: E402
+
+LINK_BAUDRATE = 921600     # Same as SERIAL_BAUDRATE in main.py
+TP2_NOMINAL_RATE = 480     # 8 groups x 3 angles x 20 frames/s
+UI_DRAIN_INTERVAL = 0.05   # Same as CanMonitorApp.ui_drain_interval
+BUS_STATS_INTERVAL = 1.0   # Same as CanMonitorApp.bus_stats_interval
+POOL_SIZE = 20000          # Distinct synthetic lines, replayed cyclically
+# Profiling stages of the receive path ("read" is reported without the stages it calls)
+STAGES = ("read", "parse", "bus stats", "tp2 check", "table", "log insert", "table view", "bus view")
+_READ_CALLS = ("parse", "bus stats", "tp2 check", "table")
+
+
+class Feeder(threading.Thread):
+    """Writes the traffic pool to the pty master at a given rate (None = as fast as possible)"""
+
+    def __init__(self, fd, lines, rate, duration):
+        super().__init__(daemon=True)
+        self.fd = fd
+        self.blob = b"".join(lines)
+        self.offsets = [0]
+        for line in lines:
+            self.offsets.append(self.offsets[-1] + len(line))
+        self.rate = rate
+        self.duration = duration
+        self.sent = 0
+        # Cumulative line count after each write and the time of that write
+        self.bounds = array("q")
+        self.times = array("d")
+
+    def chunk(self, start, stop):
+        size = len(self.offsets) - 1
+        parts = []
+        while start < stop:
+            i = start % size
+            j = min(size, i + (stop - start))
+            parts.append(self.blob[self.offsets[i]:self.offsets[j]])
+            start += j - i
+        return b"".join(parts)
+
+    def run(self):
+        start = time.monotonic()
+        while True:
+            now = time.monotonic()
+            elapsed = now - start
+            if elapsed >= self.duration:
+                break
+            if self.rate is None:
+                target = self.sent + 256
+            else:
+                target = int(self.rate * elapsed)
+                if target <= self.sent:
+                    time.sleep(0.001)
+                    continue
+            data = memoryview(self.chunk(self.sent, target))
+            self.times.append(time.monotonic())
+            self.bounds.append(target)
+            while data:
+                data = data[os.write(self.fd, data):]
+            self.sent = target
+
+
+class NullWidget:
+    """Stands in for the Treeview/Label the views render into; the views' own work still runs"""
+
+    def __init__(self):
+        self.items = 0
+        self.calls = 0
+
+    def insert(self, parent, index, **options):
+        self.items += 1
+        return f"I{self.items}"
+
+    def item(self, item, **options):
+        self.calls += 1
+
+    def delete(self, *items):
+        self.calls += 1
+
+    def config(self, **options):
+        self.calls += 1
+
+
+class Pipeline:
+    """The GUI receive path (ReceivePipeline and views) without Tk"""
+
+    def __init__(self, filter_ids=None):
+        self.receive = ReceivePipeline()
+        if filter_ids is not None:
+            self.receive.log_filter = LogFilter(self.receive.search_index, filter_ids)
+        self.tp2_view = TP2TableView(NullWidget(), self.receive.tp2_model)
+        self.bus_stats_view = BusStatsView(NullWidget(), NullWidget(), self.receive.bus_stats)
+        self.received = 0
+
+    def on_lines(self, lines):
+        """SerialReader callback (reader thread), as CanMonitorApp.process_received_batch"""
+        self.receive.process_lines(time.time(), lines)
+        self.received += len(lines)
+
+
+class Drainer(threading.Thread):
+    """Mimics CanMonitorApp.drain_ui_queue and measures frame-to-screen latency"""
+
+    def __init__(self, pipeline, feeder):
+        super().__init__(daemon=True)
+        self.pipeline = pipeline
+        self.feeder = feeder
+        self.running = True
+        self.drained = 0
+        self.latencies = []
+        self.table_view = profiling.stage("table view")
+        self.bus_view = profiling.stage("bus view")
+
+    def run(self):
+        pipeline = self.pipeline
+        queue = pipeline.receive.ui_queue
+        checker = pipeline.receive.tp2_checker
+        last_bus_stats = time.monotonic()
+        delay = UI_DRAIN_INTERVAL
+        while self.running or queue.depth():
+            time.sleep(delay)
+            drained = pipeline.receive.store_queued()
+            if drained:
+                # Line i was sent by the first write whose cumulative count exceeds i
+                now = time.monotonic()
+                indices = np.arange(self.drained, self.drained + drained)
+                # Slicing copies the arrays atomically (the feeder keeps appending)
+                bounds = np.frombuffer(self.feeder.bounds[:], dtype=np.int64)
+                times = np.frombuffer(self.feeder.times[:], dtype=np.float64)[:len(bounds)]
+                writes = np.minimum(np.searchsorted(bounds, indices, side="right"), len(times) - 1)
+                self.latencies.append(now - times[writes])
+                self.drained += drained
+
+            start = time.perf_counter()
+            pipeline.tp2_view.flush()
+            self.table_view.add(time.perf_counter() - start)
+
+            if time.monotonic() - last_bus_stats >= BUS_STATS_INTERVAL:
+                last_bus_stats = time.monotonic()
+                start = time.perf_counter()
+                pipeline.bus_stats_view.flush()
+                checker.poll(time.time())
+                checker.take_new()
+                self.bus_view.add(time.perf_counter() - start)
+            # The GUI drains again after 1 ms while the queue is over its batch limit
+            delay = 0.001 if queue.depth() else UI_DRAIN_INTERVAL
+
+
+def run_rate(rate, duration, lines, filter_ids=None):
+    """Runs the pipeline at one offered rate and returns a result dict"""
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    port = serial.Serial(os.ttyname(slave), LINK_BAUDRATE)
+    try:
+        pipeline = Pipeline(filter_ids)
+        reader = SerialReader(port, pipeline.on_lines)
+        feeder = Feeder(master, lines, rate, duration)
+        drainer = Drainer(pipeline, feeder)
+
+        profiling.reset()
+        cpu_start = time.process_time()
+        start = time.monotonic()
+        reader.start()
+        drainer.start()
+        feeder.start()
+        feeder.join()
+        # Give the pipeline up to 2 s to absorb what is still in flight
+        deadline = time.monotonic() + 2.0
+        while pipeline.received < feeder.sent and time.monotonic() < deadline:
+            time.sleep(0.01)
+        elapsed = time.monotonic() - start
+        reader.stop()
+        drainer.running = False
+        drainer.join()
+        reader.thread.join()
+        cpu_total = time.process_time() - cpu_start
+    finally:
+        port.close()
+        os.close(slave)
+        os.close(master)
+
+    stage_time = {name: total for name, _, total, _, _, _ in profiling.snapshot()[2]}
+    stage_time["read"] = max(0.0, stage_time["read"] - sum(stage_time[name] for name in _READ_CALLS))
+
+    latencies = np.concatenate(drainer.latencies) if drainer.latencies else np.zeros(1)
+    return {
+        "offered_rate": rate,
+        "duration": round(elapsed, 3),
+        "sent": feeder.sent,
+        "received": pipeline.received,
+        "lost": feeder.sent - pipeline.received,
+        "sustained_rate": round(pipeline.received / elapsed, 1),
+        "latency_ms": {
+            "p50": round(1000 * float(np.percentile(latencies, 50)), 2),
+            "p99": round(1000 * float(np.percentile(latencies, 99)), 2),
+            "max": round(1000 * float(latencies.max()), 2),
+        },
+        "queue_max_depth": pipeline.receive.ui_queue.max_depth,
+        "decode_errors": reader.decode_errors,
+        "cpu_percent": {stage: round(100 * stage_time[stage] / elapsed, 2) for stage in STAGES},
+        "cpu_percent_total": round(100 * cpu_total / elapsed, 2),
+    }
+
+
+def parse_rates(text, line_bytes):
+    """'100,480,link,unpaced' -> [100.0, 480.0, <link capacity>, None]"""
+    rates = []
+    for item in text.split(","):
+        item = item.strip()
+        if item == "link":
+            rates.append(round(LINK_BAUDRATE / 10 / line_bytes))
+        elif item == "unpaced":
+            rates.append(None)
+        else:
+            rates.append(float(item))
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end ingestion pipeline benchmark")
+    parser.add_argument("--rates", default=f"100,{TP2_NOMINAL_RATE},1000,link,unpaced",
+                        help="comma separated frames/s; 'link' = 921600 baud capacity, "
+                             "'unpaced' = as fast as the pty accepts")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per rate")
+    parser.add_argument("--filter", default="", metavar="IDS",
+                        help="keep a log filter on these CAN IDs (hex, e.g. 100-107) up to date")
+    parser.add_argument("--json", default=None, metavar="FILE", help="write results as JSON ('-' = stdout)")
+    args = parser.parse_args()
+
+    lines = [(line + "\r\n").encode("ascii") for line in make_traffic(POOL_SIZE)]
+    line_bytes = sum(map(len, lines)) / len(lines)
+    rates = parse_rates(args.rates, line_bytes)
+    filter_ids = parse_id_set(args.filter)
+
+    report = sys.stderr if args.json == "-" else sys.stdout
+    print(f"{'offered':>9} {'sustained':>10} {'p50 ms':>8} {'p99 ms':>8} {'lost':>6} {'max queue':>9} "
+          f"{'CPU %':>6}  per stage", file=report)
+    results = []
+    for rate in rates:
+        result = run_rate(rate, args.duration, lines, filter_ids)
+        results.append(result)
+        stages = " ".join(f"{stage} {value:.1f}" for stage, value in result["cpu_percent"].items())
+        offered = "unpaced" if rate is None else f"{rate:.0f}"
+        print(f"{offered:>9} {result['sustained_rate']:>10,.0f} {result['latency_ms']['p50']:>8.1f} "
+              f"{result['latency_ms']['p99']:>8.1f} {result['lost']:>6} {result['queue_max_depth']:>9} "
+              f"{result['cpu_percent_total']:>6.1f}  {stages}", file=report)
+
+    if args.json:
+        output = {
+            "benchmark": "pipeline",
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "line_bytes": round(line_bytes, 1),
+            "results": results,
+        }
+        if args.json == "-":
+            json.dump(output, sys.stdout, indent=2)
+            print()
+        else:
+            with open(args.json, "w") as f:
+                json.dump(output, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,318 @@
+# Binary output mode of the arducanmon firmware (see fw/arducanmon/lib/binframe).
+#
+# Records are COBS encoded and terminated by 0x00. Raw layout, little endian:
+#   CAN RX / CAN TX: type(1) id(4) dlc(1) payload(dlc) timestamp_us(4) crc16(2)
+#   Text:            type(1) text(n) crc16(2)
+# The CRC is CRC-16/CCITT-FALSE over every byte before it.
+#
+# Usage: python binproto.py <recorded stream> decodes a captured byte stream
+# (ASCII lines, binary records, or a mix of both around the mode switches).
+import struct
+import sys
+
+from tp2parser import (Frame, FRAME_RX, FRAME_TX, parse_line, format_rx_line,
+                       format_tx_line, decode_angle)
+
+RECORD_CAN_RX = 0x01
+RECORD_CAN_TX = 0x02
+RECORD_TEXT = 0x03
+
+# Serial commands that switch the firmware output format and their replies
+CMD_OUTPUT_BINARY = "OUTPUT_BINARY"
+CMD_OUTPUT_ASCII = "OUTPUT_ASCII"
+BINARY_MODE_REPLY = "OUTPUT_SET_BINARY"  # Last ASCII line before binary records
+ASCII_MODE_REPLY = "OUTPUT_SET_ASCII"    # Last binary (text) record before ASCII lines
+
+MAX_RECORD_LENGTH = 256  # Anything longer without a delimiter is garbage
+
+# Segment kinds returned by StreamFramer.feed()
+SEGMENT_LINES = "lines"
+SEGMENT_FRAMES = "frames"
+
+_BINARY_MARKER = BINARY_MODE_REPLY.encode("ascii")
+
+_CAN_HEADER = struct.Struct("<BIB")
+_TIMESTAMP = struct.Struct("<I")
+_CRC = struct.Struct("<H")
+
+
+def _make_crc_table():
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table.append(crc & 0xFFFF)
+    return table
+
+
+_CRC_TABLE = _make_crc_table()
+
+
+def crc16(data, crc=0xFFFF):
+    """CRC-16/CCITT-FALSE (same as binframe_crc16 in the firmware)"""
+    table = _CRC_TABLE
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ byte]
+    return crc
+
+
+def cobs_encode(data):
+    """COBS encodes data (without the trailing delimiter)"""
+    out = bytearray(b"\x00")
+    code_idx = 0
+    code = 1
+    for byte in data:
+        if byte == 0:
+            out[code_idx] = code
+            code = 1
+            code_idx = len(out)
+            out.append(0)
+        else:
+            out.append(byte)
+            code += 1
+            if code == 0xFF:
+                out[code_idx] = code
+                code = 1
+                code_idx = len(out)
+                out.append(0)
+    out[code_idx] = code
+    return bytes(out)
+
+
+def cobs_decode(data):
+    """Decodes one COBS record (without delimiter); raises ValueError if corrupted"""
+    out = bytearray()
+    i = 0
+    length = len(data)
+    while i < length:
+        code = data[i]
+        if code == 0:
+            raise ValueError("Unexpected zero in COBS record")
+        end = i + code
+        if end > length:
+            raise ValueError("Truncated COBS block")
+        out += data[i + 1:end]
+        i = end
+        if code != 0xFF and i < length:
+            out.append(0)
+    return bytes(out)
+
+
+def _finish(raw):
+    raw += _CRC.pack(crc16(raw))
+    return cobs_encode(raw) + b"\x00"
+
+
+def encode_can_record(record_type, can_id, data, timestamp_us=0):
+    """Encodes a CAN RX/TX record exactly like binframe_can()"""
+    data = bytes(data[:8])
+    raw = _CAN_HEADER.pack(record_type, can_id, len(data)) + data + _TIMESTAMP.pack(timestamp_us & 0xFFFFFFFF)
+    return _finish(raw)
+
+
+def encode_text_record(text):
+    """Encodes a text record exactly like binframe_text()"""
+    return _finish(bytes([RECORD_TEXT]) + text.encode("ascii")[:64])
+
+
+def decode_record(raw):
+    """Turns a decoded, CRC-checked raw record into a Frame"""
+    record_type = raw[0]
+    if record_type == RECORD_TEXT:
+        return parse_line(raw[1:].decode("ascii", errors="replace"))
+
+    _, can_id, dlc = _CAN_HEADER.unpack_from(raw)
+    end = _CAN_HEADER.size + dlc
+    if dlc > 8 or len(raw) != end + _TIMESTAMP.size:
+        raise ValueError("Bad CAN record length")
+    data = bytes(raw[_CAN_HEADER.size:end])
+    device_time = _TIMESTAMP.unpack_from(raw, end)[0]
+    angle_type, angle_value = decode_angle(data)
+    if record_type == RECORD_CAN_RX:
+        return Frame(FRAME_RX, can_id, dlc, data, angle_type, angle_value, None,
+                     format_rx_line(can_id, data), device_time)
+    if record_type == RECORD_CAN_TX:
+        return Frame(FRAME_TX, can_id, dlc, data, angle_type, angle_value, None,
+                     format_tx_line(can_id, data), device_time)
+    raise ValueError(f"Unknown record type {record_type}")
+
+
+class BinaryDecoder:
+    """Incremental decoder for the binary byte stream.
+
+    feed() accepts arbitrary chunks; partial records wait in the internal
+    buffer for the rest of their bytes. Corrupted records are counted and
+    skipped, resynchronizing on the next 0x00 delimiter.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.records = 0
+        self.crc_errors = 0
+        self.framing_errors = 0
+
+    @property
+    def errors(self):
+        return self.crc_errors + self.framing_errors
+
+    def feed(self, chunk):
+        """Decodes every complete record in chunk.
+
+        Returns (frames, leftover). leftover is None while the stream stays
+        binary; after the record announcing the switch back to ASCII, decoding
+        stops and the bytes that follow it are returned as leftover.
+        """
+        buffer = self.buffer
+        buffer += chunk
+        frames = []
+        start = 0
+        while True:
+            end = buffer.find(b"\x00", start)
+            if end < 0:
+                break
+            encoded = bytes(buffer[start:end])
+            start = end + 1
+            if not encoded:
+                continue
+            frame = self.decode(encoded)
+            if frame is None:
+                continue
+            frames.append(frame)
+            if frame.text == ASCII_MODE_REPLY:
+                leftover = bytes(buffer[start:])
+                buffer.clear()
+                return frames, leftover
+        del buffer[:start]
+        if len(buffer) > MAX_RECORD_LENGTH:
+            self.framing_errors += 1
+            buffer.clear()
+        return frames, None
+
+    def decode(self, encoded):
+        """Decodes one delimited record, returning None if it is corrupted"""
+        try:
+            raw = cobs_decode(encoded)
+        except ValueError:
+            self.framing_errors += 1
+            return None
+        if len(raw) < 3:
+            self.framing_errors += 1
+            return None
+        if crc16(raw[:-2]) != _CRC.unpack_from(raw, len(raw) - 2)[0]:
+            self.crc_errors += 1
+            return None
+        try:
+            frame = decode_record(raw[:-2])
+        except (ValueError, struct.error):
+            self.framing_errors += 1
+            return None
+        self.records += 1
+        return frame
+
+
+class StreamFramer:
+    """Splits a serial byte stream into ASCII lines or binary frames.
+
+    The stream starts in ASCII mode. The BINARY_MODE_REPLY line switches the
+    bytes after it to binary records and the ASCII_MODE_REPLY text record
+    switches back, so a mode change in the middle of a chunk is handled at
+    the exact byte where it happens.
+    """
+
+    MAX_LINE_LENGTH = 4096  # A longer run of bytes without newline is discarded
+
+    def __init__(self, binary=False):
+        self.binary = binary
+        self.buffer = bytearray()  # Pending partial ASCII line
+        self.decoder = BinaryDecoder()
+        self.ascii_errors = 0  # Lines that were not valid ASCII
+        self.overflows = 0
+
+    @property
+    def decode_errors(self):
+        return self.ascii_errors + self.decoder.errors
+
+    def feed(self, chunk):
+        """Returns the complete items in chunk as [(SEGMENT_LINES, lines) | (SEGMENT_FRAMES, frames), ...]"""
+        segments = []
+        while True:
+            if self.binary:
+                frames, leftover = self.decoder.feed(chunk)
+                if frames:
+                    segments.append((SEGMENT_FRAMES, frames))
+            else:
+                lines, leftover = self.feed_ascii(chunk)
+                if lines:
+                    segments.append((SEGMENT_LINES, lines))
+            if leftover is None:
+                return segments
+            self.binary = not self.binary
+            chunk = leftover
+
+    def feed_ascii(self, chunk):
+        """Splits complete lines; returns (lines, leftover) like BinaryDecoder.feed"""
+        buffer = self.buffer
+        buffer += chunk
+        end = buffer.rfind(b"\n")
+        if end < 0:
+            if len(buffer) > self.MAX_LINE_LENGTH:
+                self.overflows += 1
+                buffer.clear()
+            return [], None
+
+        marker = buffer.find(_BINARY_MARKER, 0, end)
+        if marker >= 0:
+            # Everything after the marker line is binary
+            line_end = buffer.find(b"\n", marker)
+            lines = self.split_lines(buffer, line_end)
+            leftover = bytes(buffer[line_end + 1:])
+            buffer.clear()
+            return lines, leftover
+
+        lines = self.split_lines(buffer, end)
+        del buffer[:end + 1]
+        return lines, None
+
+    def split_lines(self, buffer, end):
+        """Decodes buffer[:end] as newline separated text, skipping empty lines"""
+        block = buffer[:end]
+        try:
+            text = block.decode("ascii")
+        except UnicodeDecodeError:
+            # Decode line by line so a single corrupted line does not poison the batch
+            lines = []
+            for raw in block.split(b"\n"):
+                try:
+                    line = raw.decode("ascii")
+                except UnicodeDecodeError:
+                    self.ascii_errors += 1
+                    line = raw.decode("ascii", errors="replace")
+                line = line.strip()
+                if line:
+                    lines.append(line)
+            return lines
+        return [line for line in map(str.strip, text.split("\n")) if line]
+
+
+def main(path):
+    framer = StreamFramer()
+    with open(path, "rb") as f:
+        data = f.read()
+    for kind, items in framer.feed(data):
+        for item in items:
+            if kind == SEGMENT_LINES:
+                print(item)
+            else:
+                print(f"{item.text} @ {item.device_time} us" if item.device_time is not None else item.text)
+    decoder = framer.decoder
+    print(f"{decoder.records} binary records, {decoder.crc_errors} CRC errors, "
+          f"{decoder.framing_errors} framing errors, {framer.ascii_errors} ASCII errors",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python binproto.py <recorded stream>", file=sys.stderr)
+        sys.exit(2)
+    main(sys.argv[1])
@@ -0,0 +1,222 @@
+import math
+import threading
+import time
+from bisect import bisect_right
+
+from tp2parser import FRAME_RX, FRAME_TX
+
+CAN_BITRATE = 125000  # bit/s, as configured in the firmware (CAN_125KBPS)
+MAX_STANDARD_ID = 0x7FF
+
+# Upper edges of the inter-arrival histogram buckets, in seconds (the last bucket is open)
+INTERVAL_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0)
+BUCKET_LABELS = ("<1ms", "<2ms", "<5ms", "<10ms", "<20ms", "<50ms", "<100ms", "<200ms", "<500ms",
+                 "<1s", "<2s", "≥2s")
+
+_BARS = " ▁▂▃▄▅▆▇█"
+_DEVICE_TIME_WRAP = 1 << 32  # The firmware timestamp is a 32 bit micros() counter
+
+
+def frame_bits(can_id, dlc):
+    """(nominal, worst case) bits a data frame occupies on the bus, interframe space included.
+
+    Standard frames have 47 + 8*dlc bits and extended ones 67 + 8*dlc; bit
+    stuffing adds at most one bit every 4 after the first 5 of the stuffed
+    part (SOF to CRC).
+    """
+    if can_id > MAX_STANDARD_ID:
+        nominal, stuffed = 67 + 8 * dlc, 54 + 8 * dlc
+    else:
+        nominal, stuffed = 47 + 8 * dlc, 34 + 8 * dlc
+    return nominal, nominal + (stuffed - 1) // 4
+
+
+def histogram_text(counts):
+    """Compact bar rendering of histogram counts, one character per bucket"""
+    peak = max(counts)
+    if not peak:
+        return " " * len(counts)
+    top = len(_BARS) - 1
+    return "".join(_BARS[math.ceil(top * count / peak)] for count in counts)
+
+
+class IDStats:
+    """Counters of one CAN ID: frames, payload bytes and inter-arrival times.
+
+    Intervals use the firmware timestamps when the frames carry them (binary
+    output) and the batch arrival time otherwise, so in ASCII mode frames
+    read in the same chunk count as simultaneous.
+    """
+
+    __slots__ = ("can_id", "frames", "tx_frames", "payload_bytes", "last_time", "last_device",
+                 "intervals", "mean", "m2", "histogram", "snapshot_frames")
+
+    def __init__(self, can_id):
+        self.can_id = can_id
+        self.frames = 0
+        self.tx_frames = 0
+        self.payload_bytes = 0
+        self.last_time = None
+        self.last_device = False  # Whether last_time is a firmware timestamp (us)
+        self.intervals = 0
+        self.mean = 0.0  # Welford mean and sum of squares of the intervals, seconds
+        self.m2 = 0.0
+        self.histogram = [0] * (len(INTERVAL_BUCKETS) + 1)
+        self.snapshot_frames = 0
+
+    def add_interval(self, interval):
+        self.intervals += 1
+        delta = interval - self.mean
+        self.mean += delta / self.intervals
+        self.m2 += delta * (interval - self.mean)
+        self.histogram[bisect_right(INTERVAL_BUCKETS, interval)] += 1
+
+    @property
+    def jitter(self):
+        """Standard deviation of the inter-arrival time, in seconds"""
+        return math.sqrt(self.m2 / self.intervals) if self.intervals > 1 else 0.0
+
+
+class BusStats:
+    """Per-ID statistics and bus load, updated in O(1) per frame.
+
+    add_frames() is called with every received batch from the reader side;
+    snapshot() is called by the UI at a fixed low rate and is the only place
+    where rates are computed, so the per-frame cost does not depend on how
+    often (or whether) the panel is refreshed. Rates are computed against
+    the wall clock, or against the batch times while replaying (see
+    use_recorded_time()), so a replay shows the recorded rates at any speed.
+    """
+
+    def __init__(self, bitrate=CAN_BITRATE):
+        self.bitrate = bitrate
+        self.lock = threading.Lock()
+        self.recorded = False
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.ids = {}
+            self.frames = 0
+            self.bits = 0        # Nominal bits of all frames seen
+            self.bits_max = 0    # Same with worst case bit stuffing
+            self.batch_time = None  # Time of the latest batch
+            self._restart_snapshots()
+
+    def _restart_snapshots(self):
+        # With recorded time the first batch sets the start (called with the lock held)
+        self._last_snapshot = (None if self.recorded else time.monotonic(), self.bits, self.bits_max)
+        for stats in self.ids.values():
+            stats.snapshot_frames = stats.frames
+
+    def use_recorded_time(self, recorded):
+        """Computes rates against the batch times (True, for replays) or the wall clock (False)"""
+        with self.lock:
+            self.recorded = recorded
+            self.batch_time = None
+            self._restart_snapshots()
+
+    def add_frames(self, now, frames):
+        """Accounts a batch of decoded frames received at time now (seconds)"""
+        with self.lock:
+            if self.recorded and self._last_snapshot[0] is None:
+                self._last_snapshot = (now,) + self._last_snapshot[1:]
+            self.batch_time = now
+            ids = self.ids
+            for frame in frames:
+                kind = frame.kind
+                if kind != FRAME_RX and kind != FRAME_TX:
+                    continue
+                can_id = frame.can_id
+                stats = ids.get(can_id)
+                if stats is None:
+                    stats = ids[can_id] = IDStats(can_id)
+                stats.frames += 1
+                if kind == FRAME_TX:
+                    stats.tx_frames += 1
+                stats.payload_bytes += frame.dlc
+
+                device_time = frame.device_time
+                if device_time is not None:
+                    if stats.last_device:
+                        stats.add_interval(((device_time - stats.last_time) % _DEVICE_TIME_WRAP) / 1e6)
+                    stats.last_time, stats.last_device = device_time, True
+                else:
+                    if stats.last_time is not None and not stats.last_device:
+                        stats.add_interval(max(0.0, now - stats.last_time))
+                    stats.last_time, stats.last_device = now, False
+
+                nominal, worst = frame_bits(can_id, frame.dlc)
+                self.bits += nominal
+                self.bits_max += worst
+                self.frames += 1
+
+    def snapshot(self):
+        """Returns (load, worst case load, rows) since the previous snapshot.
+
+        Loads are fractions of the bitrate; rows are (can_id, frames, tx
+        frames, frames/s, mean interval, jitter, payload bytes, histogram)
+        sorted by ID, times in seconds.
+        """
+        with self.lock:
+            now = self.batch_time if self.recorded else time.monotonic()
+            last_time, last_bits, last_bits_max = self._last_snapshot
+            if last_time is None:
+                # Replay without any batch yet: keep waiting for the first one
+                elapsed = 0.0
+            else:
+                self._last_snapshot = (now, self.bits, self.bits_max)
+                elapsed = now - last_time
+            capacity = self.bitrate * elapsed
+            load = (self.bits - last_bits) / capacity if capacity > 0 else 0.0
+            load_max = (self.bits_max - last_bits_max) / capacity if capacity > 0 else 0.0
+            rows = []
+            for can_id in sorted(self.ids):
+                stats = self.ids[can_id]
+                rate = (stats.frames - stats.snapshot_frames) / elapsed if elapsed > 0 else 0.0
+                stats.snapshot_frames = stats.frames
+                rows.append((can_id, stats.frames, stats.tx_frames, rate, stats.mean, stats.jitter,
+                             stats.payload_bytes, tuple(stats.histogram)))
+        return load, load_max, rows
+
+
+class BusStatsView:
+    """Renders BusStats snapshots into a ttk.Treeview (one row per CAN ID) and a label.
+
+    flush() is meant to be called at a fixed low rate; rows are only sent
+    to Tk when their text changed.
+    """
+
+    def __init__(self, tree, label, stats):
+        self.tree = tree
+        self.label = label
+        self.stats = stats
+        self.items = {}      # can_id -> tree item
+        self.displayed = {}  # can_id -> cells shown
+
+    def reset(self):
+        self.stats.reset()
+        for item in self.items.values():
+            self.tree.delete(item)
+        self.items = {}
+        self.displayed = {}
+        self.label.config(text="")
+
+    def flush(self):
+        load, load_max, rows = self.stats.snapshot()
+        self.label.config(
+            text=f"Bus load ({self.stats.bitrate // 1000} kbps): {100 * load:.1f}% "
+                 f"(≤{100 * load_max:.1f}% with bit stuffing), {len(rows)} IDs")
+        for index, (can_id, frames, tx_frames, rate, mean, jitter, payload, histogram) in enumerate(rows):
+            cells = (f"{can_id:03X}", frames, tx_frames, f"{rate:.1f}",
+                     f"{1000 * mean:.1f}" if frames > 1 else "--",
+                     f"{1000 * jitter:.2f}" if frames > 2 else "--",
+                     payload, histogram_text(histogram))
+            if can_id not in self.items:
+                # Rows are sorted by ID, so a new ID goes at its index
+                self.items[can_id] = self.tree.insert('', index, values=cells)
+            elif self.displayed[can_id] == cells:
+                continue
+            else:
+                self.tree.item(self.items[can_id], values=cells)
+            self.displayed[can_id] = cells
@@ -0,0 +1,235 @@
+# Append-only binary capture of the CAN frames seen by the monitor.
+#
+# Capture file: the 8 byte MAGIC followed by records, little endian:
+#   timestamp(d, host time) can_id(I) dlc(B) direction(B) payload(dlc)
+# Sidecar index (<capture>.idx): (timestamp(d), offset(Q)) pairs, written at
+# most every INDEX_INTERVAL seconds, each pointing at the start of a record.
+#
+# Usage: python capture.py <capture> [start time] prints the records (from the
+# first one at or after start time, a Unix timestamp, if given).
+import bisect
+import os
+import struct
+import sys
+import threading
+from array import array
+from collections import deque, namedtuple
+from datetime import datetime
+
+from tp2parser import FRAME_RX, FRAME_TX
+
+MAGIC = b"CANCAP01"
+INDEX_SUFFIX = ".idx"
+INDEX_INTERVAL = 1.0  # seconds between index entries
+
+DIRECTION_RX = 0
+DIRECTION_TX = 1
+_DIRECTIONS = {FRAME_RX: DIRECTION_RX, FRAME_TX: DIRECTION_TX}
+
+_RECORD = struct.Struct("<dIBB")
+_INDEX_ENTRY = struct.Struct("<dQ")
+
+CaptureRecord = namedtuple("CaptureRecord", "timestamp can_id dlc data direction")
+
+
+def load_index(path):
+    """Returns the (timestamps, offsets) arrays of the sidecar index of path (empty if missing)"""
+    times = array("d")
+    offsets = array("Q")
+    try:
+        with open(path + INDEX_SUFFIX, "rb") as f:
+            data = f.read()
+    except OSError:
+        data = b""
+    # A partially written last entry is ignored
+    data = data[:len(data) - len(data) % _INDEX_ENTRY.size]
+    for timestamp, offset in _INDEX_ENTRY.iter_unpack(data):
+        times.append(timestamp)
+        offsets.append(offset)
+    return times, offsets
+
+
+class CaptureWriter:
+    """Records decoded frames to a capture file from a background thread.
+
+    add_frames() is called from the serial reader thread and only appends the
+    batch to a deque; packing, writing, flushing and indexing happen in the
+    writer thread, which wakes up every flush_interval seconds. Subclasses
+    define other record layouts through magic and encode_batch().
+    """
+
+    magic = MAGIC
+
+    def __init__(self, path, flush_interval=0.25, index_interval=INDEX_INTERVAL, max_pending=10000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.index_interval = index_interval
+        self.max_pending = max_pending  # Batches waiting for the writer before new ones are dropped
+        self.file = open(path, "wb")
+        try:
+            self.file.write(self.magic)
+            self.index_file = open(path + INDEX_SUFFIX, "wb")
+        except OSError:
+            # Leave neither an open handle nor an empty capture behind
+            self.file.close()
+            os.remove(path)
+            raise
+        self.offset = len(self.magic)
+        self.last_index_time = None
+
+        self.pending = deque()
+        self.wakeup = threading.Event()
+        self.running = True
+
+        # Counters (only written by the writer thread, except dropped_batches)
+        self.records = 0
+        self.dropped_batches = 0
+        self.error = None
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    @property
+    def bytes_written(self):
+        return self.offset
+
+    def add_frames(self, timestamp, frames):
+        """Queues a batch of frames received at timestamp (non-CAN frames are skipped later)"""
+        if len(self.pending) >= self.max_pending:
+            self.dropped_batches += 1
+            return
+        self.pending.append((timestamp, frames))
+
+    def run(self):
+        """Writer thread body"""
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            running = self.running
+            try:
+                self.write_pending()
+            except OSError as e:
+                self.error = e
+                break
+            if not running:
+                break
+        self.file.close()
+        self.index_file.close()
+
+    def write_pending(self):
+        pending = self.pending
+        if not pending:
+            return
+        out = bytearray()
+        index = bytearray()
+        records = 0
+        while pending:
+            timestamp, frames = pending.popleft()
+            records += self.encode_batch(timestamp, frames, out, index)
+        if out:
+            self.file.write(out)
+            self.file.flush()
+            self.offset += len(out)
+            self.records += records
+        if index:
+            # Entries only point at records that are already in the file
+            self.index_file.write(index)
+            self.index_file.flush()
+
+    def encode_batch(self, timestamp, frames, out, index):
+        """Appends the records of one batch to out; returns how many were written"""
+        pack = _RECORD.pack
+        directions = _DIRECTIONS
+        records = 0
+        for frame in frames:
+            direction = directions.get(frame.kind)
+            if direction is None:
+                continue
+            self.add_index_entry(timestamp, len(out), index)
+            out += pack(timestamp, frame.can_id, frame.dlc, direction)
+            out += frame.data
+            records += 1
+        return records
+
+    def add_index_entry(self, timestamp, position, index):
+        """Indexes the record starting at position in the pending output, if one is due"""
+        if self.last_index_time is None or timestamp - self.last_index_time >= self.index_interval:
+            self.last_index_time = timestamp
+            index += _INDEX_ENTRY.pack(timestamp, self.offset + position)
+
+    def close(self):
+        """Writes everything still queued and closes the files"""
+        self.running = False
+        self.wakeup.set()
+        self.thread.join()
+
+
+class CaptureReader:
+    """Sequential reader of a capture file, with time seeks through the index"""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        if self.file.read(len(MAGIC)) != MAGIC:
+            self.file.close()
+            raise ValueError(f"{path} is not a capture file")
+        self.index_times, self.index_offsets = load_index(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    def __iter__(self):
+        while True:
+            record = self.read_record()
+            if record is None:
+                return
+            yield record
+
+    def read_record(self):
+        """Returns the next record, or None at the end (or a truncated last record)"""
+        header = self.file.read(_RECORD.size)
+        if len(header) < _RECORD.size:
+            return None
+        timestamp, can_id, dlc, direction = _RECORD.unpack(header)
+        data = self.file.read(dlc)
+        if len(data) < dlc:
+            return None
+        return CaptureRecord(timestamp, can_id, dlc, data, direction)
+
+    def seek_time(self, timestamp):
+        """Positions the reader on the first record at or after timestamp.
+
+        The index gives the last indexed record before timestamp, so at most
+        INDEX_INTERVAL seconds of records are scanned. Returns the file offset.
+        """
+        i = bisect.bisect_right(self.index_times, timestamp) - 1
+        offset = self.index_offsets[i] if i >= 0 else len(MAGIC)
+        self.file.seek(offset)
+        while True:
+            record = self.read_record()
+            if record is None or record.timestamp >= timestamp:
+                break
+            offset = self.file.tell()
+        self.file.seek(offset)
+        return offset
+
+
+def main(path, start_time=None):
+    with CaptureReader(path) as reader:
+        if start_time is not None:
+            reader.seek_time(start_time)
+        for record in reader:
+            when = datetime.fromtimestamp(record.timestamp).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+            direction = "TX" if record.direction == DIRECTION_TX else "RX"
+            print(f"{when} {direction} {record.can_id:03X} [{record.dlc}] {record.data.hex(' ').upper()}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python capture.py <capture> [start time]", file=sys.stderr)
+        sys.exit(2)
+    main(sys.argv[1], float(sys.argv[2]) if len(sys.argv) == 3 else None)
@@ -0,0 +1,302 @@
+# Emulator of the arducanmon firmware on a Linux pseudo-terminal.
+#
+# Speaks the same serial protocol as fw/arducanmon (commands, replies, CAN_RX_
+# and CAN_TX_OK_ lines, binary output mode) and simulates up to 8 TP2 nodes
+# sending R/C/O angles, so the GUI can be load tested without hardware:
+#
+#   python emulator.py --rate 20 --burst 200 --burst-interval 5
+#
+# then connect the GUI to the printed /dev/pts/N device.
+import argparse
+import heapq
+import os
+import random
+import select
+import sys
+import time
+import tty
+
+from binproto import (encode_can_record, encode_text_record, RECORD_CAN_RX, RECORD_CAN_TX,
+                      CMD_OUTPUT_BINARY, CMD_OUTPUT_ASCII, BINARY_MODE_REPLY, ASCII_MODE_REPLY)
+from tp2parser import format_rx_line, format_tx_line
+
+TP2_BASE_ID = 0x100
+TP2_MAGNITUDES = "RCO"
+CMD_MAX_LEN = 63  # Same limit as the firmware command buffer
+
+
+def tp2_payload(magnitude, angle):
+    """Payload of a TP2 angle frame: the type character followed by the value in ASCII"""
+    return (magnitude + str(angle)).encode("ascii")[:8]
+
+
+class TP2Node:
+    """One simulated TP2 group; its angles follow a bounded random walk"""
+
+    def __init__(self, group, rate, rng):
+        self.can_id = TP2_BASE_ID + group
+        self.rate = rate  # Frames per second per magnitude
+        self.rng = rng
+        self.angles = {mag: rng.randint(-179, 180) for mag in TP2_MAGNITUDES}
+
+    def next_payload(self, magnitude):
+        angle = self.angles[magnitude] + self.rng.randint(-5, 5)
+        # Orientation wraps, roll and pitch saturate (TP2 range: -179 to 180)
+        if magnitude == 'O':
+            angle = (angle + 179) % 360 - 179
+        else:
+            angle = max(-179, min(180, angle))
+        self.angles[magnitude] = angle
+        return tp2_payload(magnitude, angle)
+
+
+class FirmwareEmulator:
+    """Serves the firmware protocol on the master side of a pseudo-terminal.
+
+    The master is non-blocking: output the pty does not take (no client, or
+    one that stopped reading) is dropped and counted, like a real adapter
+    that keeps transmitting, so the node schedules never stall.
+    """
+
+    def __init__(self, fd, nodes, burst=0, burst_interval=1.0, loopback=False, verbose=False):
+        self.fd = fd
+        os.set_blocking(fd, False)
+        self.nodes = nodes
+        self.burst = burst
+        self.burst_interval = burst_interval
+        self.loopback = loopback
+        self.verbose = verbose
+        self.binary = False
+        self.auto_send = False
+        self.command = bytearray()
+        self.overflow = False
+        self.out = bytearray()
+        self.start = time.monotonic()
+
+        # Counters
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.bytes_dropped = 0  # Output the pty did not take
+        self.commands = 0
+
+    def micros(self):
+        return int((time.monotonic() - self.start) * 1e6) & 0xFFFFFFFF
+
+    def reply(self, text):
+        if self.binary:
+            self.out += encode_text_record(text)
+        else:
+            self.out += text.encode("ascii") + b"\r\n"
+
+    def emit_can(self, record_type, can_id, data):
+        if self.binary:
+            self.out += encode_can_record(record_type, can_id, data, self.micros())
+        else:
+            line = format_rx_line(can_id, data) if record_type == RECORD_CAN_RX else format_tx_line(can_id, data)
+            self.out += line.encode("latin-1") + b"\r\n"
+        self.frames_sent += 1
+
+    def receive(self, can_id, data):
+        """A frame from another node (only seen in normal mode)"""
+        if not self.loopback:
+            self.emit_can(RECORD_CAN_RX, can_id, data)
+
+    def transmit(self, can_id, data):
+        """A frame sent by the monitor; in loopback mode it is also received"""
+        if self.loopback:
+            self.emit_can(RECORD_CAN_RX, can_id, data)
+
+    def flush(self):
+        if self.out:
+            out = self.out
+            sent = 0
+            with memoryview(out) as view:
+                while sent < len(out):
+                    try:
+                        sent += os.write(self.fd, view[sent:])
+                    except OSError:
+                        # Pty buffer full (BlockingIOError) or no client: the rest is lost
+                        break
+            self.bytes_sent += sent
+            self.bytes_dropped += len(out) - sent
+            out.clear()
+
+    def feed(self, data):
+        """Splits incoming bytes into commands like cmd_feed() in the firmware"""
+        for byte in data:
+            if byte == 0x0A:
+                if self.overflow:
+                    self.overflow = False
+                    self.command.clear()
+                    self.reply("CMD_OVERFLOW")
+                    continue
+                cmd = self.command.decode("ascii", errors="replace").rstrip("\r ").lstrip(" ")
+                self.command.clear()
+                if cmd:
+                    self.process_command(cmd)
+            elif not self.overflow:
+                if len(self.command) >= CMD_MAX_LEN:
+                    self.overflow = True
+                else:
+                    self.command.append(byte)
+
+    def process_command(self, cmd):
+        self.commands += 1
+        if self.verbose:
+            print(f"< {cmd}", file=sys.stderr)
+        if cmd.startswith("SEND_"):
+            parsed = self.parse_send(cmd[5:])
+            if parsed is None:
+                self.reply("CMD_INVALID")
+                return
+            can_id, data = parsed
+            self.emit_can(RECORD_CAN_TX, can_id, data)
+            self.transmit(can_id, data)
+        elif cmd == "MODE_NORMAL":
+            self.loopback = False
+            self.reply("MODE_SET_NORMAL")
+        elif cmd == "MODE_LOOPBACK":
+            self.loopback = True
+            self.reply("MODE_SET_LOOPBACK")
+        elif cmd == "AUTO_ON":
+            self.auto_send = True
+            self.reply("AUTO_SEND_ON")
+        elif cmd == "AUTO_OFF":
+            self.auto_send = False
+            self.reply("AUTO_SEND_OFF")
+        elif cmd == CMD_OUTPUT_BINARY:
+            # The confirmation is the last ASCII line
+            self.out += BINARY_MODE_REPLY.encode("ascii") + b"\r\n"
+            self.binary = True
+        elif cmd == CMD_OUTPUT_ASCII:
+            self.reply(ASCII_MODE_REPLY)
+            self.binary = False
+        elif cmd.startswith("TP2_ANGLE_"):
+            parts = cmd[10:].split("_", 1)
+            if len(parts) != 2 or len(parts[0]) != 1 or not parts[1]:
+                self.reply("CMD_INVALID")
+                return
+            data = (parts[0] + parts[1]).encode("ascii", errors="replace")[:8]
+            self.transmit(TP2_BASE_ID, data)
+            self.reply("TP2_ANGLE_SENT_OK")
+        else:
+            self.reply("UNKNOWN_COMMAND")
+
+    @staticmethod
+    def parse_send(args):
+        """SEND_ arguments (ID_B1_B2_...) -> (can_id, data) or None, like cmd_parse_send()"""
+        fields = args.split("_")
+        try:
+            can_id = int(fields[0], 16)
+            data = bytes(int(field, 16) for field in fields[1:])
+        except ValueError:
+            return None
+        if len(data) > 8 or can_id > 0xFFFFFFFF:
+            return None
+        return can_id, data
+
+    def run(self, duration=None, stats_interval=5.0):
+        self.out += b"CAN_INIT_OK\n\r\nCAN BaudRate: 125kbps\nMCP2515 Clock: 8MHz\nTP2_CAN_MONITOR_READY\r\n"
+        self.flush()
+
+        # (due time, group, magnitude) of the next frame of every node/magnitude
+        now = time.monotonic()
+        schedule = [(now + node.rng.random() / node.rate, group, mag)
+                    for group, node in enumerate(self.nodes) if node.rate > 0 for mag in TP2_MAGNITUDES]
+        heapq.heapify(schedule)
+        next_burst = now + self.burst_interval if self.burst else None
+        next_stats = now + stats_interval
+        end = now + duration if duration else None
+        last_frames, last_bytes, last_time = 0, 0, now
+
+        while end is None or now < end:
+            timeout = 0.1
+            if schedule:
+                timeout = min(timeout, max(0.0, schedule[0][0] - now))
+            readable, _, _ = select.select([self.fd], [], [], timeout)
+            if readable:
+                try:
+                    self.feed(os.read(self.fd, 4096))
+                except OSError:
+                    pass  # No process has the slave side open right now
+
+            now = time.monotonic()
+            while schedule and schedule[0][0] <= now:
+                due, group, mag = schedule[0]
+                node = self.nodes[group]
+                self.receive(node.can_id, node.next_payload(mag))
+                due += 1.0 / node.rate
+                if due < now - 1.0:
+                    due = now  # Do not try to catch up after a long stall
+                heapq.heapreplace(schedule, (due, group, mag))
+
+            if next_burst is not None and now >= next_burst:
+                next_burst += self.burst_interval
+                for i in range(self.burst):
+                    node = self.nodes[i % len(self.nodes)]
+                    self.receive(node.can_id, node.next_payload(TP2_MAGNITUDES[i // len(self.nodes) % 3]))
+
+            self.flush()
+
+            if now >= next_stats:
+                elapsed = now - last_time
+                print(f"{(self.frames_sent - last_frames) / elapsed:.0f} frames/s, "
+                      f"{(self.bytes_sent - last_bytes) / elapsed / 1024:.1f} kB/s, "
+                      f"{self.bytes_dropped / 1024:.1f} kB dropped, "
+                      f"{self.commands} commands, {'binary' if self.binary else 'ASCII'}, "
+                      f"{'loopback' if self.loopback else 'normal'}", file=sys.stderr)
+                last_frames, last_bytes, last_time = self.frames_sent, self.bytes_sent, now
+                next_stats = now + stats_interval
+
+
+def parse_node_rates(values, nodes, rate):
+    """[--node-rate G=HZ, ...] -> list of rates per group"""
+    rates = [rate] * nodes
+    for value in values:
+        group, _, hz = value.partition("=")
+        rates[int(group)] = float(hz)
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulates the arducanmon firmware on a pseudo-terminal")
+    parser.add_argument("--nodes", type=int, default=8, choices=range(1, 9), metavar="1-8",
+                        help="number of simulated TP2 groups (0x100..)")
+    parser.add_argument("--rate", type=float, default=10.0,
+                        help="frames per second of each node and magnitude (default 10)")
+    parser.add_argument("--node-rate", action="append", default=[], metavar="G=HZ",
+                        help="rate of one group, e.g. 3=50 (can be repeated)")
+    parser.add_argument("--loopback", action="store_true", help="start in loopback mode")
+    parser.add_argument("--burst", type=int, default=0, help="frames injected back to back in each burst")
+    parser.add_argument("--burst-interval", type=float, default=1.0, help="seconds between bursts")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for repeatable angles")
+    parser.add_argument("--verbose", action="store_true", help="print received commands")
+    args = parser.parse_args()
+
+    try:
+        rates = parse_node_rates(args.node_rate, args.nodes, args.rate)
+    except (ValueError, IndexError):
+        parser.error("--node-rate expects G=HZ with G in 0..nodes-1")
+
+    rng = random.Random(args.seed)
+    nodes = [TP2Node(group, rate, rng) for group, rate in enumerate(rates)]
+
+    master, slave = os.openpty()
+    tty.setraw(slave)  # No echo or newline translation, like a USB serial port
+    print(f"Emulated arducanmon on {os.ttyname(slave)}", file=sys.stderr)
+
+    emulator = FirmwareEmulator(master, nodes, burst=args.burst, burst_interval=args.burst_interval,
+                                loopback=args.loopback, verbose=args.verbose)
+    try:
+        emulator.run(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # The slave stays open until here so the port survives GUI reconnects
+        os.close(slave)
+        os.close(master)
+
+
+if __name__ == "__main__":
+    main()
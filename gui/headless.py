@@ -0,0 +1,205 @@
+# Headless monitor: the GUI's serial reader and TP2 decoder without Tk/matplotlib.
+#
+# Writes every received frame to stdout or a file (and optionally to a
+# capture/session file) and prints statistics to stderr, for logging boxes
+# without a display:
+#
+#   python headless.py /dev/ttyACM0 --output can.log --session can.cansession
+#   python headless.py --list
+import argparse
+import json
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+
+import serial
+import serial.tools.list_ports
+
+from binproto import CMD_OUTPUT_BINARY, CMD_OUTPUT_ASCII
+from capture import CaptureWriter
+from replay import SessionWriter
+from serialreader import SerialReader
+from tp2parser import parse_lines, tp2_group, FRAME_RX
+
+SERIAL_BAUDRATE = 921600  # Same as main.py
+OUTPUT_FORMATS = ("text", "jsonl", "none")
+
+
+def format_text(timestamp, frames):
+    """One "<date time.ms> <firmware line>" line per frame"""
+    prefix = datetime.fromtimestamp(timestamp).isoformat(sep=" ", timespec="milliseconds") + " "
+    return "".join(prefix + frame.text + "\n" for frame in frames)
+
+
+def format_jsonl(timestamp, frames):
+    """One JSON object per frame (fields that do not apply are left out)"""
+    out = []
+    for frame in frames:
+        record = {"t": round(timestamp, 6), "kind": frame.kind}
+        if frame.can_id is not None:
+            record["id"] = frame.can_id
+            record["data"] = frame.data.hex()
+        if frame.angle_type is not None:
+            record["angle"] = [frame.angle_type, frame.angle_value]
+        if frame.device_time is not None:
+            record["device_us"] = frame.device_time
+        record["text"] = frame.text
+        out.append(json.dumps(record, separators=(",", ":")))
+        out.append("\n")
+    return "".join(out)
+
+
+class HeadlessMonitor:
+    """Connects a SerialReader to the decoder and the outputs"""
+
+    def __init__(self, port, output, output_format="text", writers=(), tp2_only=False):
+        self.port = port
+        self.output = output
+        self.format = {"text": format_text, "jsonl": format_jsonl}.get(output_format)
+        self.writers = list(writers)  # CaptureWriter / SessionWriter
+        self.tp2_only = tp2_only
+        self.lock = threading.Lock()  # Output writes vs. periodic flushes
+        self.reader = SerialReader(port, self.on_lines, on_error=self.on_error, on_frames=self.on_frames)
+        self.error = None
+
+        # Counters (written by the reader thread)
+        self.frames_total = 0
+        self.tp2_counts = [0] * 8
+
+    def on_lines(self, lines):
+        self.on_frames(parse_lines(lines))
+
+    def on_frames(self, frames):
+        now = time.time()
+        for writer in self.writers:
+            writer.add_frames(now, frames)
+
+        counts = self.tp2_counts
+        tp2_frames = []
+        for frame in frames:
+            if frame.kind == FRAME_RX and frame.angle_type is not None:
+                group = tp2_group(frame)
+                if group is not None:
+                    counts[group] += 1
+                    tp2_frames.append(frame)
+        self.frames_total += len(frames)
+
+        if self.format is not None:
+            text = self.format(now, tp2_frames if self.tp2_only else frames)
+            if text:
+                with self.lock:
+                    self.output.write(text)
+
+    def on_error(self, error):
+        self.error = error
+
+    def flush(self):
+        with self.lock:
+            self.output.flush()
+
+    def stats_line(self, elapsed, last):
+        """Returns the statistics line since the previous (frames, bytes) snapshot"""
+        frames, bytes_total = self.frames_total, self.reader.bytes_total
+        rate = (frames - last[0]) / elapsed
+        byte_rate = (bytes_total - last[1]) / elapsed
+        groups = " ".join(f"G{group}:{count}" for group, count in enumerate(self.tp2_counts) if count)
+        text = (f"{rate:.0f} frames/s, {byte_rate / 1024:.1f} kB/s "
+                f"({100 * byte_rate / (SERIAL_BAUDRATE / 10):.1f}% of link), "
+                f"{frames} frames, {self.reader.decode_errors} decode errors")
+        if groups:
+            text += f", TP2 {groups}"
+        for writer in self.writers:
+            text += f", {writer.path}: {writer.records} records"
+            if writer.dropped_batches:
+                text += f" ({writer.dropped_batches} batches dropped)"
+        return text, (frames, bytes_total)
+
+
+def list_ports():
+    for port in serial.tools.list_ports.comports():
+        print(f"{port.device}\t{port.description}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless TP2 CAN monitor (no GUI)")
+    parser.add_argument("port", nargs="?", help="serial port of the arducanmon adapter")
+    parser.add_argument("--list", action="store_true", help="list serial ports and exit")
+    parser.add_argument("--baudrate", type=int, default=SERIAL_BAUDRATE)
+    parser.add_argument("--output", default="-", help="frame output file ('-' = stdout)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="text", help="frame output format")
+    parser.add_argument("--tp2-only", action="store_true", help="only output TP2 angle frames")
+    parser.add_argument("--capture", help="also record a binary capture (.cancap)")
+    parser.add_argument("--session", help="also record a replayable session (.cansession)")
+    parser.add_argument("--binary", action="store_true", help="switch the firmware to binary output")
+    parser.add_argument("--stats-interval", type=float, default=10.0, help="seconds between statistics (0 = off)")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    args = parser.parse_args()
+
+    if args.list:
+        list_ports()
+        return 0
+    if not args.port:
+        parser.error("a serial port is required (see --list)")
+
+    try:
+        port = serial.Serial(args.port, args.baudrate, timeout=1)
+    except serial.SerialException as e:
+        print(f"Could not open {args.port}: {e}", file=sys.stderr)
+        return 1
+
+    output = sys.stdout if args.output == "-" else open(args.output, "a", buffering=1024 * 1024)
+    writers = []
+    if args.capture:
+        writers.append(CaptureWriter(args.capture))
+    if args.session:
+        writers.append(SessionWriter(args.session))
+    monitor = HeadlessMonitor(port, output, args.format, writers, args.tp2_only)
+
+    # SIGTERM (service stop) ends the run like Ctrl+C
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+
+    monitor.reader.start()
+    if args.binary:
+        port.write(f"{CMD_OUTPUT_BINARY}\n".encode("ascii"))
+    print(f"Monitoring {args.port} @ {args.baudrate} bps", file=sys.stderr)
+
+    start = last_stats = time.monotonic()
+    snapshot = (0, 0)
+    try:
+        while not stop.wait(1.0):
+            monitor.flush()
+            now = time.monotonic()
+            if monitor.error is not None:
+                print(f"Read error: {monitor.error}", file=sys.stderr)
+                break
+            if args.stats_interval and now - last_stats >= args.stats_interval:
+                text, snapshot = monitor.stats_line(now - last_stats, snapshot)
+                print(text, file=sys.stderr)
+                last_stats = now
+            if args.duration is not None and now - start >= args.duration:
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.binary:
+            try:
+                port.write(f"{CMD_OUTPUT_ASCII}\n".encode("ascii"))
+                time.sleep(0.2)
+            except serial.SerialException:
+                pass
+        monitor.reader.stop()
+        monitor.reader.thread.join()
+        port.close()
+        for writer in writers:
+            writer.close()
+        monitor.flush()
+        if output is not sys.stdout:
+            output.close()
+    return 0 if monitor.error is None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+import asyncio
+import concurrent.futures
+import os
+import sys
+import threading
+import time
+
+from serialreader import SerialReader
+
+# The selector event loop can watch serial port file descriptors on POSIX only;
+# on Windows the ports keep a blocking reader thread each (SerialReader).
+LOOP_READERS = sys.platform != "win32"
+
+READ_SIZE = 65536  # Bytes taken from the port per readiness callback
+# Bytes a port may have queued for writing (about 90 ms of the 921600 baud link)
+MAX_PENDING_BYTES = 8192
+
+
+class IOEngine:
+    """asyncio event loop in one background thread that owns the serial I/O.
+
+    Port reads are readiness callbacks on the port file descriptors, writes
+    are non-blocking and resumed by writer callbacks, and timed transmissions
+    run as tasks, so any number of ports and schedules share a single thread
+    that only wakes up when there is something to do. Results reach Tk in
+    batches through the UI queue, as before.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+
+    def start(self):
+        ready = threading.Event()
+
+        def run():
+            if LOOP_READERS:
+                self.loop = asyncio.SelectorEventLoop()
+            else:
+                self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            ready.set()
+            self.loop.run_forever()
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run, name="io-engine", daemon=True)
+        self.thread.start()
+        ready.wait()
+
+    def stop(self):
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=1.0)
+
+    def in_loop(self):
+        return threading.current_thread() is self.thread
+
+    def call_soon(self, callback, *args):
+        """Runs callback(*args) in the loop thread (safe from any thread)"""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def call(self, callback, *args, timeout=2.0):
+        """Runs callback(*args) in the loop thread and returns its result"""
+        if self.in_loop():
+            return callback(*args)
+        future = concurrent.futures.Future()
+
+        def run():
+            try:
+                future.set_result(callback(*args))
+            except Exception as e:
+                future.set_exception(e)
+
+        self.loop.call_soon_threadsafe(run)
+        return future.result(timeout)
+
+    def submit(self, coro):
+        """Schedules a coroutine as a task of the loop; returns a concurrent Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def reader(self, port, on_lines, on_error=None, on_frames=None):
+        """A reader for port: an EngineReader on POSIX, a SerialReader thread otherwise"""
+        if LOOP_READERS:
+            return EngineReader(self, port, on_lines, on_error=on_error, on_frames=on_frames)
+        return SerialReader(port, on_lines, on_error=on_error, on_frames=on_frames)
+
+    def writer(self, port, on_error=None):
+        return PortWriter(self, port, on_error)
+
+
+class EngineReader(SerialReader):
+    """SerialReader driven by the event loop instead of a thread.
+
+    The port descriptor is switched to non-blocking mode and watched with
+    loop.add_reader(); each readiness callback takes what is available in one
+    os.read(). Counters, framing and callbacks are those of SerialReader.
+    """
+
+    def __init__(self, engine, port, on_lines, on_error=None, on_frames=None):
+        super().__init__(port, on_lines, on_error=on_error, on_frames=on_frames)
+        self.engine = engine
+        self.fd = port.fileno()
+
+    def start(self):
+        self.running = True
+        os.set_blocking(self.fd, False)
+        self.engine.call(self.engine.loop.add_reader, self.fd, self.on_readable)
+
+    def stop(self):
+        """Stops watching the port; returns once the loop no longer uses the descriptor"""
+        if self.running:
+            self.running = False
+            self.engine.call(self.engine.loop.remove_reader, self.fd)
+
+    def on_readable(self):
+        try:
+            chunk = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            chunk, error = None, e
+        else:
+            error = OSError("Port closed")
+        if chunk:
+            self.handle_chunk(chunk)
+            return
+        # EOF or error: the device went away
+        self.running = False
+        self.engine.loop.remove_reader(self.fd)
+        if self.on_error:
+            self.on_error(error)
+
+
+class PortWriter:
+    """Write side of a port, owned by the engine: the single writer of the port.
+
+    write() may be called from any thread and only appends to a bounded
+    buffer; one flush callback per loop iteration sends everything pending in
+    a single write, and when the port does not take it all the rest goes out
+    from a writer readiness callback. A command that would take more than
+    max_pending bytes waiting is dropped and counted; write() never blocks,
+    as it is called from the Tk and loop threads.
+    """
+
+    def __init__(self, engine, port, on_error=None, max_pending=MAX_PENDING_BYTES):
+        self.engine = engine
+        self.port = port
+        self.on_error = on_error  # Called from the loop thread with the exception
+        self.max_pending = max_pending
+        self.fd = port.fileno() if LOOP_READERS else None
+        self.lock = threading.RLock()
+        self.buffer = bytearray()
+        self.in_flight = 0      # Bytes taken out of the buffer by a blocking write (Windows)
+        self.scheduled = False  # Flush callback pending
+        self.waiting = False    # Writer readiness callback registered
+        self.closed = False
+
+        # Counters
+        self.commands_total = 0
+        self.dropped = 0
+        self.bytes_written = 0
+        self.writes = 0  # os.write()/port.write() calls, <= commands_total thanks to coalescing
+        self.max_depth = 0
+        self._last_snapshot = (time.monotonic(), 0)
+
+    def depth(self):
+        """Bytes queued and not yet taken by the port"""
+        return len(self.buffer) + self.in_flight
+
+    def write(self, data):
+        """Queues data for the port; returns False if it was dropped because the queue is full"""
+        with self.lock:
+            if self.closed or self.depth() + len(data) > self.max_pending:
+                self.dropped += 1
+                return False
+            self.buffer += data
+            self.commands_total += 1
+            self.max_depth = max(self.max_depth, self.depth())
+            if self.scheduled or self.waiting:
+                return True
+            self.scheduled = True
+        self.engine.call_soon(self.flush)
+        return True
+
+    def flush(self):
+        """Writes everything pending in one call (loop thread)"""
+        if self.fd is None:
+            self.flush_blocking()
+            return
+        with self.lock:
+            self.scheduled = False
+            if not self.buffer or self.closed:
+                self.stop_waiting()
+                return
+            try:
+                written = os.write(self.fd, self.buffer)
+            except BlockingIOError:
+                written = 0
+            except OSError as e:
+                self.fail(e)
+                return
+            if written:
+                self.writes += 1
+                self.bytes_written += written
+                del self.buffer[:written]
+            if self.buffer and not self.waiting:
+                self.waiting = True
+                self.engine.loop.add_writer(self.fd, self.flush)
+            elif not self.buffer:
+                self.stop_waiting()
+
+    def flush_blocking(self):
+        """Windows: no descriptor readiness, so the loop thread does a blocking write"""
+        with self.lock:
+            self.scheduled = False
+            data = bytes(self.buffer)
+            self.buffer.clear()
+            self.in_flight = len(data)
+        if not data:
+            return
+        try:
+            self.port.write(data)
+        except Exception as e:
+            with self.lock:
+                self.in_flight = 0
+                self.fail(e)
+            return
+        with self.lock:
+            self.in_flight = 0
+            self.writes += 1
+            self.bytes_written += len(data)
+
+    def fail(self, error):
+        """Drops what is pending after a write error (called with the lock held)"""
+        self.dropped += 1
+        self.buffer.clear()
+        self.stop_waiting()
+        if self.on_error:
+            self.on_error(error)
+
+    def stop_waiting(self):
+        if self.waiting:
+            self.waiting = False
+            self.engine.loop.remove_writer(self.fd)
+
+    def snapshot(self):
+        """Returns bytes/s written since the previous snapshot"""
+        now = time.monotonic()
+        last_time, last_bytes = self._last_snapshot
+        bytes_written = self.bytes_written
+        self._last_snapshot = (now, bytes_written)
+        elapsed = now - last_time
+        return (bytes_written - last_bytes) / elapsed if elapsed > 0 else 0.0
+
+    def close(self):
+        """Drops pending data; returns once the loop no longer uses the descriptor"""
+        def close():
+            with self.lock:
+                self.closed = True
+                self.buffer.clear()
+                self.stop_waiting()
+        self.engine.call(close)
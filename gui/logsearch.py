@@ -0,0 +1,427 @@
+import re
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+import numpy as np
+
+# Message kinds that can be searched with "type:<kind>"
+SEARCH_KINDS = ("rx", "tx", "status", "cmd", "system", "error")
+FRAME_KINDS = ("rx", "tx")
+ANGLE_TYPES = "RCO"
+
+# Frame lines, optionally prefixed with "[adapter] " when several adapters are open
+_CAN_ID = re.compile(r"(?:\[[^\]]*\] )?CAN_(RX|TX_OK)_([0-9A-Fa-f]+)_")
+_FILTER = re.compile(r"(?:^|\s)(id|type):(\S*)")
+
+
+def parse_id_set(text):
+    """Parses "100-107, 1FF" (hex, optional 0x) into a set of CAN IDs; empty text gives None"""
+    ids = set()
+    for item in text.replace(";", ",").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        first, _, last = item.partition("-")
+        try:
+            first = int(first, 16)
+            last = int(last, 16) if last else first
+        except ValueError:
+            raise ValueError(f"Bad CAN ID range '{item}' (use hex, e.g. 100-107)") from None
+        if last < first or last - first > 0x7FF:
+            raise ValueError(f"Bad CAN ID range '{item}'")
+        ids.update(range(first, last + 1))
+    return ids or None
+
+
+def parse_query(query):
+    """Splits "id:101 type:rx text" into (text, can_id, kind); raises ValueError on bad filters"""
+    can_id = kind = None
+    for name, value in _FILTER.findall(query):
+        if name == "id":
+            try:
+                can_id = int(value, 16)
+            except ValueError:
+                raise ValueError(f"Bad CAN ID '{value}' (use hex, e.g. id:101)") from None
+        elif value not in SEARCH_KINDS:
+            raise ValueError(f"Unknown type '{value}' (use {', '.join(SEARCH_KINDS)})")
+        else:
+            kind = value
+    return _FILTER.sub(" ", query).strip(), can_id, kind
+
+
+class _Block:
+    """Log lines joined into one string for C-speed scanning.
+
+    Index blocks hold consecutive records from first_seq; the blocks built for
+    filtered searches list the sequence number of every line in seqs.
+    """
+
+    __slots__ = ("first_seq", "last_seq", "seqs", "text", "starts")
+
+    def __init__(self, first_seq, texts, seqs=None):
+        self.first_seq = first_seq
+        self.last_seq = first_seq + len(texts) - 1 if seqs is None else seqs[-1]
+        self.seqs = seqs
+        self.text = "\n".join(texts)
+        # Offset in text where every line starts
+        starts = array("I", [0]) * len(texts)
+        offset = 0
+        for i, line in enumerate(texts):
+            starts[i] = offset
+            offset += len(line) + 1
+        self.starts = starts
+
+
+class _WholeLines:
+    """Matches of a filter-only search: every candidate record, whole line"""
+
+    def __init__(self, seqs, log):
+        self.seqs = seqs  # numpy array of sequence numbers
+        self.log = log
+
+    def __getitem__(self, i):
+        seq = int(self.seqs[i])
+        return seq, 0, len(self.log.text(seq))
+
+
+class SearchResult:
+    """Matches of one query as (seq, column, length), in log order.
+
+    The search only lists the blocks to look at; count_pending() counts them
+    in time-bounded slices, so a slow regex over a full log never blocks the
+    caller for long, and len() is the number of matches counted so far.
+    Positions inside a block are located the first time navigation reaches
+    it and then cached, so stepping through the matches never rescans the
+    log.
+    """
+
+    def __init__(self, pattern, regex, log=None):
+        self.pattern = pattern
+        self.regex = regex
+        self.log = log
+        self.chunks = []  # [block, matches or None, first line, per line]
+        self.ends = []    # Cumulative match count at the end of each chunk
+        self.pending = deque()  # (block, first line, seqs): blocks still to count
+
+    def __len__(self):
+        return self.ends[-1] if self.ends else 0
+
+    @property
+    def complete(self):
+        return not self.pending
+
+    def add(self, block, count, matches=None, first_line=0, per_line=False):
+        if count:
+            self.chunks.append([block, matches, first_line, per_line])
+            self.ends.append(len(self) + count)
+
+    def defer(self, block, first_line=0, seqs=None):
+        """Queues a block to count (block=None: build it from the records seqs when counted)"""
+        self.pending.append((block, first_line, seqs))
+
+    def count_pending(self, budget=None):
+        """Counts queued blocks for about budget seconds (None: all of them); True once complete"""
+        deadline = None if budget is None else time.perf_counter() + budget
+        pending = self.pending
+        while pending:
+            block, first_line, seqs = pending.popleft()
+            if block is None:
+                # Filtered candidates: skip what the log evicted since the search started
+                seqs = seqs[bisect_left(seqs, self.log.first_seq):]
+                if not seqs:
+                    continue
+                block = _Block(seqs[0], [self.log.text(seq) for seq in seqs], seqs)
+            matches, per_line = count(block, self.pattern, self.regex, first_line)
+            self.add(block, matches, first_line=first_line, per_line=per_line)
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        return not pending
+
+    def __getitem__(self, i):
+        if i < 0:
+            self.count_pending()
+            i += len(self)
+        while i >= len(self) and self.pending:
+            self.count_pending(0)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        chunk = bisect_right(self.ends, i)
+        start = self.ends[chunk - 1] if chunk else 0
+        block, matches, first_line, per_line = self.chunks[chunk]
+        if matches is None:
+            matches = self.chunks[chunk][1] = locate(block, self.pattern, self.regex, first_line, per_line)
+        return matches[i - start]
+
+    def first_at_or_after(self, seq):
+        """Index of the first match in a record >= seq (len(self) if none)"""
+        self.count_pending()
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self[mid][0] < seq:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+def _line_end(block, line):
+    starts = block.starts
+    return starts[line + 1] - 1 if line + 1 < len(starts) else len(block.text)
+
+
+def _regex_matches(block, pattern, first_line):
+    """Yields (line, start, end) of the regex matches in a block, none spanning two records.
+
+    The block is scanned as a whole; when a match runs over a newline, the
+    lines it touched are matched again one by one and the scan resumes on
+    the line after them.
+    """
+    text, starts = block.text, block.starts
+    finditer = pattern.finditer
+    pos = starts[first_line]
+    while pos is not None:
+        resume = None
+        for m in finditer(text, pos):
+            start, end = m.span()
+            line = bisect_right(starts, start) - 1
+            if text.find("\n", start, end) == -1:
+                yield line, start, end
+                continue
+            last = bisect_right(starts, end - 1) - 1
+            for m in finditer(text, start, _line_end(block, line)):
+                yield line, m.start(), m.end()
+            for line in range(line + 1, last + 1):
+                for m in finditer(text, starts[line], _line_end(block, line)):
+                    yield line, m.start(), m.end()
+            resume = starts[last + 1] if last + 1 < len(starts) else None
+            break
+        pos = resume
+
+
+def count(block, pattern, regex, first_line=0):
+    """Returns (matches in the block from first_line on, whether they must be located record by record).
+
+    Regex matches may not span two records. A whole block is counted in C
+    with subn(); only if a match swallowed a newline (or the block is
+    partially evicted) are the matches walked with _regex_matches().
+    """
+    text = block.text
+    if not regex:
+        return text.count(pattern, block.starts[first_line]), False
+    if not first_line:
+        remaining, matches = pattern.subn("", text)
+        if remaining.count("\n") == len(block.starts) - 1:
+            return matches, False
+    return sum(1 for _ in _regex_matches(block, pattern, first_line)), True
+
+
+def locate(block, pattern, regex, first_line=0, per_line=False):
+    """Returns the (seq, column, length) of every match of pattern in a block, from first_line on"""
+    text, starts, first_seq = block.text, block.starts, block.first_seq
+    matches = []
+    if regex and per_line:
+        for line, start, end in _regex_matches(block, pattern, first_line):
+            matches.append((first_seq + line, start - starts[line], end - start))
+    elif regex:
+        for m in pattern.finditer(text):
+            offset = m.start()
+            line = bisect_right(starts, offset) - 1
+            matches.append((first_seq + line, offset - starts[line], m.end() - offset))
+    else:
+        length = len(pattern)
+        offset = text.find(pattern, starts[first_line])
+        while offset != -1:
+            line = bisect_right(starts, offset) - 1
+            matches.append((first_seq + line, offset - starts[line], length))
+            offset = text.find(pattern, offset + length)
+    if block.seqs is not None:
+        seqs = block.seqs
+        matches = [(seqs[seq - first_seq], column, length) for seq, column, length in matches]
+    return matches
+
+
+class LogSearchIndex:
+    """Search index over a MessageLog, maintained as records are appended.
+
+    Lines are grouped in blocks of BLOCK_LINES joined strings (with line start
+    offsets), so plain and regex searches run over a few large strings instead
+    of a million small ones. Postings (sorted sequence numbers) per CAN ID and
+    per message kind answer "id:" and "type:" filters without scanning.
+    Records evicted from the log are ignored at query time and dropped from
+    the index as blocks are sealed.
+    """
+
+    BLOCK_LINES = 4096
+
+    def __init__(self, log):
+        self.log = log
+        self.clear()
+
+    def clear(self):
+        self.blocks = []
+        self.open_first = self.log.next_seq
+        self.open_texts = []
+        self.id_postings = {}  # (CAN ID, "rx"/"tx", TP2 angle type or "") -> sequence numbers
+        self.kind_postings = {kind: array("q") for kind in SEARCH_KINDS}
+
+    def add(self, first_seq, records):
+        """Indexes records (ts, text, tag) that the log stored from sequence number first_seq"""
+        if first_seq != self.open_first + len(self.open_texts):
+            # Records were missed (e.g. the log was cleared): start over from here
+            self.clear()
+            self.open_first = first_seq
+        match_id = _CAN_ID.match
+        kinds = self.kind_postings
+        ids = self.id_postings
+        open_texts = self.open_texts
+        seq = first_seq
+        for _, text, tag in records:
+            if tag == "rx_msg":
+                m = match_id(text)
+                if m is None:
+                    kind = "status"
+                else:
+                    kind = "rx" if m.group(1) == "RX" else "tx"
+                    angle = text.find("_TP2_", m.end())
+                    angle = text[angle + 5:angle + 6] if angle != -1 else ""
+                    key = (int(m.group(2), 16), kind, angle)
+                    postings = ids.get(key)
+                    if postings is None:
+                        postings = ids[key] = array("q")
+                    postings.append(seq)
+            elif tag == "tx_msg":
+                kind = "cmd"
+            else:
+                kind = tag if tag in kinds else "system"
+            kinds[kind].append(seq)
+
+            open_texts.append(text)
+            seq += 1
+            if len(open_texts) >= self.BLOCK_LINES:
+                self.seal()
+                open_texts = self.open_texts
+
+    def seal(self):
+        """Turns the open lines into a block and drops what the log has evicted"""
+        self.blocks.append(_Block(self.open_first, self.open_texts))
+        self.open_first += len(self.open_texts)
+        self.open_texts = []
+
+        first_seq = self.log.first_seq
+        while self.blocks and self.blocks[0].last_seq < first_seq:
+            self.blocks.pop(0)
+        for postings in list(self.kind_postings.values()) + list(self.id_postings.values()):
+            evicted = bisect_left(postings, first_seq)
+            if evicted:
+                del postings[:evicted]
+
+    def select(self, can_ids=None, kinds=None, angles=None, since=0):
+        """Sorted sequence numbers (numpy int64) of the retained records >= since that match.
+
+        kinds limits the message kinds; can_ids and angles (sets, None = any)
+        restrict the selection to CAN frames with those IDs / TP2 angle types.
+        Only postings are read, no text is looked at.
+        """
+        if can_ids is None and angles is None:
+            lists = [self.kind_postings[kind] for kind in (SEARCH_KINDS if kinds is None else kinds)]
+        else:
+            frame_kinds = FRAME_KINDS if kinds is None else kinds
+            lists = [postings for (can_id, kind, angle), postings in self.id_postings.items()
+                     if kind in frame_kinds and (can_ids is None or can_id in can_ids)
+                     and (angles is None or angle in angles)]
+        since = max(since, self.log.first_seq)
+        parts = [np.frombuffer(postings, dtype=np.int64) for postings in lists if postings]
+        parts = [part[np.searchsorted(part, since):] for part in parts]
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        if len(parts) == 1:
+            return parts[0].copy()
+        return np.sort(np.concatenate(parts), kind="stable")
+
+    def search(self, query, regex=False):
+        """Prepares a query ("[id:<hex>] [type:<kind>] [text]"); raises ValueError/re.error on bad input.
+
+        Nothing is scanned yet: the result counts its blocks when asked to
+        (SearchResult.count_pending(), or on access).
+        """
+        text, can_id, kind = parse_query(query)
+        pattern = re.compile(text, re.MULTILINE) if regex else text
+        log = self.log
+        result = SearchResult(pattern, regex, log)
+
+        if can_id is not None or kind is not None:
+            # Filtered: only the lines listed in the postings are looked at
+            seqs = self.select({can_id} if can_id is not None else None,
+                               (kind,) if kind is not None else None)
+            if not text:
+                # Without a text every candidate line is a match
+                result.add(None, len(seqs), _WholeLines(seqs, log))
+                return result
+            seqs = seqs.tolist()
+            step = self.BLOCK_LINES
+            for i in range(0, len(seqs), step):
+                result.defer(None, seqs=seqs[i:i + step])
+            return result
+
+        if not text:
+            return result
+        first_seq = log.first_seq
+        blocks = list(self.blocks)
+        if self.open_texts:
+            blocks.append(_Block(self.open_first, self.open_texts))
+        for block in blocks:
+            if block.last_seq >= first_seq:
+                # Partially evicted blocks are only searched from the first retained line
+                result.defer(block, max(0, first_seq - block.first_seq))
+        return result
+
+
+class LogFilter:
+    """Sequence numbers of the log records that pass a filter, kept up to date from the index.
+
+    The selection is computed from the postings when the filter is created;
+    update() only appends what the index received since, so a LogView can show
+    the filtered records without touching the others. Rows (positions in the
+    selection) stay valid when evicted records are dropped from its head.
+    """
+
+    def __init__(self, index, can_ids=None, kinds=None, angles=None):
+        self.index = index
+        self.can_ids = can_ids
+        self.kinds = kinds
+        self.angles = angles
+        self.reset()
+
+    def reset(self):
+        self.seqs = array("q", self.index.select(self.can_ids, self.kinds, self.angles).tobytes())
+        self.dropped = 0  # Rows removed from the head of seqs
+        self.next_seq = self.index.log.next_seq
+
+    def update(self):
+        """Appends the matching records stored since the last call"""
+        log = self.index.log
+        if log.next_seq == self.next_seq:
+            return
+        new = self.index.select(self.can_ids, self.kinds, self.angles, since=self.next_seq)
+        self.seqs.frombytes(new.tobytes())
+        self.next_seq = log.next_seq
+        # Drop the evicted head once it is a sizeable part of the list
+        evicted = bisect_left(self.seqs, log.first_seq)
+        if evicted > 4096 and evicted > len(self.seqs) // 2:
+            del self.seqs[:evicted]
+            self.dropped += evicted
+
+    def row_range(self):
+        """First and end row of the retained records that pass the filter"""
+        return self.dropped + bisect_left(self.seqs, self.index.log.first_seq), self.dropped + len(self.seqs)
+
+    def row_of(self, seq):
+        """Row of a record, or of the next one that passes the filter"""
+        return self.dropped + bisect_left(self.seqs, seq)
+
+    def seqs_between(self, start, stop):
+        """Sequence numbers of rows [start, stop)"""
+        return self.seqs[start - self.dropped:stop - self.dropped]
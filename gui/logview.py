@@ -0,0 +1,144 @@
+import tkinter as tk
+from tkinter import ttk
+import tkinter.font as tkfont
+
+from msglog import format_log_timestamp, TIMESTAMP_WIDTH
+
+
+class LogView(ttk.Frame):
+    """Virtualized viewer for a MessageLog.
+
+    Only the lines that fit in the widget are inserted into the Text; scrolling
+    re-renders that window from the ring buffer, so the widget holds a constant
+    number of lines no matter how many records are retained.
+
+    Positions are "rows": sequence numbers of the log, or indices into the
+    sorted sequence numbers of a LogFilter when one is set.
+    """
+
+    def __init__(self, parent, log, **kwargs):
+        super().__init__(parent)
+        self.log = log
+
+        self.text = tk.Text(self, wrap=tk.NONE, **kwargs)
+        self.vbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.hbar = ttk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.text.xview)
+        self.text.configure(xscrollcommand=self.hbar.set, state=tk.DISABLED)
+
+        self.text.grid(row=0, column=0, sticky="nsew")
+        self.vbar.grid(row=0, column=1, sticky="ns")
+        self.hbar.grid(row=1, column=0, sticky="ew")
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.line_height = max(1, tkfont.Font(font=self.text.cget("font")).metrics("linespace"))
+        self.visible_lines = int(kwargs.get("height", 20))
+        self.filter = None  # LogFilter whose records are shown instead of all of them
+        self.top_row = 0
+        self.highlight = None  # (seq, column, length) of the highlighted match
+        self._rendered = None  # (top, stop, highlight) of the current widget contents
+
+        self.text.bind("<Configure>", self.on_resize)
+        # The wheel scrolls records, not the (always short) widget contents
+        self.text.bind("<MouseWheel>", lambda e: self.on_wheel(-3 if e.delta > 0 else 3))
+        self.text.bind("<Button-4>", lambda e: self.on_wheel(-3))
+        self.text.bind("<Button-5>", lambda e: self.on_wheel(3))
+        self.text.bind("<Prior>", lambda e: self.on_wheel(-self.visible_lines))
+        self.text.bind("<Next>", lambda e: self.on_wheel(self.visible_lines))
+
+    def on_resize(self, event):
+        """Recomputes how many lines fit when the widget changes size"""
+        visible = max(1, event.height // self.line_height)
+        if visible != self.visible_lines:
+            self.visible_lines = visible
+            self.render(self.top_row, force=True)
+
+    def on_wheel(self, lines):
+        self.render(self.top_row + lines)
+        return "break"
+
+    def row_range(self):
+        """First and end row of the retained records (of the filter, if any)"""
+        if self.filter is None:
+            return self.log.first_seq, self.log.next_seq
+        return self.filter.row_range()
+
+    def row_of(self, seq):
+        """Row of a record (the next shown one if the filter hides it)"""
+        return seq if self.filter is None else self.filter.row_of(seq)
+
+    def seqs_between(self, start, stop):
+        if self.filter is None:
+            return range(start, stop)
+        return self.filter.seqs_between(start, stop)
+
+    def set_filter(self, log_filter):
+        """Shows only the records of a LogFilter (None shows everything), keeping the top record in view"""
+        first, end = self.row_range()
+        top_seq = self.seqs_between(max(first, min(self.top_row, end - 1)), end)[:1]
+        self.filter = log_filter
+        self.top_row = self.row_of(top_seq[0]) if top_seq else 0
+        self.render(self.top_row, force=True)
+
+    def on_scrollbar(self, action, value, unit=None):
+        """Maps scrollbar commands to rows"""
+        if action == tk.MOVETO:
+            first, end = self.row_range()
+            top = first + int(float(value) * (end - first))
+        else:
+            step = self.visible_lines if unit == tk.PAGES else 1
+            top = self.top_row + int(value) * step
+        self.render(top)
+
+    def refresh(self):
+        """Re-renders the current window (after appends or evictions)"""
+        self.render(self.top_row)
+
+    def see_end(self):
+        """Shows the newest records"""
+        self.render(self.row_range()[1] - self.visible_lines)
+
+    def see(self, seq):
+        """Scrolls so that the given record is roughly centered"""
+        self.render(self.row_of(seq) - self.visible_lines // 2)
+
+    def set_highlight(self, seq, column=0, length=0):
+        """Highlights part of a record's text (seq=None removes the highlight)"""
+        self.highlight = None if seq is None else (seq, column, length)
+        self.render(self.top_row, force=True)
+
+    def render(self, top, force=False):
+        """Materializes the records starting at row top into the widget"""
+        log = self.log
+        first, end = self.row_range()
+        top = max(first, min(top, end - self.visible_lines))
+        stop = min(end, top + self.visible_lines)
+        self.top_row = top
+
+        key = (top, stop, self.highlight, self.filter)
+        if force or key != self._rendered:
+            self._rendered = key
+            args = []
+            seqs = self.seqs_between(top, stop)
+            for seq in seqs:
+                ts, text, tag = log.get(seq)
+                args.extend((format_log_timestamp(ts) + " ", "timestamp", text + "\n", tag))
+
+            xview = self.text.xview()[0]
+            self.text.configure(state=tk.NORMAL)
+            self.text.delete("1.0", tk.END)
+            if args:
+                self.text.insert("1.0", *args)
+            if self.highlight and self.highlight[0] in seqs:
+                seq, column, length = self.highlight
+                row = self.row_of(seq) - top + 1
+                column += TIMESTAMP_WIDTH
+                self.text.tag_add("search_highlight", f"{row}.{column}", f"{row}.{column + length}")
+            self.text.configure(state=tk.DISABLED)
+            self.text.xview_moveto(xview)
+
+        total = end - first
+        if total:
+            self.vbar.set((top - first) / total, (stop - first) / total)
+        else:
+            self.vbar.set(0.0, 1.0)
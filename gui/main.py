@@ -1,22 +1,75 @@
 import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
+from tkinter import ttk, messagebox, filedialog
 import serial
 import serial.tools.list_ports
-import threading
 import time
 import re
 import platform
 import os
 import random
 import math
+import threading
+from functools import partial
 from datetime import datetime
-from collections import deque
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
-import matplotlib.animation as animation
 import numpy as np
 
+from msglog import format_log_timestamp
+from logview import LogView
+from adapters import Adapter, FrameMerger, adapter_name
+from ioengine import IOEngine
+from txsched import TXScheduler, TXStream, TP2_MIN_INTERVAL
+from tp2parser import parse_line
+from binproto import CMD_OUTPUT_BINARY, CMD_OUTPUT_ASCII
+from capture import CaptureWriter
+from pipeline import ReceivePipeline
+from tp2table import TP2TableView
+from busstats import BusStatsView
+from tp2check import VIOLATION_KINDS, MAX_VIOLATIONS
+import profiling
+from replay import SessionWriter, ReplaySource, SESSION_EXTENSION
+from logsearch import LogFilter, parse_id_set
+
+SERIAL_BAUDRATE = 921600
+
+# Retention options for the message log: label -> (max lines, max bytes)
+LOG_RETENTION_OPTIONS = {
+    "10k lines": (10000, None),
+    "100k lines": (100000, None),
+    "1M lines": (1000000, None),
+    "50 MB": (5000000, 50 * 1024 * 1024),
+    "200 MB": (20000000, 200 * 1024 * 1024),
+}
+DEFAULT_LOG_RETENTION = "100k lines"
+
+# Replay speeds: label -> multiple of real time (None = as fast as possible)
+REPLAY_SPEEDS = {"1x": 1.0, "2x": 2.0, "10x": 10.0, "100x": 100.0, "Max": None}
+DEFAULT_REPLAY_SPEED = "1x"
+
+# Share of one core the plot window may spend drawing
+PLOT_CPU_BUDGETS = {"10%": 0.10, "25%": 0.25, "50%": 0.50, "100%": 1.0}
+DEFAULT_PLOT_CPU_BUDGET = "25%"
+
+# Selectable plot time windows: label -> seconds
+PLOT_TIME_WINDOWS = {
+    "30 s": 30,
+    "2 min": 120,
+    "10 min": 600,
+    "30 min": 1800,
+    "1 h": 3600,
+    "4 h": 14400,
+}
+DEFAULT_PLOT_TIME_WINDOW = "30 s"
+
+# Hot path timers shown in the diagnostics window (read and parse are timed in serialreader/adapters)
+_log_view_stage = profiling.stage("log view")
+_table_view_stage = profiling.stage("table view")
+_plots_stage = profiling.stage("plots")
+_plot_draw_stage = profiling.stage("plot draw")
+DIAGNOSTICS_INTERVAL = 1000  # ms between diagnostics window refreshes
+
 class ScrollableFrame(ttk.Frame):
     """Un marco con capacidad de desplazamiento vertical y horizontal."""
     def __init__(self, container, *args, **kwargs):
@@ -97,7 +150,39 @@ class PlotWindow:
         self.window.title("Real-time Angle Data Plot")
         self.window.geometry("1000x700")  # Tamaño más pequeño para pantallas de baja resolución
         self.data_source = data_source
-        self.time_window = 30  # seconds
+        self.time_window_var = tk.StringVar(value=DEFAULT_PLOT_TIME_WINDOW)
+        self.time_window = PLOT_TIME_WINDOWS[DEFAULT_PLOT_TIME_WINDOW]  # seconds
+        self.use_blit = tk.BooleanVar(value=True)
+
+        # Redraw scheduling: frames are only drawn when the plot store changed;
+        # the interval adapts so drawing stays within the selected CPU budget
+        self.cpu_budget = tk.StringVar(value=DEFAULT_PLOT_CPU_BUDGET)
+        self.min_interval = 50    # ms (20 FPS)
+        self.idle_interval = 250  # ms between checks while nothing changes
+        self.max_interval = 1000  # ms
+        self.refresh_interval = self.min_interval
+        self.frame_time_avg = 0.0
+        self.seen_store_version = None
+        self.force_update = True   # Enabled series changed, re-check every line
+        self.full_redraw = False   # Repaint everything (after being hidden)
+        self.iconic = False
+        self.obscured = False
+        self.paused = False
+        self.timer = None
+
+        # The x axis is "seconds since the window was opened" and only slides in
+        # steps, so between steps a line only changes when it receives samples
+        self.t_origin = time.time()
+        self.x_step = self.time_window / 10
+        self.x_end = self.x_step
+        self.drawn_versions = {}  # (group, mag) -> store version currently drawn (None = empty)
+        self.nonempty = set()     # (group, mag) of the lines that currently have points
+        self.backgrounds = {}     # mag -> cached axes background (without the lines)
+
+        # Frame statistics for the readout
+        self.frames_drawn = 0
+        self.frame_time_total = 0.0
+        self.stats_time = time.monotonic()
 
         # Group/magnitude selection state
         self.group_vars = [tk.BooleanVar(value=True) for _ in range(8)]
@@ -113,9 +198,14 @@ class PlotWindow:
         
         self.setup_controls()
         self.setup_plots()
+        self.plot_keys = [(group, mag) for mag in ['R', 'C', 'O'] for group in range(8)]
 
-        self.ani = animation.FuncAnimation(
-            self.fig, self.update_plots, interval=100, blit=False)
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        # Stop drawing while the window is minimized or completely covered
+        self.window.bind('<Unmap>', self.on_unmap)
+        self.window.bind('<Map>', self.on_map)
+        self.canvas.get_tk_widget().bind('<Visibility>', self.on_visibility)
+        self.schedule(self.min_interval)
 
         self.window.protocol("WM_DELETE_WINDOW", self.on_close)
 
@@ -152,6 +242,26 @@ class PlotWindow:
         ttk.Button(btns_frame, text="All Magnitudes", command=self.select_all_mags).pack(fill=tk.X)
         ttk.Button(btns_frame, text="No Magnitudes", command=self.deselect_all_mags).pack(fill=tk.X)
 
+        # Rendering options and frame time readout
+        render_frame = ttk.LabelFrame(control_frame, text="Rendering")
+        render_frame.pack(side=tk.LEFT, padx=5, pady=5)
+        window_frame = ttk.Frame(render_frame)
+        window_frame.pack(anchor=tk.W)
+        ttk.Label(window_frame, text="Time window:").pack(side=tk.LEFT)
+        window_combo = ttk.Combobox(window_frame, textvariable=self.time_window_var,
+                                    values=list(PLOT_TIME_WINDOWS), state="readonly", width=7)
+        window_combo.pack(side=tk.LEFT)
+        window_combo.bind("<<ComboboxSelected>>", self.on_time_window_selected)
+        ttk.Checkbutton(render_frame, text="Blitting", variable=self.use_blit,
+                        command=self.on_blit_toggle).pack(anchor=tk.W)
+        budget_frame = ttk.Frame(render_frame)
+        budget_frame.pack(anchor=tk.W)
+        ttk.Label(budget_frame, text="CPU budget:").pack(side=tk.LEFT)
+        ttk.Combobox(budget_frame, textvariable=self.cpu_budget, values=list(PLOT_CPU_BUDGETS),
+                     state="readonly", width=6).pack(side=tk.LEFT)
+        self.fps_label = ttk.Label(render_frame, text="-- FPS", width=30)
+        self.fps_label.pack(anchor=tk.W)
+
     def setup_plots(self):
         self.fig = Figure(figsize=(10, 7), dpi=100)
         self.axes = {}
@@ -168,12 +278,14 @@ class PlotWindow:
             ax.grid(True)
             ax.axhline(y=0, color='k', linestyle='--', alpha=0.3)
             if mag == 'O':
-                ax.set_xlabel("Time (seconds)")
+                ax.set_xlabel("Time since opened (seconds)")
+            ax.set_xlim(self.x_end - self.time_window, self.x_end)
             self.axes[mag] = ax
             self.lines[mag] = {}
             for group in range(8):
                 # Each group gets a line per magnitude, now with dots
-                line, = ax.plot([], [], color=colors[group % len(colors)], label=f"G{group}", marker='o')
+                line, = ax.plot([], [], color=colors[group % len(colors)], label=f"G{group}", marker='o',
+                                animated=self.use_blit.get())
                 self.lines[mag][group] = line
             ax.legend(loc='upper right', fontsize='small', ncol=4)
 
@@ -188,14 +300,14 @@ class PlotWindow:
             if not self.group_vars[i].get():
                 for mag in ['R', 'C', 'O']:
                     self.magnitude_vars[mag][i].set(False)
-        self.canvas.draw_idle()
+        self.request_redraw()
 
     def on_mag_toggle(self):
         # If any magnitude for a group is enabled, enable the group
         for i in range(8):
             if any(self.magnitude_vars[mag][i].get() for mag in ['R', 'C', 'O']):
                 self.group_vars[i].set(True)
-        self.canvas.draw_idle()
+        self.request_redraw()
 
     def select_all_groups(self):
         for var in self.group_vars:
@@ -203,7 +315,7 @@ class PlotWindow:
         for mag in ['R', 'C', 'O']:
             for var in self.magnitude_vars[mag]:
                 var.set(True)
-        self.canvas.draw_idle()
+        self.request_redraw()
 
     def deselect_all_groups(self):
         for var in self.group_vars:
@@ -211,7 +323,7 @@ class PlotWindow:
         for mag in ['R', 'C', 'O']:
             for var in self.magnitude_vars[mag]:
                 var.set(False)
-        self.canvas.draw_idle()
+        self.request_redraw()
 
     def select_all_mags(self):
         for mag in ['R', 'C', 'O']:
@@ -220,36 +332,292 @@ class PlotWindow:
         for i in range(8):
             if any(self.magnitude_vars[mag][i].get() for mag in ['R', 'C', 'O']):
                 self.group_vars[i].set(True)
-        self.canvas.draw_idle()
+        self.request_redraw()
 
     def deselect_all_mags(self):
         for mag in ['R', 'C', 'O']:
             for var in self.magnitude_vars[mag]:
                 var.set(False)
-        self.canvas.draw_idle()
+        self.request_redraw()
 
-    def update_plots(self, frame):
-        now = time.time()
+    def on_blit_toggle(self):
+        blit = self.use_blit.get()
         for mag in ['R', 'C', 'O']:
-            ax = self.axes[mag]
-            for group in range(8):
-                line = self.lines[mag][group]
-                if self.group_vars[group].get() and self.magnitude_vars[mag][group].get():
-                    data = self.data_source.get_plot_data(group)[mag]
-                    filtered = [(t, v) for t, v in data if now - t <= self.time_window]
-                    if filtered:
-                        times, values = zip(*filtered)
-                        rel_times = [now - t for t in times]
-                        line.set_data(rel_times, values)
-                        ax.set_xlim(self.time_window, 0)
-                    else:
-                        line.set_data([], [])
-                else:
-                    line.set_data([], [])
-        return [self.lines[mag][g] for mag in ['R', 'C', 'O'] for g in range(8)]
+            for line in self.lines[mag].values():
+                line.set_animated(blit)
+        self.backgrounds = {}
+        self.canvas.draw_idle()
+
+    def on_draw(self, event):
+        """Caches the static background of every axes after a full draw and puts the lines back"""
+        if not self.use_blit.get():
+            self.backgrounds = {}
+            return
+        self.backgrounds = {mag: self.canvas.copy_from_bbox(ax.bbox) for mag, ax in self.axes.items()}
+        for mag, ax in self.axes.items():
+            for line in self.lines[mag].values():
+                ax.draw_artist(line)
+        self.canvas.blit(self.fig.bbox)
+
+    def blit_axes(self, mag):
+        """Redraws the lines of one axes over its cached background"""
+        ax = self.axes[mag]
+        self.canvas.restore_region(self.backgrounds[mag])
+        for line in self.lines[mag].values():
+            ax.draw_artist(line)
+        self.canvas.blit(ax.bbox)
+
+    def schedule(self, delay):
+        self.timer = self.window.after(int(delay), self.tick)
+
+    def request_redraw(self):
+        """Re-checks every line on the next frame (the enabled series changed)"""
+        self.force_update = True
+        if self.timer is not None:
+            self.window.after_cancel(self.timer)
+            self.timer = self.window.after_idle(self.tick)
+
+    def on_unmap(self, event):
+        if event.widget is self.window:
+            self.iconic = True
+            self.update_paused()
+
+    def on_map(self, event):
+        if event.widget is self.window:
+            self.iconic = False
+            self.update_paused()
+
+    def on_visibility(self, event):
+        self.obscured = event.state == 'VisibilityFullyObscured'
+        self.update_paused()
+
+    def update_paused(self):
+        paused = self.iconic or self.obscured
+        if paused == self.paused:
+            return
+        self.paused = paused
+        if paused:
+            if self.timer is not None:
+                self.window.after_cancel(self.timer)
+                self.timer = None
+            self.fps_label.config(text="Paused (window hidden)")
+        else:
+            self.full_redraw = True
+            self.schedule(0)
+
+    def on_time_window_selected(self, event=None):
+        self.time_window = PLOT_TIME_WINDOWS[self.time_window_var.get()]
+        self.x_step = self.time_window / 10
+        self.x_end = time.time() - self.t_origin + self.x_step
+        for ax in self.axes.values():
+            ax.set_xlim(self.x_end - self.time_window, self.x_end)
+        # Every line must be sliced (and possibly decimated) again
+        self.drawn_versions = {key: None for key in self.drawn_versions}
+        self.full_redraw = True
+        self.request_redraw()
+
+    def update_plots(self):
+        """Updates the line data; returns (x axis moved, set of magnitudes with changed lines)"""
+        elapsed = time.time() - self.t_origin
+        moved = elapsed > self.x_end
+        if moved:
+            while self.x_end < elapsed:
+                self.x_end += self.x_step
+            for ax in self.axes.values():
+                ax.set_xlim(self.x_end - self.time_window, self.x_end)
+
+        enabled = [(group, mag) for group, mag in self.plot_keys
+                   if self.group_vars[group].get() and self.magnitude_vars[mag][group].get()]
+        # Only series that received samples since they were last drawn are sliced
+        t0 = self.t_origin + self.x_end - self.time_window
+        seen = self.drawn_versions if not moved else {}
+        # Decimated to about one point per horizontal pixel
+        max_points = max(100, int(self.axes['R'].bbox.width))
+        changed = self.data_source.plot_store.changed_windows(enabled, t0, seen, max_points)
+
+        dirty = set()
+        for key, (version, times, values, decimated) in changed.items():
+            group, mag = key
+            line = self.lines[mag][group]
+            line.set_data(times - self.t_origin, values)
+            # Dots only make sense for individual samples
+            line.set_marker('' if decimated else 'o')
+            self.drawn_versions[key] = version
+            if len(times):
+                self.nonempty.add(key)
+            else:
+                self.nonempty.discard(key)
+            dirty.add(mag)
+        enabled = set(enabled)
+        for key, version in self.drawn_versions.items():
+            if version is not None and key not in enabled:
+                group, mag = key
+                self.lines[mag][group].set_data([], [])
+                self.drawn_versions[key] = None
+                self.nonempty.discard(key)
+                dirty.add(mag)
+        return moved, dirty
+
+    def tick(self):
+        self.timer = None
+        if self.paused:
+            return
+        store_version = self.data_source.plot_store.version
+        if (store_version == self.seen_store_version and not self.force_update and not self.full_redraw
+                and not (self.nonempty and time.time() - self.t_origin > self.x_end)):
+            # Nothing new to show: just check again a bit later
+            self.update_frame_stats()
+            self.schedule(self.idle_interval)
+            return
+
+        start = time.perf_counter()
+        self.seen_store_version = store_version
+        self.force_update = False
+        moved, dirty = self.update_plots()
+        drawing = time.perf_counter()
+        _plots_stage.add(drawing - start)
+        if moved or dirty or self.full_redraw:
+            if not self.use_blit.get() or moved or self.full_redraw or not self.backgrounds:
+                # Full redraw; with blitting on_draw() refreshes the cached backgrounds
+                self.canvas.draw()
+            else:
+                for mag in dirty:
+                    self.blit_axes(mag)
+            self.full_redraw = False
+            _plot_draw_stage.add(time.perf_counter() - drawing)
+            frame_time = time.perf_counter() - start
+            self.frames_drawn += 1
+            self.frame_time_total += frame_time
+            self.frame_time_avg = 0.8 * self.frame_time_avg + 0.2 * frame_time
+        self.update_frame_stats()
+
+        # Wait long enough for drawing to use at most the CPU budget
+        budget = PLOT_CPU_BUDGETS.get(self.cpu_budget.get(), 0.25)
+        interval = 1000 * self.frame_time_avg / budget
+        self.refresh_interval = max(self.min_interval, min(self.max_interval, interval))
+        self.schedule(self.refresh_interval)
+
+    def update_frame_stats(self):
+        now = time.monotonic()
+        elapsed = now - self.stats_time
+        if elapsed < 1.0:
+            return
+        if self.frames_drawn:
+            frame_ms = 1000 * self.frame_time_total / self.frames_drawn
+            self.fps_label.config(text=f"{self.frames_drawn / elapsed:.1f} FPS, {frame_ms:.1f} ms/frame, "
+                                       f"every {self.refresh_interval:.0f} ms")
+        else:
+            self.fps_label.config(text="Idle (no new data)")
+        self.frames_drawn = 0
+        self.frame_time_total = 0.0
+        self.stats_time = now
 
     def on_close(self):
-        self.ani.event_source.stop()
+        if self.timer is not None:
+            self.window.after_cancel(self.timer)
+        self.window.destroy()
+
+class DiagnosticsWindow:
+    """Stage timings, process CPU% and the sampling profiler of the running monitor"""
+
+    def __init__(self, parent, app):
+        self.window = tk.Toplevel(parent)
+        self.window.title("Diagnostics")
+        self.window.geometry("720x360")
+        self.app = app
+        self.profiler = None  # SamplingProfiler while one is running
+
+        self.cpu_label = ttk.Label(self.window, text="")
+        self.cpu_label.pack(anchor=tk.W, padx=10, pady=5)
+
+        columns = ('stage', 'calls', 'total', 'mean', 'p99', 'max', 'share')
+        self.tree = ttk.Treeview(self.window, columns=columns, show='headings', height=10)
+        for column, text, width in (('stage', 'Stage', 100), ('calls', 'Calls', 80), ('total', 'Total (ms)', 90),
+                                    ('mean', 'Mean (µs)', 80), ('p99', 'p99 (µs)', 80), ('max', 'Max (ms)', 80),
+                                    ('share', '% time', 70)):
+            self.tree.heading(column, text=text)
+            self.tree.column(column, width=width, anchor=tk.CENTER)
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=10)
+        self.items = {}
+
+        btn_frame = ttk.Frame(self.window)
+        btn_frame.pack(fill=tk.X, padx=10, pady=5)
+        ttk.Button(btn_frame, text="Reset", command=self.reset).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="Dump...", command=self.dump).pack(side=tk.LEFT, padx=2)
+        self.profile_btn = ttk.Button(btn_frame, text="Start Profiler", command=self.toggle_profiler)
+        self.profile_btn.pack(side=tk.LEFT, padx=2)
+        self.profile_label = ttk.Label(btn_frame, text="", foreground="gray")
+        self.profile_label.pack(side=tk.LEFT, padx=5)
+
+        self.window.protocol("WM_DELETE_WINDOW", self.on_close)
+        profiling.cpu_percent()
+        self.timer = None
+        self.refresh()
+
+    def refresh(self):
+        elapsed, cpu, rows = profiling.snapshot()
+        self.cpu_label.config(
+            text=f"Process CPU: {profiling.cpu_percent():.1f}% now, "
+                 f"{100 * cpu / elapsed if elapsed else 0:.1f}% over {elapsed:.0f} s")
+        for name, calls, total, mean, p99, longest in rows:
+            cells = (name, calls, f"{1000 * total:.1f}", f"{1e6 * mean:.1f}", f"{1e6 * p99:.1f}",
+                     f"{1000 * longest:.2f}", f"{100 * total / elapsed if elapsed else 0:.2f}")
+            if name in self.items:
+                self.tree.item(self.items[name], values=cells)
+            else:
+                self.items[name] = self.tree.insert('', 'end', values=cells)
+        if self.profiler is not None:
+            self.profile_label.config(text=f"Sampling: {self.profiler.samples} samples")
+        self.timer = self.window.after(DIAGNOSTICS_INTERVAL, self.refresh)
+
+    def reset(self):
+        profiling.reset()
+
+    def dump(self):
+        path = filedialog.asksaveasfilename(
+            parent=self.window, title="Save stage timings", defaultextension=".txt",
+            initialfile=datetime.now().strftime("canmon_timings_%Y%m%d_%H%M%S.txt"))
+        if not path:
+            return
+        try:
+            profiling.dump(path)
+        except OSError as e:
+            messagebox.showerror("Error Saving Timings", str(e), parent=self.window)
+            return
+        self.app.log_message(f"Stage timings saved: {path}", "system")
+
+    def toggle_profiler(self):
+        """Starts sampling every thread's stack, or stops and saves the collapsed stacks"""
+        if self.profiler is None:
+            self.profiler = profiling.SamplingProfiler()
+            self.profiler.start()
+            self.profile_btn.config(text="Stop Profiler...")
+            return
+        profiler = self.profiler
+        self.profiler = None
+        profiler.stop()
+        self.profile_btn.config(text="Start Profiler")
+        self.profile_label.config(text=f"{profiler.samples} samples")
+        path = filedialog.asksaveasfilename(
+            parent=self.window, title="Save profile (collapsed stacks)", defaultextension=".folded",
+            initialfile=datetime.now().strftime("canmon_profile_%Y%m%d_%H%M%S.folded"))
+        if not path:
+            return
+        try:
+            profiler.write(path)
+        except OSError as e:
+            messagebox.showerror("Error Saving Profile", str(e), parent=self.window)
+            return
+        top = ", ".join(f"{function} {100 * samples / profiler.samples:.0f}%"
+                        for function, samples in profiler.top(3)) if profiler.samples else ""
+        self.app.log_message(f"Profile saved: {path} ({profiler.samples} samples; top: {top})", "system")
+
+    def on_close(self):
+        if self.profiler is not None:
+            self.profiler.stop()
+            self.profiler = None
+        if self.timer is not None:
+            self.window.after_cancel(self.timer)
         self.window.destroy()
 
 class CanMonitorApp:
@@ -259,17 +627,23 @@ class CanMonitorApp:
         self.root.geometry("1000x700")
         
         # Variables
-        self.serial_port = None
         self.is_connected = False
-        self.reading_thread = None
-        self.should_read = False
+        self.adapters = []  # Open adapters; their frames are merged into one time-ordered stream
+        self.frame_merger = FrameMerger(self.process_received_frames)
+        # Event loop thread that reads/writes the ports and runs the timed transmissions
+        self.io_engine = IOEngine()
+        self.io_engine.start()
+        # Deadline scheduler for the continuous and random transmissions (runs on the engine)
+        self.tx_scheduler = TXScheduler(self.io_engine, on_error=self.on_tx_stream_error)
         self.port_info = {}  # Stores detailed port information
-        self.last_update_times = {}  # Stores timestamps of updates
-        self.update_timer = None  # For periodic timestamp updates
+        # Receive path without Tk (message log, search index, TP2 model, plots, statistics)
+        self.pipeline = ReceivePipeline(*LOG_RETENTION_OPTIONS[DEFAULT_LOG_RETENTION])
+        self.tp2_model = self.pipeline.tp2_model  # Latest TP2 angles, rendered by self.tp2_view
+        self.bus_stats = self.pipeline.bus_stats  # Per-ID counters and bus load, rendered by self.bus_stats_view
+        self.tp2_checker = self.pipeline.tp2_checker  # TP2 rule violations of the received frames
         
         # Continuous transmission variables
         self.continuous_active = False
-        self.continuous_timer = None
         self.last_angle_data = {
             'group_id': 0,
             'angle_type': 'R',
@@ -278,39 +652,49 @@ class CanMonitorApp:
             'angle_string': 'R0'
         }
         
-        # Historical data for plotting
-        self.plot_data = {}
-        for i in range(8):
-            self.plot_data[i] = {
-                'R': deque(maxlen=500),  # Store up to 500 points
-                'C': deque(maxlen=500),
-                'O': deque(maxlen=500)
-            }
+        # Historical data for plotting (preallocated NumPy ring buffers per group/magnitude)
+        self.plot_store = self.pipeline.plot_store
+        self.replay = None   # ReplaySource while replaying a session
         
         # Reference to plot window
         self.plot_window = None
+        self.diagnostics_window = None
         
         # Variables for random transmission
         self.random_transmission_active = False
-        self.random_transmission_thread = None
-        
-        # Variables for search functionality
-        self.search_term = ""
+        self.random_status_text = None  # Latest status posted by the random TX thread
+        
+        # Batched UI updates: worker threads queue log lines, the Tk thread drains them
+        self.ui_queue = self.pipeline.ui_queue
+        self.ui_drain_interval = 50  # ms
+        self.ui_stats_interval = 0.5  # s between queue statistics refreshes
+        self.last_ui_stats_update = 0
+        self.bus_stats_interval = 1.0  # s between bus statistics panel refreshes
+        self.last_bus_stats_update = 0
+        
+        # Bounded message log; the widget only shows the visible window of it
+        self.message_log = self.pipeline.message_log
+        
+        # Search index kept up to date as lines are stored, and the current results
+        self.search_index = self.pipeline.search_index
+        self.search_delay = 250  # ms without typing before search-as-you-type runs
+        self.search_after_id = None
+        self.search_budget = 0.02  # s of match counting per UI slice while a search completes
+        self.search_count_id = None
+        self.search_step = 0  # Navigation waiting for the count to reach its match (1/-1, 0 = none)
         self.search_matches = []
         self.current_match = -1
+        self.search_time = 0.0
         
         # Create interface
         self.create_widgets()
         
         # Update COM port list
         self.refresh_ports()
+        
+        # Start draining queued UI updates
+        self.drain_ui_queue()
     
-    def get_plot_data(self, group_id):
-        """Retrieves plot data for a specific group (used by PlotWindow)"""
-        if group_id in self.plot_data:
-            return self.plot_data[group_id]
-        return {'R': deque(), 'C': deque(), 'O': deque()}
-
     def create_widgets(self):
         # Main frame with two columns
         main_frame = ttk.Frame(self.root, padding=10)
@@ -357,9 +741,34 @@ class CanMonitorApp:
         self.connect_btn = ttk.Button(conn_frame, text="Connect", command=self.toggle_connection)
         self.connect_btn.grid(row=0, column=3, sticky=tk.W, padx=5, pady=5)
 
+        self.add_port_btn = ttk.Button(conn_frame, text="Add Port", command=self.add_adapter, state=tk.DISABLED)
+        self.add_port_btn.grid(row=0, column=4, sticky=tk.W, padx=5, pady=5)
+
+        self.record_btn = ttk.Button(conn_frame, text="Record...", command=self.toggle_capture)
+        self.record_btn.grid(row=0, column=5, sticky=tk.W, padx=5, pady=5)
+
         # Port information
         self.port_info_label = ttk.Label(conn_frame, text="", wraplength=300)
-        self.port_info_label.grid(row=1, column=0, columnspan=4, sticky=tk.W, padx=5, pady=5)
+        self.port_info_label.grid(row=1, column=0, columnspan=6, sticky=tk.W, padx=5, pady=5)
+        
+        # Serial read statistics
+        self.serial_stats_label = ttk.Label(conn_frame, text="", foreground="gray")
+        self.serial_stats_label.grid(row=2, column=0, columnspan=6, sticky=tk.W, padx=5)
+        self.capture_label = ttk.Label(conn_frame, text="", foreground="gray")
+        self.capture_label.grid(row=3, column=0, columnspan=6, sticky=tk.W, padx=5)
+
+        # Session replay (feeds the same path as the serial reader)
+        ttk.Label(conn_frame, text="Replay:").grid(row=4, column=0, sticky=tk.W, padx=5, pady=5)
+        self.replay_speed = tk.StringVar(value=DEFAULT_REPLAY_SPEED)
+        ttk.Combobox(conn_frame, textvariable=self.replay_speed, values=list(REPLAY_SPEEDS),
+                     state="readonly", width=6).grid(row=4, column=1, sticky=tk.W, padx=5, pady=5)
+        self.replay_btn = ttk.Button(conn_frame, text="Replay...", command=self.toggle_replay)
+        self.replay_btn.grid(row=4, column=2, sticky=tk.W, padx=5, pady=5)
+        # Stage timings, CPU% and the sampling profiler
+        ttk.Button(conn_frame, text="Diagnostics", command=self.open_diagnostics_window).grid(
+            row=4, column=5, sticky=tk.W, padx=5, pady=5)
+        self.replay_label = ttk.Label(conn_frame, text="", foreground="gray")
+        self.replay_label.grid(row=5, column=0, columnspan=6, sticky=tk.W, padx=5)
         
         # Section for sending custom CAN messages
         send_frame = ttk.LabelFrame(left_frame, text="Send CAN Message", padding=10)
@@ -469,6 +878,14 @@ class CanMonitorApp:
         self.loopback_mode_btn = ttk.Button(mode_frame, text="Loopback Mode", command=lambda: self.set_can_mode("LOOPBACK"))
         self.loopback_mode_btn.grid(row=0, column=1, padx=5, pady=5)
         
+        # Firmware output format (ASCII lines for debugging, compact binary records)
+        ttk.Label(mode_frame, text="Output:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
+        self.output_format = tk.StringVar(value="ascii")
+        ttk.Radiobutton(mode_frame, text="ASCII", variable=self.output_format, value="ascii",
+                        command=self.set_output_format).grid(row=1, column=1, sticky=tk.W)
+        ttk.Radiobutton(mode_frame, text="Binary", variable=self.output_format, value="binary",
+                        command=self.set_output_format).grid(row=1, column=2, sticky=tk.W)
+        
         # Add Random Transmission section to left frame
         random_frame = ttk.LabelFrame(left_frame, text="Random Transmission (TP2 Timing)", padding=10)
         random_frame.pack(fill=tk.X, pady=10)
@@ -527,9 +944,13 @@ class CanMonitorApp:
                                     command=self.toggle_random_transmission)
         self.random_btn.grid(row=4, column=0, columnspan=2, sticky=tk.W, padx=5, pady=5)
         
+        # Achieved rate and timing jitter of the scheduled transmissions
+        self.tx_stats_label = ttk.Label(random_frame, text="", foreground="gray")
+        self.tx_stats_label.grid(row=5, column=0, columnspan=3, sticky=tk.W, padx=5)
+        
         # Add a separator
         ttk.Separator(random_frame, orient=tk.HORIZONTAL).grid(
-            row=5, column=0, columnspan=3, sticky=tk.EW, pady=10)
+            row=6, column=0, columnspan=3, sticky=tk.EW, pady=10)
         
         # === TOP PANEL OF RIGHT COLUMN (70%) ===
         # Search frame for message filtering
@@ -540,6 +961,11 @@ class CanMonitorApp:
         self.search_entry = ttk.Entry(search_frame, width=20)
         self.search_entry.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
         self.search_entry.bind("<Return>", self.search_text)
+        self.search_entry.bind("<KeyRelease>", self.schedule_search)
+        
+        self.search_regex_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(search_frame, text="Regex", variable=self.search_regex_var,
+                        command=self.search_text).pack(side=tk.LEFT, padx=2)
         
         self.search_btn = ttk.Button(search_frame, text="Find", command=self.search_text)
         self.search_btn.pack(side=tk.LEFT, padx=5)
@@ -553,9 +979,41 @@ class CanMonitorApp:
         self.match_label = ttk.Label(search_frame, text="")
         self.match_label.pack(side=tk.LEFT, padx=5)
         
-        # Area to display received messages
-        self.rx_text = scrolledtext.ScrolledText(top_panel, width=50, height=20)
-        self.rx_text.pack(fill=tk.BOTH, expand=True, pady=5)
+        # Log filters (served from the search index, the widget only shows the visible rows)
+        filter_frame = ttk.Frame(top_panel)
+        filter_frame.pack(fill=tk.X)
+        
+        ttk.Label(filter_frame, text="Filter IDs:").pack(side=tk.LEFT, padx=5)
+        self.filter_ids_entry = ttk.Entry(filter_frame, width=14)
+        self.filter_ids_entry.pack(side=tk.LEFT, padx=5)
+        self.filter_ids_entry.bind("<Return>", self.apply_log_filter)
+        self.filter_ids_entry.bind("<FocusOut>", self.apply_log_filter)
+        
+        self.filter_rx_var = tk.BooleanVar(value=True)
+        self.filter_tx_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(filter_frame, text="RX", variable=self.filter_rx_var,
+                        command=self.apply_log_filter).pack(side=tk.LEFT)
+        ttk.Checkbutton(filter_frame, text="TX", variable=self.filter_tx_var,
+                        command=self.apply_log_filter).pack(side=tk.LEFT)
+        
+        self.filter_angle_vars = {}
+        for angle_type in "RCO":
+            var = tk.BooleanVar(value=True)
+            self.filter_angle_vars[angle_type] = var
+            ttk.Checkbutton(filter_frame, text=angle_type, variable=var,
+                            command=self.apply_log_filter).pack(side=tk.LEFT)
+        
+        self.filter_errors_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(filter_frame, text="Errors only", variable=self.filter_errors_var,
+                        command=self.apply_log_filter).pack(side=tk.LEFT, padx=5)
+        
+        self.filter_label = ttk.Label(filter_frame, text="")
+        self.filter_label.pack(side=tk.LEFT, padx=5)
+        
+        # Area to display received messages (virtualized view over message_log)
+        self.log_view = LogView(top_panel, self.message_log, width=50, height=20)
+        self.log_view.pack(fill=tk.BOTH, expand=True, pady=5)
+        self.rx_text = self.log_view.text
         
         # Configure colors for messages
         self.rx_text.tag_config("tx_msg", foreground="green")
@@ -570,7 +1028,7 @@ class CanMonitorApp:
         self.context_menu.add_command(label="Copy Selected", command=self.copy_selected)
         self.context_menu.add_command(label="Copy All", command=self.copy_all)
         self.context_menu.add_separator()
-        self.context_menu.add_command(label="Clear All", command=lambda: self.rx_text.delete(1.0, tk.END))
+        self.context_menu.add_command(label="Clear All", command=self.clear_log)
         
         # Bind right-click to show context menu
         self.rx_text.bind("<Button-3>", self.show_context_menu)
@@ -579,7 +1037,7 @@ class CanMonitorApp:
         btn_frame = ttk.Frame(top_panel)
         btn_frame.pack(fill=tk.X, pady=5)
         
-        self.clear_btn = ttk.Button(btn_frame, text="Clear", command=lambda: self.rx_text.delete(1.0, tk.END))
+        self.clear_btn = ttk.Button(btn_frame, text="Clear", command=self.clear_log)
         self.clear_btn.pack(side=tk.LEFT, padx=5)
         
         # Add autoscroll toggle
@@ -588,6 +1046,18 @@ class CanMonitorApp:
             btn_frame, text="Autoscroll", variable=self.autoscroll_var)
         self.autoscroll_check.pack(side=tk.LEFT, padx=5)
         
+        # Log retention (line count or approximate memory)
+        ttk.Label(btn_frame, text="Keep:").pack(side=tk.LEFT, padx=(10, 2))
+        self.retention_combo = ttk.Combobox(
+            btn_frame, width=10, values=list(LOG_RETENTION_OPTIONS), state="readonly")
+        self.retention_combo.set(DEFAULT_LOG_RETENTION)
+        self.retention_combo.pack(side=tk.LEFT, padx=2)
+        self.retention_combo.bind("<<ComboboxSelected>>", self.on_retention_selected)
+        
+        # UI queue statistics (depth and drain latency)
+        self.ui_stats_label = ttk.Label(btn_frame, text="", foreground="gray")
+        self.ui_stats_label.pack(side=tk.RIGHT, padx=5)
+        
         # === BOTTOM PANEL OF RIGHT COLUMN (30%) ===
         # Area for interpreted TP2 messages
         tp2_frame = ttk.LabelFrame(bottom_panel, text="Interpreted TP2 Messages", padding=5)
@@ -623,15 +1093,32 @@ class CanMonitorApp:
         
         self.tp2_tree.pack(fill=tk.BOTH, expand=True)
         
-        # Initialize with groups 0 to 7 (according to TP2)
-        for i in range(8):
-            self.tp2_tree.insert('', tk.END, values=(i, '--', 'Never', '--', 'Never', '--', 'Never', 'Never'), tags=('stale',))
-            self.last_update_times[i] = {
-                'R': None,
-                'C': None,
-                'O': None,
-                'any': None
-            }
+        # One row per group 0 to 7 (according to TP2), refreshed once per UI drain
+        self.tp2_view = TP2TableView(self.tp2_tree, self.tp2_model)
+        
+        # Per-ID bus statistics, refreshed once per bus_stats_interval
+        bus_frame = ttk.LabelFrame(bottom_panel, text="Bus Statistics", padding=5)
+        bus_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        self.bus_load_label = ttk.Label(bus_frame, text="")
+        self.bus_load_label.pack(anchor=tk.W)
+        columns = ('id', 'frames', 'tx', 'rate', 'interval', 'jitter', 'payload', 'histogram')
+        self.bus_tree = ttk.Treeview(bus_frame, columns=columns, show='headings', height=6)
+        for column, text, width in (('id', 'ID', 50), ('frames', 'Frames', 70), ('tx', 'TX', 50),
+                                    ('rate', 'Rate (/s)', 70), ('interval', 'Interval (ms)', 90),
+                                    ('jitter', 'Jitter (ms)', 80), ('payload', 'Payload (B)', 80),
+                                    ('histogram', 'Interval histogram 1ms..2s', 170)):
+            self.bus_tree.heading(column, text=text)
+            self.bus_tree.column(column, width=width, anchor=tk.CENTER)
+        self.bus_tree.pack(fill=tk.BOTH, expand=True)
+        self.bus_stats_view = BusStatsView(self.bus_tree, self.bus_load_label, self.bus_stats)
+        
+        # TP2 rule violations of the received frames (latest last), refreshed with the bus statistics
+        check_frame = ttk.LabelFrame(bottom_panel, text="TP2 Compliance", padding=5)
+        check_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        self.violations_label = ttk.Label(check_frame, text="")
+        self.violations_label.pack(anchor=tk.W)
+        self.violations_list = tk.Listbox(check_frame, height=5, foreground="red")
+        self.violations_list.pack(fill=tk.BOTH, expand=True)
         
         # Button to open plotting window in the TP2 section
         plotting_frame = ttk.LabelFrame(bottom_panel, text="Real-time Plotting", padding=5)
@@ -642,8 +1129,7 @@ class CanMonitorApp:
 
     def format_timestamp(self):
         """Returns a formatted timestamp string for the current time"""
-        now = datetime.now()
-        return now.strftime("[%H:%M:%S.%f")[:-3] + "]"  # Format as [HH:MM:SS.mmm]
+        return format_log_timestamp(time.time())  # Format as [HH:MM:SS.mmm]
 
     def toggle_input_method(self):
         """Toggles between numeric and string input methods"""
@@ -657,7 +1143,55 @@ class CanMonitorApp:
     def autoscroll(self):
         """Only scrolls to the end if autoscroll is enabled"""
         if self.autoscroll_var.get():
-            self.rx_text.see(tk.END)
+            self.log_view.see_end()
+        else:
+            self.log_view.refresh()
+    
+    def log_message(self, text, tag="system"):
+        """Queues a timestamped line for the message log (safe from any thread)"""
+        self.ui_queue.push(time.time(), text, tag)
+    
+    def drain_ui_queue(self):
+        """Inserts all pending log lines in one batch and reschedules itself"""
+        # Store and index the whole batch, then re-render the visible window once
+        if self.pipeline.store_queued():
+            start = time.perf_counter()
+            self.autoscroll()
+            _log_view_stage.add(time.perf_counter() - start)
+        
+        # Changed TP2 rows and due elapsed-time/stale refreshes, one item() call per row at most
+        start = time.perf_counter()
+        self.tp2_view.flush()
+        _table_view_stage.add(time.perf_counter() - start)
+        
+        if self.replay is not None and self.replay.finished:
+            self.on_replay_done()
+        
+        # Apply the latest random transmission status, if any
+        status_text = self.random_status_text
+        if status_text is not None and self.random_transmission_active:
+            self.random_status.config(text=status_text)
+            self.random_status_text = None
+        
+        now = time.monotonic()
+        if now - self.last_ui_stats_update >= self.ui_stats_interval:
+            self.last_ui_stats_update = now
+            queue = self.ui_queue
+            self.ui_stats_label.config(
+                text=f"UI queue: {queue.depth()} pending (max {queue.max_depth}) | "
+                     f"lag {queue.last_latency * 1000:.0f} ms (max {queue.max_latency * 1000:.0f} ms)")
+            self.update_serial_stats()
+            self.update_capture_stats()
+            self.update_replay_stats()
+            self.update_tx_stats()
+        if now - self.last_bus_stats_update >= self.bus_stats_interval:
+            self.last_bus_stats_update = now
+            self.bus_stats_view.flush()
+            self.update_violations()
+        
+        # If the queue still holds lines (batch limit reached), drain again right away
+        delay = 1 if self.ui_queue.depth() else self.ui_drain_interval
+        self.root.after(delay, self.drain_ui_queue)
     
     def toggle_continuous_transmission(self):
         """Starts or stops continuous angle transmission"""
@@ -671,27 +1205,29 @@ class CanMonitorApp:
             # Start continuous transmission
             self.continuous_active = True
             self.period_combo.configure(state="disabled")  # Disable changing period while active
-            self.send_continuous_angle()
-            timestamp = self.format_timestamp()
-            self.rx_text.insert(tk.END, f"{timestamp} ", "timestamp")
-            self.rx_text.insert(tk.END, f"Started continuous angle transmission ({self.period_combo.get()}ms)\n", "system")
-            self.autoscroll()
+            self.start_continuous_task()
+            self.log_message(f"Started continuous angle transmission ({self.period_combo.get()}ms)", "system")
         else:
             # Stop continuous transmission
             self.continuous_active = False
             self.period_combo.configure(state="readonly")  # Re-enable period selection
-            if self.continuous_timer:
-                self.root.after_cancel(self.continuous_timer)
-                self.continuous_timer = None
-            timestamp = self.format_timestamp()
-            self.rx_text.insert(tk.END, f"{timestamp} ", "timestamp")
-            self.rx_text.insert(tk.END, "Stopped continuous angle transmission\n", "system")
-            self.autoscroll()
+            self.log_tx_stats("continuous")
+            self.stop_continuous_task()
+            self.log_message("Stopped continuous angle transmission", "system")
 
+    def start_continuous_task(self):
+        """(Re)starts the continuous transmission stream with the selected period"""
+        period = int(self.period_combo.get()) / 1000
+        self.tx_scheduler.add(TXStream("continuous", lambda stream, value, reason: self.send_continuous_angle(),
+                                       period))
+    
+    def stop_continuous_task(self):
+        self.tx_scheduler.remove("continuous")
+    
     def send_continuous_angle(self):
-        """Sends the last angle continuously at the selected period"""
+        """Sends the last angle once (scheduler, engine thread); returns False on error or drop"""
         if not self.continuous_active or not self.is_connected:
-            return
+            return False
         
         try:
             # Send the angle using the last stored values
@@ -726,175 +1262,209 @@ class CanMonitorApp:
             for byte in data_bytes:
                 cmd += f"_{byte}"
             
-            # Send the command
-            self.serial_port.write((cmd + "\n").encode('utf-8'))
+            # Send the command (False: dropped, the write queue is full)
+            if not self.send_command(cmd):
+                return False
             
             # Periodically log the continuous transmission (once every ~2 seconds)
             current_time = time.time()
             if not hasattr(self, 'last_continuous_log') or current_time - self.last_continuous_log >= 2.0:
-                timestamp = self.format_timestamp()
-                self.rx_text.insert(tk.END, f"{timestamp} ", "timestamp")
-                self.rx_text.insert(tk.END, f"{display_msg}\n", "tx_msg")
-                self.autoscroll()
+                self.log_message(display_msg, "tx_msg")
                 self.last_continuous_log = current_time
             
-            # Schedule the next transmission
-            period = int(self.period_combo.get())
-            self.continuous_timer = self.root.after(period, self.send_continuous_angle)
+            return True
             
         except Exception as e:
-            self.rx_text.insert(tk.END, f"Error in continuous transmission: {str(e)}\n", "error")
-            self.autoscroll()
-            self.continuous_var.set(False)
-            self.toggle_continuous_transmission()  # Stop continuous transmission
+            self.log_message(f"Error in continuous transmission: {str(e)}", "error")
+            self.root.after(0, self.stop_continuous_transmission)
+            return False
+    
+    def stop_continuous_transmission(self):
+        self.continuous_var.set(False)
+        self.toggle_continuous_transmission()
+    
+    def on_tx_stream_error(self, stream, error):
+        """A scheduled stream raised and was stopped by the TX scheduler (engine thread)"""
+        self.log_message(f"Transmission {stream.key} stopped: {error!r}", "error")
+        if stream.key == "continuous":
+            self.root.after(0, self.stop_continuous_transmission)
     
     def toggle_random_transmission(self):
         """Starts or stops the random transmission mode for selected groups"""
+        if self.random_transmission_active:
+            self.stop_random_transmission()
+            return
         if not self.is_connected:
             messagebox.showwarning("Not Connected", "Connect to the serial port first")
             return
 
         selected_groups = [i for i, v in enumerate(self.random_group_vars) if v.get()]
-        if not self.random_transmission_active:
-            if not selected_groups:
-                messagebox.showwarning("No Groups Selected", "Select at least one group to start random transmission.")
-                return
-            self.random_transmission_active = True
-            self.random_btn.config(text="Stop Random Transmission")
-            self.random_status.config(text="Starting...")
-
-            # Reset per-group state
-            self.random_group_state = {}
-            for group_id in selected_groups:
-                mode = self.random_group_mode[group_id].get()
-                self.random_group_state[group_id] = {
-                    'last_values': {'R': 0, 'C': 0, 'O': 0},
-                    'last_sent_time': {'R': 0, 'C': 0, 'O': 0},
-                    'mode': mode,
-                    'const_value': random.randint(-90, 90),  # Para modo constante
-                    'sine_params': {
-                        'R': {
-                            'amplitude': random.randint(50, 120),
-                            'period': random.uniform(0.1, 10),
-                            'phase': random.uniform(0, 2*math.pi),
-                            'offset': random.randint(-50, 50)
-                        },
-                        'C': {
-                            'amplitude': random.randint(50, 120),
-                            'period': random.uniform(0.1, 10),
-                            'phase': random.uniform(0, 2*math.pi),
-                            'offset': random.randint(-50, 50)
-                        },
-                        'O': {
-                            'amplitude': random.randint(50, 120),
-                            'period': random.uniform(0.1, 10),
-                            'phase': random.uniform(0, 2*math.pi),
-                            'offset': random.randint(-50, 50)
-                        }
+        if not selected_groups:
+            messagebox.showwarning("No Groups Selected", "Select at least one group to start random transmission.")
+            return
+        self.random_transmission_active = True
+        self.random_btn.config(text="Stop Random Transmission")
+        self.random_status.config(text="Starting...")
+
+        # Reset per-group state
+        self.random_group_state = {}
+        for group_id in selected_groups:
+            mode = self.random_group_mode[group_id].get()
+            state = self.random_group_state[group_id] = {
+                'last_values': {'R': 0, 'C': 0, 'O': 0},
+                'last_sent_time': {'R': 0, 'C': 0, 'O': 0},
+                'mode': mode,
+                'const_value': random.randint(-90, 90),  # Para modo constante
+                'sine_params': {
+                    'R': {
+                        'amplitude': random.randint(50, 120),
+                        'period': random.uniform(0.1, 10),
+                        'phase': random.uniform(0, 2*math.pi),
+                        'offset': random.randint(-50, 50)
                     },
-                    'start_time': time.time()
-                }
-            self.random_transmission_thread = threading.Thread(
-                target=self.random_transmission_loop_multi,
-                args=(selected_groups,),
-                daemon=True
-            )
-            self.random_transmission_thread.start()
-            timestamp = self.format_timestamp()
-            self.rx_text.insert(tk.END, f"{timestamp} ", "timestamp")
-            self.rx_text.insert(tk.END, f"Started random transmission for Groups: {', '.join(str(g) for g in selected_groups)}\n", "system")
-            self.autoscroll()
-        else:
-            self.random_transmission_active = False
-            self.random_btn.config(text="Start Random Transmission")
-            self.random_status.config(text="Idle")
-            timestamp = self.format_timestamp()
-            self.rx_text.insert(tk.END, f"{timestamp} ", "timestamp")
-            self.rx_text.insert(tk.END, "Stopped random transmission\n", "system")
-            self.autoscroll()
+                    'C': {
+                        'amplitude': random.randint(50, 120),
+                        'period': random.uniform(0.1, 10),
+                        'phase': random.uniform(0, 2*math.pi),
+                        'offset': random.randint(-50, 50)
+                    },
+                    'O': {
+                        'amplitude': random.randint(50, 120),
+                        'period': random.uniform(0.1, 10),
+                        'phase': random.uniform(0, 2*math.pi),
+                        'offset': random.randint(-50, 50)
+                    }
+                },
+                'start_time': self.io_engine.loop.time()
+            }
+            # One TP2 stream per angle type, evaluated at the 20 frames/s limit
+            for angle_type in "RCO":
+                self.tx_scheduler.add(TXStream(
+                    ("random", group_id, angle_type), partial(self.send_random_angle, state), TP2_MIN_INTERVAL,
+                    sample=partial(self.random_angle, state, angle_type)))
+        self.log_message(f"Started random transmission for Groups: {', '.join(str(g) for g in selected_groups)}", "system")
 
-    def random_transmission_loop_multi(self, group_ids):
-        """Thread function to send random angle values for multiple groups with TP2 timing rules"""
-        angle_types = ['R', 'C', 'O']
-        next_angle_index = {g: 0 for g in group_ids}
-        while self.random_transmission_active and self.is_connected:
-            now = time.time()
-            for group_id in group_ids:
-                state = self.random_group_state[group_id]
-                elapsed = now - state['start_time']
-                angle_type = angle_types[next_angle_index[group_id]]
-                next_angle_index[group_id] = (next_angle_index[group_id] + 1) % 3
-
-                mode = state.get('mode', 'Sine')
-                if mode == "Sine":
-                    params = state['sine_params'][angle_type]
-                    sine_value = params['amplitude'] * math.sin(2 * math.pi * elapsed / params['period'] + params['phase']) + params['offset']
-                    new_value = int(sine_value + random.uniform(-2, 2))
-                elif mode == "Const":
-                    new_value = state['const_value']
-                elif mode == "Noise":
-                    new_value = random.randint(-179, 180)
-                else:
-                    new_value = 0
-                new_value = max(-179, min(180, new_value))
-
-                # Timing logic
-                last_sent = state['last_sent_time'].get(angle_type, 0)
-                last_val = state['last_values'].get(angle_type, 0)
-                should_send = False
-                reason = ""
-                if abs(new_value - last_val) >= 5:
-                    should_send = True
-                    reason = "≥5° change"
-                elif now - last_sent >= 2.0:
-                    should_send = True
-                    reason = "2s timeout"
-                # Max 5 packets/sec per group per angle type (0.500s)
-                if should_send and (now - last_sent) >= 0.500:
-                    can_id = f"{0x100 + group_id:x}"
-                    angle_string = f"{angle_type}{new_value}"
-                    data_bytes = [f"{ord(c):02x}" for c in angle_string]
-                    cmd = f"SEND_{can_id}" + ''.join(f"_{b}" for b in data_bytes)
-                    try:
-                        self.serial_port.write((cmd + "\n").encode('utf-8'))
-                        status_text = f"G{group_id} {angle_type}={new_value}° ({reason}, {mode})"
-                        self.root.after(0, lambda t=status_text: self.random_status.config(text=t))
-                        state['last_sent_time'][angle_type] = now
-                        state['last_values'][angle_type] = new_value
-                        msg = f"Random: Sent {angle_type}={new_value}° for Group {group_id} ({reason}, {mode})"
-                        timestamp = self.format_timestamp()
-                        self.root.after(0, lambda t=timestamp, m=msg: self.rx_text.insert(tk.END, f"{t} ", "timestamp"))
-                        self.root.after(0, lambda m=msg: self.rx_text.insert(tk.END, f"{m}\n", "tx_msg"))
-                        self.root.after(0, self.autoscroll)
-                        time.sleep(0.01)
-                    except Exception as e:
-                        self.root.after(0, lambda: self.rx_text.insert(
-                            tk.END, f"Error sending angle: {str(e)}\n", "error"))
-                        self.root.after(0, self.autoscroll)
-                        if not self.is_connected:
-                            self.random_transmission_active = False
-                            break
-                # Small sleep to prevent CPU overuse
-                time.sleep(0.005)
-            # If no groups are selected anymore, stop
-            if not any(self.random_group_vars[g].get() for g in group_ids):
-                self.root.after(0, self.toggle_random_transmission)
-                break
+    def stop_random_transmission(self):
+        """Removes the random streams from the scheduler (also used on disconnect and write errors)"""
+        if not self.random_transmission_active:
+            return
+        self.random_transmission_active = False
+        self.log_tx_stats("random")
+        for group_id in self.random_group_state:
+            for angle_type in "RCO":
+                self.tx_scheduler.remove(("random", group_id, angle_type))
+        self.random_btn.config(text="Start Random Transmission")
+        self.random_status.config(text="Idle")
+        self.random_status_text = None
+        self.tx_stats_label.config(text="")
+        self.log_message("Stopped random transmission", "system")
 
+    def random_angle(self, state, angle_type, t):
+        """Simulated angle of a group (its random_group_state entry) at loop time t, according to its mode"""
+        mode = state.get('mode', 'Sine')
+        if mode == "Sine":
+            params = state['sine_params'][angle_type]
+            elapsed = t - state['start_time']
+            sine_value = params['amplitude'] * math.sin(2 * math.pi * elapsed / params['period'] + params['phase']) + params['offset']
+            new_value = int(sine_value + random.uniform(-2, 2))
+        elif mode == "Const":
+            new_value = state['const_value']
+        elif mode == "Noise":
+            new_value = random.randint(-179, 180)
+        else:
+            new_value = 0
+        return max(-179, min(180, new_value))
+    
+    def send_random_angle(self, state, stream, value, reason):
+        """Sends one simulated angle of a group chosen by the TX scheduler (engine thread); False if not sent"""
+        if not self.random_transmission_active or not self.is_connected:
+            # Stopping: a stream may still fire before its removal reaches the loop
+            return False
+        _, group_id, angle_type = stream.key
+        mode = state.get('mode', 'Sine')
+        can_id = f"{0x100 + group_id:x}"
+        angle_string = f"{angle_type}{value}"
+        cmd = f"SEND_{can_id}" + ''.join(f"_{ord(c):02x}" for c in angle_string)
+        try:
+            if not self.send_command(cmd):
+                return False
+        except Exception as e:
+            self.log_message(f"Error sending angle: {str(e)}", "error")
+            self.root.after(0, self.stop_random_transmission)
+            return False
+        # The status label only shows the latest send; it is applied on the next drain
+        self.random_status_text = f"G{group_id} {angle_type}={value}° ({reason}, {mode})"
+        self.log_message(f"Random: Sent {angle_type}={value}° for Group {group_id} ({reason}, {mode})", "tx_msg")
+    
+    def update_tx_stats(self):
+        """Shows the achieved rate and timing jitter of the scheduled transmissions"""
+        if self.random_transmission_active and not any(
+                self.random_group_vars[g].get() for g in self.random_group_state):
+            # No selected group left: stop
+            self.stop_random_transmission()
+            return
+        stats = self.tx_scheduler.stats()
+        if not stats:
+            self.tx_stats_label.config(text="")
+            return
+        rate = sum(s[1] for s in stats)
+        jitter = max(s[4] for s in stats)
+        late_max = max(s[5] for s in stats)
+        self.tx_stats_label.config(
+            text=f"TX: {len(stats)} streams, {rate:.1f} frames/s, "
+                 f"jitter {1000 * jitter:.2f} ms (max late {1000 * late_max:.1f} ms)")
+    
+    def update_violations(self):
+        """Appends the new TP2 violations to the list and updates the counts"""
+        checker = self.tp2_checker
+        if self.is_connected and self.replay is None:
+            # Replayed frames carry their recorded times: silences are found when the next one arrives
+            checker.poll(time.time())
+        new = checker.take_new()
+        if new:
+            self.violations_list.insert(tk.END, *(
+                f"{format_log_timestamp(t)} G{group}{' ' + angle_type if angle_type else ''} {kind}: {detail}"
+                for t, group, angle_type, kind, detail in new))
+            excess = self.violations_list.size() - MAX_VIOLATIONS
+            if excess > 0:
+                self.violations_list.delete(0, excess - 1)
+            self.violations_list.see(tk.END)
+        if checker.frames:
+            counts = ", ".join(f"{checker.counts[kind]} {kind}" for kind in VIOLATION_KINDS)
+            self.violations_label.config(text=f"{checker.frames} TP2 frames checked; violations: {counts}")
+    
+    def log_tx_stats(self, kind):
+        """Logs rate and jitter of every stream of one kind ("random"/"continuous")"""
+        for key, rate, sent, late_mean, jitter, late_max in sorted(self.tx_scheduler.stats(), key=str):
+            if key == kind or (isinstance(key, tuple) and key[0] == kind):
+                name = kind if key == kind else f"G{key[1]} {key[2]}"
+                self.log_message(
+                    f"TX {name}: {sent} frames, {rate:.2f} frames/s, lateness {1000 * late_mean:.2f} ms "
+                    f"avg, jitter {1000 * jitter:.2f} ms, max {1000 * late_max:.1f} ms", "system")
+    
     def on_closing(self):
         """Cleanup when the application is closing"""
         # Stop continuous transmission if active
         if self.continuous_active:
             self.continuous_active = False
-            if self.continuous_timer:
-                self.root.after_cancel(self.continuous_timer)
+            self.stop_continuous_task()
         
         # Stop random transmission if active
-        self.random_transmission_active = False
+        self.stop_random_transmission()
         
         # Disconnect if connected
         if self.is_connected:
             self.toggle_connection()
+
+        # Finish the capture file
+        if self.pipeline.capture is not None:
+            self.toggle_capture()
+
+        # Stop replaying
+        if self.replay is not None:
+            self.replay.stop()
+        
+        self.io_engine.stop()
         
         # Close plot window
         if self.plot_window and hasattr(self.plot_window, 'window') and self.plot_window.window.winfo_exists():
@@ -973,198 +1543,223 @@ class CanMonitorApp:
         else:
             self.port_info_label.config(text="No serial ports detected")
     
+    def selected_port(self):
+        """Device name of the port selected in the combobox"""
+        selected = self.port_combo.get()
+        
+        # Extract the device name from the displayed text (may contain description)
+        device = selected.split(' - ')[0] if ' - ' in selected else selected
+        
+        # If it's in the info dictionary, use that port
+        if device in self.port_info:
+            return self.port_info[device]['device']
+        # If not in the dictionary, use the selected directly
+        return device
+    
+    def open_adapter(self, port):
+        """Opens a serial adapter and starts its reader; returns the Adapter"""
+        serial_port = serial.Serial(port, SERIAL_BAUDRATE, timeout=1)
+        adapter = Adapter(adapter_name(port), serial_port, self.frame_merger, on_error=self.on_serial_error,
+                          engine=self.io_engine)
+        self.adapters.append(adapter)
+        adapter.start()
+        self.log_message(f"Connected to {port} @ {SERIAL_BAUDRATE} bps", "system")
+        return adapter
+    
+    def add_adapter(self):
+        """Opens the selected port as an additional adapter (its frames are merged with the others)"""
+        port = self.selected_port()
+        if any(adapter.name == adapter_name(port) for adapter in self.adapters):
+            messagebox.showinfo("Add Port", f"{port} is already open")
+            return
+        try:
+            self.open_adapter(port)
+        except Exception as e:
+            messagebox.showerror("Connection Error", str(e))
+    
     def toggle_connection(self):
-        """Connects or disconnects from the serial port"""
+        """Connects or disconnects from the serial port(s)"""
         if not self.is_connected:
-            selected = self.port_combo.get()
-            
-            # Extract the device name from the displayed text (may contain description)
-            device = selected.split(' - ')[0] if ' - ' in selected else selected
-            
-            # If it's in the info dictionary, use that port
-            if device in self.port_info:
-                port = self.port_info[device]['device']
-            else:
-                # If not in the dictionary, use the selected directly
-                port = device
-                
+            port = self.selected_port()
             try:
-                self.serial_port = serial.Serial(port, 921600, timeout=1)
-                self.is_connected = True
-                self.connect_btn['text'] = "Disconnect"
-                self.should_read = True
-                
-                # Reset TP2 data on connect
-                self.reset_tp2_data()
-                
-                # Start thread for continuous reading
-                self.reading_thread = threading.Thread(target=self.read_serial_data)
-                self.reading_thread.daemon = True
-                self.reading_thread.start()
-                
-                # Start periodic timestamp updates
-                self.start_timestamp_updates()
-                
-                # Display system information with timestamps
-                os_info = platform.platform()
-                timestamp = self.format_timestamp()
-                self.rx_text.insert(tk.END, f"{timestamp} ", "timestamp")
-                self.rx_text.insert(tk.END, f"System: {os_info}\n", "system")
-                
-                timestamp = self.format_timestamp()
-                self.rx_text.insert(tk.END, f"{timestamp} ", "timestamp")
-                self.rx_text.insert(tk.END, f"Connected to {port} @ 115200 bps\n", "system")
-                self.autoscroll()
+                self.open_adapter(port)
             except Exception as e:
                 messagebox.showerror("Connection Error", str(e))
+                return
+            self.is_connected = True
+            self.connect_btn['text'] = "Disconnect"
+            self.add_port_btn.config(state=tk.NORMAL)
+            
+            # Reset TP2 data on connect
+            self.reset_tp2_data()
+            
+            # Opening the port resets the board, which starts with ASCII output
+            self.output_format.set("ascii")
+            
+            # Display system information with timestamps
+            os_info = platform.platform()
+            self.log_message(f"System: {os_info}", "system")
         else:
             # If continuous transmission is active, stop it
             if self.continuous_active:
                 self.continuous_var.set(False)
                 self.continuous_active = False
-                if self.continuous_timer:
-                    self.root.after_cancel(self.continuous_timer)
-                    self.continuous_timer = None
+                self.stop_continuous_task()
+            self.stop_random_transmission()
             
-            self.should_read = False
-            if self.serial_port:
-                self.serial_port.close()
+            for adapter in self.adapters:
+                adapter.stop()
+                adapter.port.close()
+            self.adapters = []
             self.is_connected = False
             self.connect_btn['text'] = "Connect"
-            timestamp = self.format_timestamp()
-            self.rx_text.insert(tk.END, f"{timestamp} ", "timestamp")
-            self.rx_text.insert(tk.END, "Disconnected\n", "system")
-            self.autoscroll()
+            self.add_port_btn.config(state=tk.DISABLED)
+            self.log_message("Disconnected", "system")
             
             # Reset TP2 data on disconnect
             self.reset_tp2_data()
-            
-            # Stop timestamp updates
-            self.stop_timestamp_updates()
     
-    def read_serial_data(self):
-        """Reads data from the serial port continuously"""
-        while self.should_read:
-            if self.serial_port and self.serial_port.in_waiting:
-                try:
-                    data = self.serial_port.readline().decode('utf-8').strip()
-                    self.process_received_data(data)
-                except Exception as e:
-                    self.root.after(0, lambda: self.rx_text.insert(tk.END, f"Read Error: {str(e)}\n", "error"))
-                    self.root.after(0, self.autoscroll)
-            time.sleep(0.01)
+    def send_command(self, cmd):
+        """Queues a firmware command on the first adapter (written by the I/O engine).
+
+        Returns False when the command was dropped because the adapter's write
+        queue is full; drops from the Tk thread are logged, those of the
+        scheduled streams only show up in the serial statistics.
+        """
+        if self.adapters[0].write((cmd + "\n").encode('utf-8')):
+            return True
+        if threading.current_thread() is threading.main_thread():
+            self.log_message(f"TX queue full, command dropped: {cmd}", "error")
+        return False
+    
+    def on_serial_error(self, adapter, error):
+        """Reports a read failure from an adapter's reader thread"""
+        self.log_message(f"Read Error ({adapter.name}): {str(error)}", "error")
+    
+    def update_serial_stats(self):
+        """Shows the throughput of every adapter against the link capacity"""
+        if not self.is_connected or not self.adapters:
+            self.serial_stats_label.config(text="")
+            return
+        link_capacity = SERIAL_BAUDRATE / 10  # 8N1: 10 bits per byte
+        lines = []
+        for adapter in self.adapters:
+            reader = adapter.reader
+            bytes_rate, lines_rate = reader.snapshot()
+            lines.append(
+                f"{adapter.name} ({'binary' if reader.binary else 'ASCII'}): {bytes_rate / 1024:.1f} kB/s "
+                f"({100 * bytes_rate / link_capacity:.1f}% of link), {lines_rate:.0f} frames/s, "
+                f"{reader.decode_errors} decode errors, {adapter.read_errors} read errors")
+            writer = adapter.writer
+            if writer is not adapter.port:
+                lines.append(
+                    f"  TX: {writer.snapshot() / 1024:.1f} kB/s, queue {writer.depth()} B "
+                    f"(max {writer.max_depth}), {writer.commands_total} commands in {writer.writes} writes, "
+                    f"{writer.dropped} dropped")
+        if len(self.adapters) > 1:
+            merger = self.frame_merger
+            lines.append(f"Merged: {merger.merged_batches} batches, {merger.late_batches} out of order")
+        self.serial_stats_label.config(text="\n".join(lines))
+    
+    def toggle_capture(self):
+        """Starts recording received frames to a capture file, or stops it"""
+        if self.pipeline.capture is not None:
+            capture = self.pipeline.capture
+            self.pipeline.capture = None
+            capture.close()
+            self.record_btn.config(text="Record...")
+            self.capture_label.config(text="")
+            self.log_message(f"Capture saved: {capture.path} ({capture.records} frames)", "system")
+            return
+
+        path = filedialog.asksaveasfilename(
+            title="Record capture", defaultextension=".cancap",
+            initialfile=datetime.now().strftime("canmon_%Y%m%d_%H%M%S.cancap"),
+            filetypes=[("CAN captures", "*.cancap"), ("Sessions (raw lines, for replay)", f"*{SESSION_EXTENSION}"),
+                       ("All files", "*.*")])
+        if not path:
+            return
+        writer_class = SessionWriter if path.endswith(SESSION_EXTENSION) else CaptureWriter
+        try:
+            self.pipeline.capture = writer_class(path)
+        except OSError as e:
+            messagebox.showerror("Capture Error", f"Could not create {path}: {e}")
+            return
+        self.record_btn.config(text="Stop Rec")
+        self.log_message(f"Recording capture to {path}", "system")
+
+    def toggle_replay(self):
+        """Replays a recorded session through the normal receive path, or stops the replay"""
+        if self.replay is not None:
+            self.replay.stop()
+            return
+
+        path = filedialog.askopenfilename(
+            title="Replay session",
+            filetypes=[("Sessions", f"*{SESSION_EXTENSION}"), ("All files", "*.*")])
+        if not path:
+            return
+        speed = REPLAY_SPEEDS.get(self.replay_speed.get(), 1.0)
+        try:
+            # The UI drain notices when it finishes (no Tk call from the replay thread)
+            self.replay = ReplaySource(path, self.process_replayed_batch, speed=speed)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Replay Error", f"Could not open {path}: {e}")
+            return
+        self.bus_stats.use_recorded_time(True)
+        self.replay.start()
+        self.replay_btn.config(text="Stop Replay")
+        self.log_message(f"Replaying {path} ({self.replay_speed.get()})", "system")
+
+    def on_replay_done(self):
+        replay = self.replay
+        self.replay = None
+        self.bus_stats.use_recorded_time(False)
+        self.replay_btn.config(text="Replay...")
+        self.replay_label.config(text="")
+        if replay is not None:
+            self.log_message(f"Replay finished: {replay.lines_total} lines", "system")
+
+    def update_replay_stats(self):
+        replay = self.replay
+        if replay is None:
+            return
+        self.replay_label.config(
+            text=f"Replay: {100 * replay.progress:.0f}%, {replay.snapshot():.0f} lines/s")
+
+    def update_capture_stats(self):
+        capture = self.pipeline.capture
+        if capture is None:
+            return
+        text = f"Recording: {capture.records} frames, {capture.bytes_written / (1024 * 1024):.1f} MB"
+        if capture.dropped_batches:
+            text += f", {capture.dropped_batches} batches dropped"
+        if capture.error:
+            text += f", write error: {capture.error}"
+        self.capture_label.config(text=text)
+
+    def process_received_batch(self, lines):
+        """Processes a batch of complete lines from the serial reader"""
+        self.pipeline.process_lines(time.time(), lines)
+    
+    def process_replayed_batch(self, timestamp, lines):
+        """Processes a batch of replayed lines with the time they were recorded at"""
+        self.pipeline.process_lines(timestamp, lines)
+    
+    def process_received_frames(self, now, source, frames):
+        """Processes a batch of decoded frames (ASCII lines or binary records) received at time now"""
+        # Several adapters: the log shows where every frame came from
+        prefix = f"[{source.name}] " if len(self.adapters) > 1 and source is not None else None
+        self.pipeline.process_frames(now, frames, prefix)
     
     def process_received_data(self, data):
         """Processes data received via serial"""
         if not data:
             return
         
-        # Add timestamp to the message
-        timestamp = self.format_timestamp()
-        
-        # Insert timestamp with gray color, then the message with blue color
-        self.root.after(0, lambda: self.rx_text.insert(tk.END, f"{timestamp} ", "timestamp"))
-        self.root.after(0, lambda: self.rx_text.insert(tk.END, f"{data}\n", "rx_msg"))
-        
-        # Only auto-scroll if the autoscroll option is enabled
-        self.root.after(0, self.autoscroll)
-        
-        # Check if it's a CAN message in TP2 format
-        if data.startswith("CAN_RX_"):
-            try:
-                # Expected format: CAN_RX_ID_LEN_BYTE1_BYTE2_..._TP2_TYPE_VALUE
-                parts = data.split("_")
-                
-                if len(parts) >= 5:
-                    # Extract ID to determine the group
-                    id_hex = parts[2]
-                    try:
-                        group_id = int(id_hex, 16) - 0x100
-                    except ValueError:
-                        print(f"Error converting ID: {id_hex}")
-                        return
-                        
-                    # Verify if it's an ID within the TP2 range (0x100-0x107)
-                    if 0 <= group_id <= 7:
-                        angle_type = None
-                        angle_value = None
-                        
-                        # Look for TP2 information
-                        if "TP2" in parts:
-                            tp2_index = parts.index("TP2")
-                            
-                            if len(parts) > tp2_index + 2:
-                                angle_type = parts[tp2_index + 1]
-                                angle_value = parts[tp2_index + 2]
-                        else:
-                            # Attempt to interpret based on the expected TP2 format
-                            if len(parts) >= 6:  # At least we have CAN_RX_ID_LEN_BYTE1
-                                # Verify if the first byte could be an angle type
-                                len_idx = 3
-                                first_byte_idx = 4
-                                
-                                if len_idx < len(parts) and first_byte_idx < len(parts):
-                                    try:
-                                        first_byte = int(parts[first_byte_idx], 16)
-                                        char_value = chr(first_byte)
-                                        
-                                        if char_value in ['R', 'C', 'O']:
-                                            angle_type = char_value
-                                            
-                                            # Attempt to construct the angle value from the remaining bytes
-                                            angle_value = ""
-                                            for i in range(first_byte_idx + 1, len(parts)):
-                                                try:
-                                                    byte_value = int(parts[i], 16)
-                                                    if 32 <= byte_value <= 126:  # Printable ASCII range
-                                                        angle_value += chr(byte_value)
-                                                except ValueError:
-                                                    pass
-                                    except ValueError:
-                                        pass
-                        
-                        # If we could identify an angle type and value, update the table
-                        if angle_type and angle_value and angle_type in ['R', 'C', 'O']:
-                            now = datetime.now()
-                            current_time = time.time()
-                            
-                            # Update the timestamp for this group and angle type
-                            if group_id in self.last_update_times:
-                                self.last_update_times[group_id][angle_type] = now
-                                self.last_update_times[group_id]['any'] = now
-                            
-                            # Store data for plotting
-                            try:
-                                # Convert angle value to float and store with timestamp
-                                angle_float = float(angle_value)
-                                if group_id in self.plot_data and angle_type in self.plot_data[group_id]:
-                                    self.plot_data[group_id][angle_type].append((current_time, angle_float))
-                            except ValueError:
-                                # If conversion fails, don't store for plotting
-                                pass
-                            
-                            # Update the value in the table based on the angle type
-                            item_id = self.tp2_tree.get_children()[group_id]
-                            current_values = self.tp2_tree.item(item_id, 'values')
-                            new_values = list(current_values)
-                            
-                            if angle_type == 'R':
-                                new_values[1] = angle_value + "°"  # Roll value
-                                new_values[2] = "Now"  # Roll time
-                            elif angle_type == 'C':
-                                new_values[3] = angle_value + "°"  # Pitch value
-                                new_values[4] = "Now"  # Pitch time
-                            elif angle_type == 'O':
-                                new_values[5] = angle_value + "°"  # Orientation value
-                                new_values[6] = "Now"  # Orientation time
-                            
-                            # Update last update timestamp
-                            new_values[7] = "Now"
-                            
-                            # Mark the row as active
-                            self.tp2_tree.item(item_id, values=tuple(new_values), tags=('active',))
-            except Exception as e:
-                print(f"Error processing TP2 message: {str(e)}")
+        # Queue the line; it is inserted into rx_text on the next UI drain
+        self.log_message(data, "rx_msg")
+        self.pipeline.handle_frame(parse_line(data))
     
     def send_can_message(self):
         """Sends a CAN message using custom ID and data"""
@@ -1207,12 +1802,10 @@ class CanMonitorApp:
             for byte in data_bytes:
                 cmd += f"_{byte}"
             
-            self.serial_port.write((cmd + "\n").encode('utf-8'))
+            if not self.send_command(cmd):
+                return
             # Green color for sent messages with timestamp
-            timestamp = self.format_timestamp()
-            self.rx_text.insert(tk.END, f"{timestamp} ", "timestamp")
-            self.rx_text.insert(tk.END, f"Sending: {cmd}\n", "tx_msg")
-            self.autoscroll()
+            self.log_message(f"Sending: {cmd}", "tx_msg")
             
         except Exception as e:
             messagebox.showerror("Error Sending", str(e))
@@ -1289,19 +1882,14 @@ class CanMonitorApp:
             for byte in data_bytes:
                 cmd += f"_{byte}"
             
-            self.serial_port.write((cmd + "\n").encode('utf-8'))
+            self.send_command(cmd)
             # Green color for sent messages with timestamp
-            timestamp = self.format_timestamp()
-            self.rx_text.insert(tk.END, f"{timestamp} ", "timestamp")
-            self.rx_text.insert(tk.END, f"{display_msg}\n", "tx_msg")
-            self.autoscroll()
+            self.log_message(display_msg, "tx_msg")
             
             # If continuous transmission is active, restart it with the new values
             if self.continuous_active:
-                if self.continuous_timer:
-                    self.root.after_cancel(self.continuous_timer)
                 self.last_continuous_log = 0  # Force log the first message
-                self.continuous_timer = self.root.after(int(self.period_combo.get()), self.send_continuous_angle)
+                self.start_continuous_task()
                 
         except Exception as e:
             messagebox.showerror("Error Sending Angle", str(e))
@@ -1339,103 +1927,37 @@ class CanMonitorApp:
         
         try:
             cmd = f"MODE_{mode}"
-            self.serial_port.write((cmd + "\n").encode('utf-8'))
+            if not self.send_command(cmd):
+                return
             # Green color for sent messages with timestamp
-            timestamp = self.format_timestamp()
-            self.rx_text.insert(tk.END, f"{timestamp} ", "timestamp")
-            self.rx_text.insert(tk.END, f"Changing CAN mode: {mode}\n", "tx_msg")
-            self.autoscroll()
+            self.log_message(f"Changing CAN mode: {mode}", "tx_msg")
         except Exception as e:
             messagebox.showerror("Error Changing Mode", str(e))
     
-    def start_timestamp_updates(self):
-        """Starts periodic timestamp updates in the table"""
-        self.update_timestamps()
-        self.update_timer = self.root.after(1000, self.start_timestamp_updates)
-    
-    def stop_timestamp_updates(self):
-        """Stops periodic timestamp updates"""
-        if self.update_timer:
-            self.root.after_cancel(self.update_timer)
-            self.update_timer = None
-    
-    def update_timestamps(self):
-        """Updates the times displayed in the table since the last update"""
-        now = datetime.now()
+    def set_output_format(self):
+        """Switches the firmware between ASCII and binary output"""
+        if not self.is_connected:
+            messagebox.showwarning("Not Connected", "Connect to the serial port first")
+            self.output_format.set("ascii")
+            return
         
-        for group_id in range(8):
-            if group_id in self.last_update_times:
-                timestamps = self.last_update_times[group_id]
-                
-                # Get the corresponding item in the table
-                item_id = self.tp2_tree.get_children()[group_id]
-                current_values = self.tp2_tree.item(item_id, 'values')
-                new_values = list(current_values)
-                
-                # Variables to control the visual state of each value
-                r_stale = True
-                c_stale = True
-                o_stale = True
-                all_stale = True
-                
-                # Update times for each angle type
-                for angle_type, timestamp in timestamps.items():
-                    if timestamp is None:
-                        continue  # No update recorded
-                    
-                    # Calculate elapsed time
-                    elapsed = now - timestamp
-                    elapsed_seconds = int(elapsed.total_seconds())
-                    
-                    time_str = ""
-                    if elapsed_seconds < 60:
-                        time_str = f"{elapsed_seconds}s"
-                    elif elapsed_seconds < 3600:
-                        time_str = f"{elapsed_seconds // 60}m {elapsed_seconds % 60}s"
-                    else:
-                        time_str = f"{elapsed_seconds // 3600}h {(elapsed_seconds % 3600) // 60}m"
-                    
-                    # Determine if the value is outdated (more than 2 seconds)
-                    is_stale = elapsed_seconds > 2
-                    
-                    # Update the corresponding field
-                    if angle_type == 'R':
-                        new_values[2] = time_str
-                        r_stale = is_stale
-                    elif angle_type == 'C':
-                        new_values[4] = time_str
-                        c_stale = is_stale
-                    elif angle_type == 'O':
-                        new_values[6] = time_str
-                        o_stale = is_stale
-                    elif angle_type == 'any':
-                        new_values[7] = time_str
-                        all_stale = is_stale
-                
-                # Update the values in the table
-                self.tp2_tree.item(item_id, values=tuple(new_values))
-                
-                # Apply the corresponding tag to the row based on the update state
-                if all_stale:
-                    self.tp2_tree.item(item_id, tags=('stale',))
-                else:
-                    self.tp2_tree.item(item_id, tags=('active',))
+        try:
+            cmd = CMD_OUTPUT_BINARY if self.output_format.get() == "binary" else CMD_OUTPUT_ASCII
+            self.send_command(cmd)
+            self.log_message(f"Changing output format: {self.output_format.get()}", "tx_msg")
+        except Exception as e:
+            messagebox.showerror("Error Changing Output Format", str(e))
     
     def reset_tp2_data(self):
         """Resets all TP2 data to its initial state"""
-        for i in range(8):
-            item_id = self.tp2_tree.get_children()[i]
-            self.tp2_tree.item(item_id, values=(i, '--', 'Never', '--', 'Never', '--', 'Never', 'Never'), tags=('stale',))
-            self.last_update_times[i] = {
-                'R': None,
-                'C': None,
-                'O': None,
-                'any': None
-            }
-            # Clear plotting data
-            if i in self.plot_data:
-                for angle_type in self.plot_data[i]:
-                    self.plot_data[i][angle_type].clear()
+        # Clear plotting data
+        self.plot_store.clear()
+        self.tp2_model.reset()
+        self.tp2_view.reset()
+        self.bus_stats_view.reset()
+        self.tp2_checker.reset()
+        self.violations_list.delete(0, tk.END)
+        self.violations_label.config(text="")
 
     def open_plot_window(self):
         """Opens the single real-time plot window (all groups/magnitudes)"""
@@ -1447,6 +1969,13 @@ class CanMonitorApp:
         except Exception as e:
             messagebox.showerror("Plot Error", str(e))
 
+    def open_diagnostics_window(self):
+        """Opens the single diagnostics window (stage timings and profiler)"""
+        if self.diagnostics_window and self.diagnostics_window.window.winfo_exists():
+            self.diagnostics_window.window.lift()
+            return
+        self.diagnostics_window = DiagnosticsWindow(self.root, self)
+
     def show_context_menu(self, event):
         """Show the context menu on right-click"""
         try:
@@ -1466,60 +1995,133 @@ class CanMonitorApp:
             pass
     
     def copy_all(self):
-        """Copy all text to clipboard"""
-        all_text = self.rx_text.get(1.0, tk.END)
+        """Copy all retained messages to clipboard"""
+        all_text = "\n".join(
+            f"{format_log_timestamp(ts)} {text}" for _, ts, text, _ in self.message_log.iter_records())
         self.root.clipboard_clear()
         self.root.clipboard_append(all_text)
+    
+    def clear_log(self):
+        """Drops every retained message"""
+        self.message_log.clear()
+        self.search_index.clear()
+        self.cancel_search_count()
+        if self.pipeline.log_filter is not None:
+            self.pipeline.log_filter.reset()
+            self.log_view.set_filter(self.pipeline.log_filter)
+        self.search_matches = []
+        self.current_match = -1
+        self.match_label.config(text="")
+        self.log_view.set_highlight(None)
+    
+    def on_retention_selected(self, event=None):
+        """Applies the selected message log retention"""
+        max_lines, max_bytes = LOG_RETENTION_OPTIONS[self.retention_combo.get()]
+        self.message_log.set_retention(max_lines, max_bytes)
+        self.log_view.refresh()
+        
+    def apply_log_filter(self, event=None):
+        """Switches the log view to the records that pass the filter controls"""
+        try:
+            can_ids = parse_id_set(self.filter_ids_entry.get())
+        except ValueError as e:
+            self.filter_label.config(text=str(e))
+            return
         
-    def search_text(self, event=None):
-        """Search for the given text in the message display"""
-        search_term = self.search_entry.get().strip()
-        if not search_term:
-            self.match_label.config(text="")
-            self.clear_search_highlights()
+        kinds = tuple(kind for kind, var in (("rx", self.filter_rx_var), ("tx", self.filter_tx_var)) if var.get())
+        angles = {angle_type for angle_type, var in self.filter_angle_vars.items() if var.get()}
+        if len(angles) == len(self.filter_angle_vars):
+            angles = None
+        
+        start = time.perf_counter()
+        if self.filter_errors_var.get():
+            log_filter = LogFilter(self.search_index, kinds=("error",))
+        elif can_ids is None and len(kinds) == 2 and angles is None:
+            log_filter = None
+        else:
+            log_filter = LogFilter(self.search_index, can_ids, kinds, angles)
+        self.pipeline.log_filter = log_filter
+        self.log_view.set_filter(log_filter)
+        
+        if log_filter is None:
+            self.filter_label.config(text="")
+        else:
+            first, end = log_filter.row_range()
+            self.filter_label.config(
+                text=f"{end - first} of {len(self.message_log)} lines ({1000 * (time.perf_counter() - start):.0f} ms)")
+    
+    def schedule_search(self, event=None):
+        """Search-as-you-type: runs the search once typing pauses for search_delay ms"""
+        if event is not None and event.keysym in ("Return", "KP_Enter"):
             return
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(self.search_delay, self.search_text)
+    
+    def search_text(self, event=None):
+        """Search the retained messages ("id:<hex>" and "type:<kind>" filter by CAN ID/message type)"""
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+            self.search_after_id = None
         
-        self.search_term = search_term
+        query = self.search_entry.get().strip()
+        self.cancel_search_count()
         self.search_matches = []
         self.current_match = -1
-        
-        # Clear previous highlights
         self.clear_search_highlights()
+        if not query:
+            self.match_label.config(text="")
+            return
         
-        # Get all text
-        all_text = self.rx_text.get(1.0, tk.END)
-        
-        # Find all occurrences of the search term
-        start_idx = 0
-        while True:
-            idx = all_text.find(self.search_term, start_idx)
-            if idx == -1:
-                break
-                
-            line_count = all_text[:idx].count('\n')
-            line_start = all_text[:idx].rfind('\n')
-            if line_start == -1:
-                line_start = 0
-            else:
-                line_start += 1  # Skip the newline character
-                
-            col = idx - line_start
-            
-            # tkinter text indices are 1-based for lines
-            self.search_matches.append(f"{line_count + 1}.{col}")
-            start_idx = idx + len(self.search_term)
+        start = time.perf_counter()
+        try:
+            self.search_matches = self.search_index.search(query, regex=self.search_regex_var.get())
+        except (ValueError, re.error) as e:
+            self.match_label.config(text=f"Invalid search: {e}")
+            return
+        self.search_time = time.perf_counter() - start
+        self.count_search()
+    
+    def count_search(self):
+        """Counts the current search in search_budget slices, keeping the UI responsive on large logs"""
+        self.search_count_id = None
+        matches = self.search_matches
+        start = time.perf_counter()
+        complete = matches.count_pending(self.search_budget)
+        self.search_time += time.perf_counter() - start
+        if not complete:
+            self.search_count_id = self.root.after(1, self.count_search)
         
         # Update match count label
-        if self.search_matches:
-            self.match_label.config(text=f"1/{len(self.search_matches)}")
+        if matches and self.current_match < 0:
             self.current_match = 0
             self.highlight_current_match()
+        elif self.search_step and (complete or (self.search_step > 0 and self.current_match + 1 < len(matches))):
+            # The match a navigation was waiting for has been counted
+            self.step_search(self.search_step)
+        elif matches:
+            self.update_match_label()
+        elif complete:
+            self.match_label.config(text=f"No matches ({1000 * self.search_time:.0f} ms)")
         else:
-            self.match_label.config(text="No matches")
+            self.match_label.config(text="Searching...")
+    
+    def cancel_search_count(self):
+        """Stops counting the current search"""
+        self.search_step = 0
+        if self.search_count_id is not None:
+            self.root.after_cancel(self.search_count_id)
+            self.search_count_id = None
+    
+    def update_match_label(self):
+        """Shows the current match position (total marked with + while still counting)"""
+        total = f"{len(self.search_matches)}{'' if self.search_matches.complete else '+'}"
+        self.match_label.config(
+            text=f"{self.current_match + 1}/{total} ({1000 * self.search_time:.0f} ms)")
     
     def clear_search_highlights(self):
         """Clear all search highlights"""
-        self.rx_text.tag_remove("search_highlight", "1.0", tk.END)
+        self.log_view.set_highlight(None)
     
     def highlight_current_match(self):
         """Highlight the current match"""
@@ -1527,23 +2129,33 @@ class CanMonitorApp:
             return
             
         # Get the position of the current match
-        pos = self.search_matches[self.current_match]
-        end_idx = f"{pos}+{len(self.search_term)}c"
-        
-        # Highlight the match
-        self.rx_text.tag_add("search_highlight", pos, end_idx)
+        seq, col, length = self.search_matches[self.current_match]
+        if seq < self.message_log.first_seq:
+            self.match_label.config(text=f"{self.current_match + 1}/{len(self.search_matches)} (dropped)")
+            return
         
-        # Ensure the match is visible
-        self.rx_text.see(pos)
+        # Highlight the match and make sure it is visible
+        self.log_view.set_highlight(seq, col, length)
+        self.log_view.see(seq)
         
         # Update the count label
-        self.match_label.config(text=f"{self.current_match + 1}/{len(self.search_matches)}")
+        self.update_match_label()
     
     def navigate_search(self, direction):
         """Navigate through search results (1 = forward, -1 = backward)"""
         if not self.search_matches:
             return
-            
+        matches = self.search_matches
+        if not matches.complete and (self.current_match + direction >= len(matches) or self.current_match + direction < 0):
+            # Past the matches counted so far: count_search() moves once it gets there
+            self.search_step = direction
+            self.match_label.config(text=f"{self.current_match + 1}/{len(matches)}+ (searching...)")
+            return
+        self.step_search(direction)
+    
+    def step_search(self, direction):
+        """Moves to the next/previous match, wrapping around"""
+        self.search_step = 0
         self.current_match = (self.current_match + direction) % len(self.search_matches)
         
         # Clear previous highlights and highlight the current match
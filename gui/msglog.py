@@ -0,0 +1,127 @@
+import time
+from array import array
+
+# Tags understood by the message log (stored as one byte per record)
+LOG_TAGS = ("system", "rx_msg", "tx_msg", "error")
+TAG_CODES = {tag: code for code, tag in enumerate(LOG_TAGS)}
+
+# Width of the "[HH:MM:SS.mmm] " prefix that precedes every rendered line
+TIMESTAMP_WIDTH = len("[00:00:00.000] ")
+
+
+def format_log_timestamp(ts):
+    """Formats an epoch timestamp as [HH:MM:SS.mmm]"""
+    return time.strftime("[%H:%M:%S", time.localtime(ts)) + f".{int(ts * 1000) % 1000:03d}]"
+
+
+class MessageLog:
+    """Ring buffer of log records addressed by a monotonically increasing sequence number.
+
+    Records are kept in compact parallel columns (float timestamps in an array,
+    text in a list, tag codes in a bytearray). Retention is bounded both by line
+    count and, optionally, by an estimate of the memory used; the oldest records
+    are dropped first. The buffer starts small and grows up to max_lines.
+    """
+
+    # Approximate bytes per record besides the characters of its text
+    RECORD_OVERHEAD = 66
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, max_lines=100000, max_bytes=None):
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self._allocate(min(self.INITIAL_CAPACITY, max_lines))
+        self.first_seq = 0  # Sequence number of the oldest retained record
+        self.next_seq = 0   # Sequence number the next appended record will get
+        self.bytes_used = 0
+        self.evicted_total = 0
+
+    def _allocate(self, capacity):
+        self._capacity = capacity
+        self._times = array('d', bytes(8 * capacity))
+        self._texts = [None] * capacity
+        self._tags = bytearray(capacity)
+
+    def __len__(self):
+        return self.next_seq - self.first_seq
+
+    def _relayout(self, capacity):
+        """Moves the retained records into freshly allocated columns"""
+        times, texts, tags = self._times, self._texts, self._tags
+        old_capacity = self._capacity
+        self._allocate(capacity)
+        for seq in range(self.first_seq, self.next_seq):
+            i = seq % old_capacity
+            j = seq % capacity
+            self._times[j] = times[i]
+            self._texts[j] = texts[i]
+            self._tags[j] = tags[i]
+
+    def _evict_oldest(self):
+        i = self.first_seq % self._capacity
+        self.bytes_used -= len(self._texts[i]) + self.RECORD_OVERHEAD
+        self._texts[i] = None
+        self.first_seq += 1
+        self.evicted_total += 1
+
+    def append(self, ts, text, tag):
+        """Appends one record, evicting the oldest ones if retention is exceeded"""
+        if len(self) >= self._capacity:
+            if self._capacity < self.max_lines:
+                self._relayout(min(self._capacity * 2, self.max_lines))
+            else:
+                self._evict_oldest()
+
+        i = self.next_seq % self._capacity
+        self._times[i] = ts
+        self._texts[i] = text
+        self._tags[i] = TAG_CODES.get(tag, 0)
+        self.next_seq += 1
+        self.bytes_used += len(text) + self.RECORD_OVERHEAD
+
+        if self.max_bytes is not None:
+            while self.bytes_used > self.max_bytes and len(self) > 1:
+                self._evict_oldest()
+
+    def extend(self, records):
+        """Appends several (ts, text, tag) records"""
+        append = self.append
+        for ts, text, tag in records:
+            append(ts, text, tag)
+
+    def get(self, seq):
+        """Returns (ts, text, tag) for a retained sequence number"""
+        if not self.first_seq <= seq < self.next_seq:
+            raise IndexError(f"Record {seq} is not retained")
+        i = seq % self._capacity
+        return self._times[i], self._texts[i], LOG_TAGS[self._tags[i]]
+
+    def text(self, seq):
+        """Returns only the message text of a retained record"""
+        return self._texts[seq % self._capacity]
+
+    def iter_records(self, start=None, stop=None):
+        """Yields (seq, ts, text, tag) for the retained records in [start, stop)"""
+        start = self.first_seq if start is None else max(start, self.first_seq)
+        stop = self.next_seq if stop is None else min(stop, self.next_seq)
+        capacity = self._capacity
+        times, texts, tags = self._times, self._texts, self._tags
+        for seq in range(start, stop):
+            i = seq % capacity
+            yield seq, times[i], texts[i], LOG_TAGS[tags[i]]
+
+    def clear(self):
+        """Drops every record; sequence numbers keep increasing"""
+        self.evicted_total += len(self)
+        self._allocate(min(self.INITIAL_CAPACITY, self.max_lines))
+        self.first_seq = self.next_seq
+        self.bytes_used = 0
+
+    def set_retention(self, max_lines, max_bytes=None):
+        """Changes the retention limits, dropping the oldest records if needed"""
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        while len(self) > max_lines or (max_bytes is not None and self.bytes_used > max_bytes and len(self) > 1):
+            self._evict_oldest()
+        if self._capacity > max_lines:
+            self._relayout(max(max_lines, 1))
@@ -0,0 +1,112 @@
+# Receive path of the monitor, without Tk.
+#
+# CanMonitorApp feeds every decoded batch to a ReceivePipeline from the
+# reader side and stores the queued log lines from its Tk drain; the
+# widgets only render what these objects hold. The pipeline benchmark
+# (benchmarks/pipeline_bench.py) drives the same class.
+import time
+
+import profiling
+from busstats import BusStats
+from logsearch import LogSearchIndex
+from msglog import MessageLog
+from plotstore import PlotDataStore
+from tp2check import TP2Checker
+from tp2parser import parse_lines, tp2_group, FRAME_RX
+from tp2table import TP2TableModel
+from uiqueue import UIUpdateQueue
+
+_parse_stage = profiling.stage("parse")
+_table_stage = profiling.stage("table")
+_bus_stats_stage = profiling.stage("bus stats")
+_tp2_check_stage = profiling.stage("tp2 check")
+_log_stage = profiling.stage("log insert")
+
+
+class ReceivePipeline:
+    """Everything a received batch updates: log queue, capture, bus statistics,
+    TP2 checker, TP2 table model and plot store, plus the message log and its
+    search index filled from the queue.
+
+    process_lines()/process_frames() run in the reader (or replay) thread;
+    store_queued() runs in the UI thread. capture and log_filter may be
+    replaced at any time (None when not recording / not filtering).
+    """
+
+    def __init__(self, max_lines=100000, max_bytes=None):
+        self.ui_queue = UIUpdateQueue()
+        self.message_log = MessageLog(max_lines, max_bytes)
+        self.search_index = LogSearchIndex(self.message_log)
+        self.log_filter = None  # LogFilter shown by the log view
+        self.tp2_model = TP2TableModel()
+        self.plot_store = PlotDataStore()
+        self.bus_stats = BusStats()
+        self.tp2_checker = TP2Checker()
+        self.capture = None  # CaptureWriter (or SessionWriter) while recording
+
+    def process_lines(self, now, lines):
+        """Decodes a batch of firmware lines received (or recorded) at time now"""
+        start = time.perf_counter()
+        frames = parse_lines(lines)
+        _parse_stage.add(time.perf_counter() - start)
+        self.process_frames(now, frames)
+
+    def process_frames(self, now, frames, prefix=None):
+        """Processes a batch of decoded frames received at time now; prefix marks their log lines"""
+        if prefix:
+            self.ui_queue.push_many((now, prefix + frame.text, "rx_msg") for frame in frames)
+        else:
+            self.ui_queue.push_many((now, frame.text, "rx_msg") for frame in frames)
+        capture = self.capture
+        if capture is not None:
+            capture.add_frames(now, frames)
+        start = time.perf_counter()
+        self.bus_stats.add_frames(now, frames)
+        checked = time.perf_counter()
+        _bus_stats_stage.add(checked - start)
+        self.tp2_checker.add_frames(now, frames)
+        start = time.perf_counter()
+        _tp2_check_stage.add(start - checked)
+        for frame in frames:
+            self.handle_frame(frame)
+        _table_stage.add(time.perf_counter() - start)
+
+    def handle_frame(self, frame):
+        """Updates the TP2 table model and plot data from a decoded frame"""
+        # Only received frames in the TP2 range (0x100-0x107) with an angle payload
+        if frame.kind != FRAME_RX or frame.angle_type is None:
+            return
+        group_id = tp2_group(frame)
+        if group_id is None:
+            return
+
+        try:
+            angle_type = frame.angle_type
+            angle_value = frame.angle_value
+
+            # Only marks the row dirty; the table is redrawn by the UI drain
+            self.tp2_model.update(group_id, angle_type, angle_value)
+
+            # Store data for plotting
+            try:
+                # TP2 angles are integers, stored as int16 with their timestamp
+                self.plot_store.append(group_id, angle_type, time.time(), int(angle_value))
+            except ValueError:
+                # If conversion fails, don't store for plotting
+                pass
+        except Exception as e:
+            print(f"Error processing TP2 message: {str(e)}")
+
+    def store_queued(self):
+        """Moves the queued log lines into the message log and its index; returns how many"""
+        records = self.ui_queue.drain()
+        if not records:
+            return 0
+        start = time.perf_counter()
+        first_seq = self.message_log.next_seq
+        self.message_log.extend(records)
+        self.search_index.add(first_seq, records)
+        if self.log_filter is not None:
+            self.log_filter.update()
+        _log_stage.add(time.perf_counter() - start)
+        return len(records)
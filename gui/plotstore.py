@@ -0,0 +1,192 @@
+import threading
+
+import numpy as np
+
+MAGNITUDES = ('R', 'C', 'O')
+
+# Bucket widths (seconds) of the min/max levels kept for long time windows.
+# With LEVEL_CAPACITY buckets each, the coarsest levels cover hours of history.
+LEVEL_WIDTHS = (0.5, 4.0, 32.0)
+LEVEL_CAPACITY = 4096
+
+
+class MinMaxLevel:
+    """Ring of fixed-width time buckets holding the min and max value of each bucket.
+
+    Updated incrementally: a sample either widens the newest bucket or opens a
+    new one. Arrays are mirrored like SeriesBuffer so windows are one slice.
+    """
+
+    def __init__(self, width, capacity):
+        self.width = width
+        self.capacity = capacity
+        self.starts = np.zeros(2 * capacity, dtype=np.float64)
+        self.mins = np.zeros(2 * capacity, dtype=np.int16)
+        self.maxs = np.zeros(2 * capacity, dtype=np.int16)
+        self.head = 0
+        self.count = 0
+        self.bucket = None  # Index (time // width) of the newest bucket
+
+    def append(self, t, value):
+        bucket = t // self.width
+        if bucket == self.bucket:
+            # Widen the newest bucket (both mirrored copies)
+            i = (self.head - 1) % self.capacity
+            j = i + self.capacity
+            if value < self.mins[i]:
+                self.mins[i] = self.mins[j] = value
+            if value > self.maxs[i]:
+                self.maxs[i] = self.maxs[j] = value
+            return
+        self.bucket = bucket
+        i = self.head
+        j = i + self.capacity
+        self.starts[i] = self.starts[j] = bucket * self.width
+        self.mins[i] = self.mins[j] = value
+        self.maxs[i] = self.maxs[j] = value
+        self.head = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def covers(self, t0):
+        """True if no bucket newer than t0 was evicted yet"""
+        return self.count < self.capacity or self.starts[self.head] <= t0
+
+    def window(self, t0):
+        """Returns copies of (starts, mins, maxs) of the buckets that overlap [t0, now]"""
+        end = self.head + self.capacity
+        begin = end - self.count
+        start = begin + int(np.searchsorted(self.starts[begin:end], t0 - self.width, side='right'))
+        return self.starts[start:end].copy(), self.mins[start:end].copy(), self.maxs[start:end].copy()
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+        self.bucket = None
+
+
+class SeriesBuffer:
+    """Preallocated ring of (timestamp, int16 value) samples for one plotted series.
+
+    Every sample is written twice (at i and i + capacity), so the newest
+    samples always form one contiguous slice of the arrays and a time window
+    is selected with searchsorted on that slice, without stitching or copying
+    the whole ring.
+
+    Every sample also feeds a pyramid of MinMaxLevel, used by decimated
+    windows when the raw samples do not fit the requested number of points.
+    """
+
+    def __init__(self, capacity, level_widths=LEVEL_WIDTHS, level_capacity=LEVEL_CAPACITY):
+        self.capacity = capacity
+        self.levels = [MinMaxLevel(width, level_capacity) for width in level_widths]
+        self.times = np.zeros(2 * capacity, dtype=np.float64)
+        self.values = np.zeros(2 * capacity, dtype=np.int16)
+        self.head = 0     # Next write position (0..capacity-1)
+        self.count = 0    # Number of valid samples
+        self.version = 0  # Changes whenever the contents change
+
+    def append(self, t, value):
+        i = self.head
+        j = i + self.capacity
+        self.times[i] = self.times[j] = t
+        self.values[i] = self.values[j] = value
+        self.head = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        for level in self.levels:
+            level.append(t, value)
+        self.version += 1
+
+    def window(self, t0):
+        """Returns copies of (times, values) for the samples with time >= t0"""
+        end = self.head + self.capacity
+        begin = end - self.count
+        times = self.times[begin:end]
+        start = begin + int(np.searchsorted(times, t0, side='left'))
+        return self.times[start:end].copy(), self.values[start:end].copy()
+
+    def decimated_window(self, t0, max_points):
+        """Returns (times, values, decimated) for the samples since t0 with about max_points points.
+
+        Raw samples are returned when they reach back to t0 and fit; otherwise
+        the finest level that does is used, as a (min, max) pair per bucket so
+        spikes and wraps stay visible.
+        """
+        end = self.head + self.capacity
+        if self.count < self.capacity or self.times[end - self.count] <= t0:
+            times, values = self.window(t0)
+            if len(times) <= max_points:
+                return times, values, False
+
+        for level in self.levels:
+            if level is self.levels[-1] or level.covers(t0):
+                starts, mins, maxs = level.window(t0)
+                if 2 * len(starts) <= max_points or level is self.levels[-1]:
+                    break
+        # Both points at the bucket center: one vertical segment per bucket
+        times = np.repeat(starts + level.width / 2, 2)
+        values = np.empty(len(times), dtype=np.int16)
+        values[0::2] = mins
+        values[1::2] = maxs
+        return times, values, True
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+        for level in self.levels:
+            level.clear()
+        self.version += 1
+
+
+class PlotDataStore:
+    """Per group/magnitude sample buffers shared by the reader thread and the plot.
+
+    Appends (reader thread) and window reads (Tk thread) take a short lock;
+    reads only copy the selected window. version increases on every change so
+    consumers can tell whether anything new arrived.
+    """
+
+    def __init__(self, groups=8, capacity=2048):
+        self.lock = threading.Lock()
+        self.series = {(group, mag): SeriesBuffer(capacity) for group in range(groups) for mag in MAGNITUDES}
+        self.version = 0
+
+    def append(self, group, magnitude, t, value):
+        """Adds one sample (value is clipped to the int16 range)"""
+        buffer = self.series.get((group, magnitude))
+        if buffer is None:
+            return
+        value = max(-32768, min(32767, int(value)))
+        with self.lock:
+            buffer.append(t, value)
+            self.version += 1
+
+    def window(self, group, magnitude, t0):
+        """Returns (times, values) arrays of one series since t0"""
+        with self.lock:
+            return self.series[(group, magnitude)].window(t0)
+
+    def windows(self, keys, t0):
+        """Returns {(group, magnitude): (times, values)} for several series under one lock"""
+        with self.lock:
+            return {key: self.series[key].window(t0) for key in keys}
+
+    def changed_windows(self, keys, t0, seen_versions, max_points):
+        """Decimated windows of the series whose version differs from seen_versions.
+
+        Returns {(group, magnitude): (version, times, values, decimated)}.
+        """
+        changed = {}
+        with self.lock:
+            for key in keys:
+                buffer = self.series[key]
+                if buffer.version != seen_versions.get(key):
+                    changed[key] = (buffer.version,) + buffer.decimated_window(t0, max_points)
+        return changed
+
+    def clear(self):
+        with self.lock:
+            for buffer in self.series.values():
+                buffer.clear()
+            self.version += 1
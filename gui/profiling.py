@@ -0,0 +1,169 @@
+# Lightweight instrumentation of the monitor's own hot paths.
+#
+# Stages are named timers fed with perf_counter() differences around a batch
+# of work (a read chunk, a parsed batch, a UI drain...), never per byte. The
+# SamplingProfiler is a separate, on-demand thread that snapshots the stack
+# of every thread with sys._current_frames(), so a live session can be
+# profiled without restarting it under cProfile.
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import Counter
+from datetime import datetime
+
+SAMPLES_KEPT = 1024        # Latest durations per stage used for the p99
+SAMPLING_INTERVAL = 0.005  # s between stack samples of the sampling profiler
+
+
+class StageTimer:
+    """Call count, cumulative and maximum time of one stage, plus its latest durations"""
+
+    def __init__(self, name):
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = array('d', bytes(8 * SAMPLES_KEPT))  # Ring of the latest durations
+        self.next = 0
+
+    def add(self, seconds):
+        self.calls += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.samples[self.next] = seconds
+        self.next = (self.next + 1) % SAMPLES_KEPT
+
+    def p99(self):
+        """99th percentile of the latest SAMPLES_KEPT durations"""
+        kept = min(self.calls, SAMPLES_KEPT)
+        if not kept:
+            return 0.0
+        recent = sorted(self.samples[:kept])
+        return recent[min(kept - 1, int(0.99 * kept))]
+
+
+_stages = {}  # name -> StageTimer, in registration order
+_started = (time.monotonic(), time.process_time())
+_last_cpu = _started
+
+
+def stage(name):
+    """The StageTimer for name, created on first use (call once, keep the timer)"""
+    return _stages.setdefault(name, StageTimer(name))
+
+
+def reset():
+    global _started, _last_cpu
+    for timer in list(_stages.values()):
+        timer.reset()
+    _started = _last_cpu = (time.monotonic(), time.process_time())
+
+
+def cpu_percent():
+    """Process CPU time (all threads) as % of one core since the previous call"""
+    global _last_cpu
+    now = (time.monotonic(), time.process_time())
+    wall, cpu = now[0] - _last_cpu[0], now[1] - _last_cpu[1]
+    _last_cpu = now
+    return 100 * cpu / wall if wall > 0 else 0.0
+
+
+def snapshot():
+    """Returns (seconds measured, process CPU seconds, rows) since the last reset.
+
+    Rows are (stage, calls, total, mean, p99, max), times in seconds.
+    """
+    elapsed = time.monotonic() - _started[0]
+    cpu = time.process_time() - _started[1]
+    rows = []
+    for timer in list(_stages.values()):
+        mean = timer.total / timer.calls if timer.calls else 0.0
+        rows.append((timer.name, timer.calls, timer.total, mean, timer.p99(), timer.max))
+    return elapsed, cpu, rows
+
+
+def format_report():
+    elapsed, cpu, rows = snapshot()
+    lines = [f"# arducanmon stage timings, {datetime.now():%Y-%m-%d %H:%M:%S}",
+             f"# {elapsed:.1f} s measured, {cpu:.2f} s CPU ({100 * cpu / elapsed if elapsed else 0:.1f}% of a core)",
+             f"{'stage':<12} {'calls':>10} {'total ms':>10} {'mean us':>10} {'p99 us':>10} "
+             f"{'max ms':>8} {'% time':>7}"]
+    for name, calls, total, mean, p99, longest in rows:
+        share = 100 * total / elapsed if elapsed else 0.0
+        lines.append(f"{name:<12} {calls:>10} {1000 * total:>10.1f} {1e6 * mean:>10.1f} {1e6 * p99:>10.1f} "
+                     f"{1000 * longest:>8.2f} {share:>7.2f}")
+    return "\n".join(lines) + "\n"
+
+
+def dump(path):
+    """Writes the stage timings as a text table"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(format_report())
+
+
+class SamplingProfiler:
+    """Statistical profiler of a running process, started and stopped on demand.
+
+    A daemon thread takes the stack of every other thread every `interval`
+    seconds and counts identical stacks. Samples are wall clock: threads
+    blocked in select() or read() show up there, which tells idle time
+    apart. write() saves them as collapsed stacks ("thread;outer;...;inner
+    count"), the input of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=SAMPLING_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.thread = None
+        self.running = False
+
+    def start(self):
+        self.stacks.clear()
+        self.samples = 0
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="sampling-profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+    def run(self):
+        own = threading.get_ident()
+        stacks = self.stacks
+        while self.running:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def top(self, count=10):
+        """Functions most often on top of a stack: [(function, samples)]"""
+        leaves = Counter()
+        for stack, samples in self.stacks.items():
+            leaves[stack[-1]] += samples
+        return leaves.most_common(count)
+
+    def write(self, path):
+        """Saves the samples as collapsed stacks"""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, samples in self.stacks.most_common():
+                f.write(";".join(stack) + f" {samples}\n")
@@ -0,0 +1,215 @@
+# Session files: the raw firmware lines of a monitoring session, for replay.
+#
+# Session file: the 8 byte SESSION_MAGIC followed by records, little endian:
+#   timestamp(d, host time of the read batch) length(H) line(length bytes, ASCII)
+# Lines read in the same batch share their timestamp. The sidecar index
+# (<session>.idx) has the same format as the capture index.
+#
+# Usage: python replay.py <session> [speed] replays a session through the
+# parser (as fast as possible if no speed is given) and prints the throughput.
+import bisect
+import mmap
+import struct
+import sys
+import threading
+import time
+
+from capture import CaptureWriter, load_index
+from tp2parser import parse_lines
+
+SESSION_MAGIC = b"CANSES01"
+SESSION_EXTENSION = ".cansession"
+
+_LINE = struct.Struct("<dH")
+
+
+class SessionWriter(CaptureWriter):
+    """Records the text of every received frame (the firmware line) with its batch timestamp"""
+
+    magic = SESSION_MAGIC
+
+    def encode_batch(self, timestamp, frames, out, index):
+        pack = _LINE.pack
+        for frame in frames:
+            line = frame.text.encode("ascii", errors="replace")[:0xFFFF]
+            self.add_index_entry(timestamp, len(out), index)
+            out += pack(timestamp, len(line))
+            out += line
+        return len(frames)
+
+
+class SessionReader:
+    """Memory-mapped reader of a session file"""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            self.file.close()
+            raise ValueError(f"{path} is not a session file")
+        if self.map[:len(SESSION_MAGIC)] != SESSION_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a session file")
+        self.size = len(self.map)
+        self.index_times, self.index_offsets = load_index(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def offset_for(self, timestamp):
+        """Returns the offset of an indexed record at most one index interval before timestamp"""
+        i = bisect.bisect_right(self.index_times, timestamp) - 1
+        return self.index_offsets[i] if i >= 0 else len(SESSION_MAGIC)
+
+    def batches(self, offset=None):
+        """Yields (timestamp, lines, end offset) for each run of lines with the same timestamp.
+
+        A truncated last record (recording interrupted) ends the iteration.
+        """
+        data = self.map
+        size = self.size
+        unpack = _LINE.unpack_from
+        header = _LINE.size
+        if offset is None:
+            offset = len(SESSION_MAGIC)
+        lines = []
+        batch_time = None
+        while offset + header <= size:
+            timestamp, length = unpack(data, offset)
+            end = offset + header + length
+            if end > size:
+                break
+            if timestamp != batch_time and lines:
+                yield batch_time, lines, offset
+                lines = []
+            batch_time = timestamp
+            lines.append(data[offset + header:end].decode("ascii", errors="replace"))
+            offset = end
+        if lines:
+            yield batch_time, lines, offset
+
+
+class ReplaySource:
+    """Feeds the lines of a session file to on_lines from a thread, like SerialReader.
+
+    Every run of lines read in one batch is delivered with its recorded
+    timestamp, so rates and intervals computed downstream do not depend on
+    the replay speed. speed is a multiple of real time (1.0 reproduces the
+    original pacing) or None to replay as fast as possible.
+    """
+
+    def __init__(self, path, on_lines, speed=1.0, on_done=None, start_time=None):
+        self.reader = SessionReader(path)
+        self.on_lines = on_lines  # Called from the replay thread with (recorded timestamp, list of str)
+        self.on_done = on_done    # Called from the replay thread when the replay ends
+        self.speed = speed
+        self.start_time = start_time
+        self.running = False
+        self.finished = False  # Set once the replay thread is done with the file
+        self.thread = None
+
+        self.lines_total = 0
+        self.position = 0
+        self._last_snapshot = (time.monotonic(), 0)
+
+    @property
+    def progress(self):
+        """Fraction of the file replayed so far"""
+        return self.position / self.reader.size if self.reader.size else 1.0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Asks the replay thread to finish (returns within 0.1 s)"""
+        self.running = False
+
+    def run(self):
+        """Replay thread body"""
+        offset = None
+        if self.start_time is not None:
+            offset = self.reader.offset_for(self.start_time)
+        try:
+            if self.speed:
+                self.replay_paced(offset)
+            else:
+                self.replay_max(offset)
+        finally:
+            self.running = False
+            self.reader.close()
+            self.finished = True
+            if self.on_done:
+                self.on_done()
+
+    def replay_paced(self, offset):
+        first_time = None
+        start = time.monotonic()
+        for timestamp, lines, end in self.reader.batches(offset):
+            if self.start_time is not None and timestamp < self.start_time:
+                continue
+            if first_time is None:
+                first_time = timestamp
+            due = start + (timestamp - first_time) / self.speed
+            while self.running:
+                delay = due - time.monotonic()
+                if delay <= 0:
+                    break
+                time.sleep(min(delay, 0.1))
+            if not self.running:
+                return
+            self.on_lines(timestamp, lines)
+            self.lines_total += len(lines)
+            self.position = end
+
+    def replay_max(self, offset):
+        for timestamp, lines, end in self.reader.batches(offset):
+            if not self.running:
+                return
+            if self.start_time is not None and timestamp < self.start_time:
+                continue
+            self.on_lines(timestamp, lines)
+            self.lines_total += len(lines)
+            self.position = end
+        self.position = self.reader.size
+
+    def snapshot(self):
+        """Returns the lines/s replayed since the previous snapshot"""
+        now = time.monotonic()
+        last_time, last_lines = self._last_snapshot
+        lines_total = self.lines_total
+        self._last_snapshot = (now, lines_total)
+        elapsed = now - last_time
+        return (lines_total - last_lines) / elapsed if elapsed > 0 else 0.0
+
+
+def main(path, speed=None):
+    frames = 0
+
+    def on_lines(timestamp, lines):
+        nonlocal frames
+        frames += len(parse_lines(lines))
+
+    source = ReplaySource(path, on_lines, speed=speed)
+    start = time.perf_counter()
+    source.start()
+    source.thread.join()
+    elapsed = time.perf_counter() - start
+    print(f"{frames} lines in {elapsed:.2f} s ({frames / elapsed if elapsed > 0 else 0:.0f} lines/s)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python replay.py <session> [speed]", file=sys.stderr)
+        sys.exit(2)
+    main(sys.argv[1], float(sys.argv[2]) if len(sys.argv) == 3 else None)
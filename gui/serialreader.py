@@ -0,0 +1,96 @@
+import threading
+import time
+
+from binproto import StreamFramer, SEGMENT_LINES
+from profiling import stage
+
+_read_stage = stage("read")
+
+
+class SerialReader:
+    """Reads a serial port in bulk and hands batches of complete items downstream.
+
+    The reader thread blocks in read() until at least one byte arrives (or the
+    read timeout expires), then pulls everything already waiting in a single
+    call. A StreamFramer splits the bytes into ASCII lines (default firmware
+    output) or binary frames (after the firmware switches to binary output);
+    partial lines/records stay buffered until the rest of them arrives.
+    """
+
+    def __init__(self, port, on_lines, on_error=None, on_frames=None, read_timeout=0.1):
+        self.port = port
+        self.on_lines = on_lines    # Called from the reader thread with a list of str
+        self.on_frames = on_frames  # Called from the reader thread with a list of Frame
+        self.on_error = on_error    # Called from the reader thread with the exception
+        self.read_timeout = read_timeout
+        self.framer = StreamFramer()
+        self.running = False
+        self.thread = None
+
+        # Counters (only written by the reader thread)
+        self.bytes_total = 0
+        self.lines_total = 0  # Lines and binary frames
+        self._last_snapshot = (time.monotonic(), 0, 0)
+
+    @property
+    def decode_errors(self):
+        return self.framer.decode_errors
+
+    @property
+    def overflows(self):
+        return self.framer.overflows
+
+    @property
+    def binary(self):
+        """True while the firmware output is in binary mode"""
+        return self.framer.binary
+
+    def start(self):
+        """Starts the reader thread"""
+        self.port.timeout = self.read_timeout
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Asks the reader thread to finish (returns within one read timeout)"""
+        self.running = False
+
+    def run(self):
+        """Reader thread body"""
+        port = self.port
+        while self.running:
+            try:
+                waiting = port.in_waiting
+                # Block for the first byte, otherwise take everything already received
+                chunk = port.read(waiting if waiting else 1)
+            except Exception as e:
+                if self.running and self.on_error:
+                    self.on_error(e)
+                break
+            if chunk:
+                self.handle_chunk(chunk)
+
+    def handle_chunk(self, chunk):
+        """Frames a chunk of received bytes and hands the complete items downstream"""
+        start = time.perf_counter()
+        self.bytes_total += len(chunk)
+        for kind, items in self.framer.feed(chunk):
+            self.lines_total += len(items)
+            if kind == SEGMENT_LINES:
+                self.on_lines(items)
+            elif self.on_frames:
+                self.on_frames(items)
+        # Framing plus everything done downstream with the chunk
+        _read_stage.add(time.perf_counter() - start)
+
+    def snapshot(self):
+        """Returns (bytes/s, lines/s) since the previous snapshot"""
+        now = time.monotonic()
+        last_time, last_bytes, last_lines = self._last_snapshot
+        bytes_total, lines_total = self.bytes_total, self.lines_total
+        self._last_snapshot = (now, bytes_total, lines_total)
+        elapsed = now - last_time
+        if elapsed <= 0:
+            return 0.0, 0.0
+        return (bytes_total - last_bytes) / elapsed, (lines_total - last_lines) / elapsed
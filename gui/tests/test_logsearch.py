@@ -0,0 +1,171 @@
+# Unit tests for the message log search (logsearch).
+#
+# Usage: python -m unittest discover tests   (from gui/; or: python -m pytest tests)
+# count() and locate() must agree with each other and with a search of every
+# record on its own, so no match ever spans two records.
+import os
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logsearch import LogSearchIndex, _Block, count, locate  # noqa: E402
+from msglog import MessageLog  # noqa: E402
+from tp2parser import format_rx_line, format_tx_line  # noqa: E402
+
+
+def make_records(count, start=0):
+    """Firmware lines (ts, text, tag) of a few TP2 groups, with status and error lines mixed in"""
+    records = []
+    for i in range(start, start + count):
+        if i % 7 == 3:
+            records.append((i, "TP2_ANGLE_SENT_OK", "rx_msg"))
+        elif i % 13 == 6:
+            records.append((i, f"Error sending angle: write failed {i % 10}", "error"))
+        elif i % 11 == 5:
+            records.append((i, f"SEND_10{i % 3}_52_31", "tx_msg"))
+        else:
+            payload = f"{'RCO'[i % 3]}{(i * 37) % 360 - 179}".encode("ascii")
+            line = format_tx_line if i % 5 == 0 else format_rx_line
+            records.append((i, line(0x100 + i % 4, payload), "rx_msg"))
+    return records
+
+
+def reference(texts, pattern, regex, first_seq=0):
+    """(seq, column, length) of every match, searching each record on its own"""
+    matches = []
+    for seq, text in enumerate(texts, first_seq):
+        if regex:
+            matches.extend((seq, m.start(), m.end() - m.start()) for m in pattern.finditer(text))
+        else:
+            column = text.find(pattern)
+            while column != -1:
+                matches.append((seq, column, len(pattern)))
+                column = text.find(pattern, column + len(pattern))
+    return matches
+
+
+QUERIES = [
+    ("CAN_RX", False),
+    ("_5", False),
+    (r"\d\sS", True),   # Would run from the end of one record into the next
+    (r"_\d+\s", True),
+    (r"\s", True),
+    (r"OK$", True),
+    (r"^CAN_TX_OK_10[0-3]", True),
+]
+
+
+class CountLocateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.texts = [text for _, text, _ in make_records(500)]
+        self.block = _Block(1000, self.texts)
+
+    def check(self, block, texts, first_line, first_seq):
+        for query, regex in QUERIES:
+            with self.subTest(query=query, first_line=first_line):
+                pattern = re.compile(query, re.MULTILINE) if regex else query
+                expected = reference(texts[first_line:], pattern, regex, first_seq + first_line)
+                total, per_line = count(block, pattern, regex, first_line)
+                self.assertEqual(total, len(expected))
+                self.assertEqual(locate(block, pattern, regex, first_line, per_line), expected)
+
+    def test_whole_block(self):
+        self.check(self.block, self.texts, 0, 1000)
+
+    def test_partially_evicted_block(self):
+        for first_line in (1, 3, 250, 499):
+            self.check(self.block, self.texts, first_line, 1000)
+
+    def test_whitespace_regex_stays_in_record(self):
+        pattern = re.compile(r"\d\sS", re.MULTILINE)
+        block = _Block(0, ["TP2_1", "SEND_1", "CAN_2", "SEND_3"])
+        self.assertEqual(count(block, pattern, True), (0, True))
+        self.assertEqual(locate(block, pattern, True, per_line=True), [])
+
+    def test_filtered_block(self):
+        # Blocks built from postings map line numbers back to sequence numbers
+        seqs = list(range(7, 3007, 6))
+        texts = [self.texts[i % len(self.texts)] for i in range(len(seqs))]
+        block = _Block(seqs[0], texts, seqs)
+        for query, regex in QUERIES:
+            with self.subTest(query=query):
+                pattern = re.compile(query, re.MULTILINE) if regex else query
+                expected = [(seqs[line], column, length)
+                            for line, column, length in reference(texts, pattern, regex)]
+                total, per_line = count(block, pattern, regex)
+                self.assertEqual(total, len(expected))
+                self.assertEqual(locate(block, pattern, regex, 0, per_line), expected)
+
+
+class SearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.log = MessageLog(max_lines=3000)
+        self.index = LogSearchIndex(self.log)
+        self.index.BLOCK_LINES = 256
+        self.add(make_records(5000))
+
+    def add(self, records):
+        first_seq = self.log.next_seq
+        self.log.extend(records)
+        self.index.add(first_seq, records)
+
+    def retained(self, keep=lambda text, tag: True):
+        log = self.log
+        return [(seq, log.text(seq)) for seq in range(log.first_seq, log.next_seq)
+                if keep(log.text(seq), log.get(seq)[2])]
+
+    def expected(self, pattern, regex, records):
+        matches = []
+        for seq, text in records:
+            matches.extend((seq, column, length) for _, column, length in reference([text], pattern, regex))
+        return matches
+
+    def assertSearch(self, query, regex, expected):
+        result = self.index.search(query, regex)
+        result.count_pending()
+        self.assertTrue(result.complete)
+        self.assertEqual([result[i] for i in range(len(result))], expected)
+
+    def test_evicted_lines_are_skipped(self):
+        # 5000 lines into a 3000 line log: the oldest retained block is partially evicted
+        self.assertNotEqual(self.log.first_seq % self.index.BLOCK_LINES, 0)
+        for query, regex in QUERIES:
+            with self.subTest(query=query):
+                pattern = re.compile(query, re.MULTILINE) if regex else query
+                self.assertSearch(query, regex, self.expected(pattern, regex, self.retained()))
+
+    def test_id_filter(self):
+        for query, regex in QUERIES:
+            with self.subTest(query=query):
+                pattern = re.compile(query, re.MULTILINE) if regex else query
+                records = self.retained(lambda text, tag: tag == "rx_msg" and re.match(r"CAN_(RX|TX_OK)_102_", text))
+                self.assertSearch(f"id:102 {query}", regex, self.expected(pattern, regex, records))
+
+    def test_type_filter(self):
+        for query, regex in QUERIES:
+            with self.subTest(query=query):
+                pattern = re.compile(query, re.MULTILINE) if regex else query
+                records = self.retained(lambda text, tag: tag == "rx_msg" and text.startswith("CAN_RX_"))
+                self.assertSearch(f"type:rx {query}", regex, self.expected(pattern, regex, records))
+
+    def test_filter_without_text(self):
+        records = self.retained(lambda text, tag: tag == "tx_msg")
+        self.assertSearch("type:cmd", False, [(seq, 0, len(text)) for seq, text in records])
+
+    def test_eviction_while_counting(self):
+        # Lines evicted before they are counted are skipped; lines added later are not searched
+        result = self.index.search("id:101 CAN", False)
+        end = self.log.next_seq
+        self.add(make_records(1000, start=5000))
+        result.count_pending()
+        records = [(seq, text) for seq, text in self.retained(
+            lambda text, tag: tag == "rx_msg" and re.match(r"CAN_(RX|TX_OK)_101_", text)) if seq < end]
+        self.assertEqual([result[i] for i in range(len(result))], self.expected("CAN", False, records))
+
+
+if __name__ == "__main__":
+    unittest.main()
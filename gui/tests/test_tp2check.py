@@ -0,0 +1,114 @@
+# Unit tests for the TP2 compliance checker (tp2check).
+#
+# Usage: python -m unittest discover tests   (from gui/; or: python -m pytest tests)
+# Frames go through the parser, as in the monitor, with explicit arrival times.
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tp2check import (TP2Checker, VIOLATION_GAP, VIOLATION_MALFORMED, VIOLATION_RATE,  # noqa: E402
+                      VIOLATION_REDUNDANT)
+from tp2parser import format_rx_line, parse_line  # noqa: E402
+
+
+def frame(payload, group=1):
+    return parse_line(format_rx_line(0x100 + group, payload))
+
+
+class TP2CheckerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.checker = TP2Checker()
+
+    def send(self, now, value, angle_type="R", group=1):
+        self.checker.add_frames(now, [frame(f"{angle_type}{value}".encode("ascii"), group)])
+
+    def kinds(self):
+        return [violation[3] for violation in self.checker.take_new()]
+
+    def send_changing(self, times):
+        # Every packet changes by 10 degrees, so only the rate can be violated
+        for i, now in enumerate(times):
+            self.send(now, 10 * (i % 2))
+
+    def test_20_packets_per_second_pass(self):
+        self.send_changing([i / 20 for i in range(100)])
+        self.assertEqual(self.kinds(), [])
+
+    def test_burst_of_20_passes(self):
+        self.send_changing([i * 0.01 for i in range(20)] + [1.0 + i * 0.01 for i in range(20)])
+        self.assertEqual(self.kinds(), [])
+
+    def test_21_packets_within_a_second_fail(self):
+        self.send_changing([i * 0.95 / 20 for i in range(21)])
+        self.assertEqual(self.kinds(), [VIOLATION_RATE])
+        self.assertEqual(self.checker.counts[VIOLATION_RATE], 1)
+
+    def test_21_packets_per_second_fail(self):
+        self.send_changing([i / 21 for i in range(42)])
+        self.assertEqual(self.kinds(), [VIOLATION_RATE])
+
+    def test_rate_is_per_angle_type(self):
+        for i in range(20):
+            for angle_type in "RCO":
+                self.send(i * 0.01, 10 * (i % 2), angle_type)
+        self.assertEqual(self.kinds(), [])
+
+    def test_gap_reported_on_next_packet(self):
+        self.send(0.0, 10)
+        self.send(2.0, 10)
+        self.assertEqual(self.kinds(), [])
+        self.send(4.5, 10)
+        self.assertEqual(self.kinds(), [VIOLATION_GAP])
+
+    def test_gap_reported_by_poll(self):
+        self.send(0.0, 10)
+        self.checker.poll(2.0)
+        self.assertEqual(self.kinds(), [])
+        self.checker.poll(2.5)
+        self.assertEqual(self.kinds(), [VIOLATION_GAP])
+        # Already reported: neither the next poll nor the next packet report it again
+        self.checker.poll(3.0)
+        self.send(3.5, 10)
+        self.assertEqual(self.kinds(), [])
+        self.assertEqual(self.checker.counts[VIOLATION_GAP], 1)
+
+    def test_redundant_send(self):
+        self.send(0.0, 10)
+        self.send(0.5, 14)
+        self.assertEqual(self.kinds(), [VIOLATION_REDUNDANT])
+
+    def test_change_of_5_degrees_is_not_redundant(self):
+        self.send(0.0, 10)
+        self.send(0.1, 15)
+        self.send(0.2, 10)
+        self.assertEqual(self.kinds(), [])
+
+    def test_unchanged_angle_close_to_heartbeat_is_not_redundant(self):
+        self.send(0.0, 10)
+        self.send(1.6, 10)
+        self.assertEqual(self.kinds(), [])
+
+    def test_malformed_payloads(self):
+        for payload in (b"R", b"R12345", b"X10"):
+            with self.subTest(payload=payload):
+                self.checker.add_frames(0.0, [frame(payload)])
+                self.assertEqual(self.kinds(), [VIOLATION_MALFORMED])
+        self.assertEqual(self.checker.counts[VIOLATION_MALFORMED], 3)
+
+    def test_valid_payloads(self):
+        for i, payload in enumerate((b"R-34", b"C0", b"O67", b"R+138", b"C-072")):
+            self.checker.add_frames(3.0 * i, [frame(payload, group=i)])
+        self.assertEqual(self.kinds(), [])
+        self.assertEqual(self.checker.frames, 5)
+
+    def test_other_ids_are_ignored(self):
+        self.checker.add_frames(0.0, [parse_line(format_rx_line(0x200, b"R"))])
+        self.assertEqual(self.kinds(), [])
+        self.assertEqual(self.checker.frames, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
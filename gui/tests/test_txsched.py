@@ -0,0 +1,158 @@
+# Unit tests for the deadline scheduler of the TX streams (txsched).
+#
+# Usage: python -m unittest discover tests   (from gui/; or: python -m pytest tests)
+# The scheduler only uses engine.call_soon() and loop.time()/call_at(), so a
+# fake loop with a manual clock stands in for the IOEngine.
+import heapq
+import itertools
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from txsched import (REASON_CHANGE, REASON_HEARTBEAT, REASON_PERIOD, TP2_MIN_INTERVAL,  # noqa: E402
+                     TXScheduler, TXStream)
+
+
+class FakeTimer:
+
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class FakeLoop:
+    """Manual clock; run_until() fires the due timers, each `late` seconds after its time"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.timers = []  # (when, order, timer, callback)
+        self.order = itertools.count()
+
+    def time(self):
+        return self.now
+
+    def call_at(self, when, callback):
+        timer = FakeTimer()
+        heapq.heappush(self.timers, (when, next(self.order), timer, callback))
+        return timer
+
+    def run_until(self, end, late=0.0):
+        while self.timers and self.timers[0][0] <= end:
+            when, _, timer, callback = heapq.heappop(self.timers)
+            if timer.cancelled:
+                continue
+            self.now = max(self.now, when + late)
+            callback()
+        self.now = max(self.now, end)
+
+
+class FakeEngine:
+
+    def __init__(self):
+        self.loop = FakeLoop()
+
+    def call_soon(self, callback, *args):
+        callback(*args)
+
+
+class TXSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = FakeEngine()
+        self.loop = self.engine.loop
+        self.errors = []
+        self.scheduler = TXScheduler(self.engine, on_error=lambda stream, error: self.errors.append(error))
+        self.sent = []  # (deadline, value, reason)
+
+    def on_send(self, stream, value, reason):
+        self.sent.append((stream.deadline, value, reason))
+
+    def add(self, period, sample=None, on_send=None, key="test"):
+        stream = TXStream(key, on_send or self.on_send, period, sample)
+        self.scheduler.add(stream)
+        return stream
+
+    def test_deadlines_do_not_drift(self):
+        # Every evaluation runs 30 ms late, yet the deadlines stay on the 100 ms grid
+        self.add(0.1)
+        self.loop.run_until(0.95, late=0.03)
+        deadlines = [deadline for deadline, _, _ in self.sent]
+        self.assertEqual(len(deadlines), 10)
+        for i, deadline in enumerate(deadlines):
+            self.assertAlmostEqual(deadline, 0.1 * i)
+        self.assertTrue(all(reason == REASON_PERIOD for _, _, reason in self.sent))
+
+    def test_missed_slots_are_skipped(self):
+        stream = self.add(0.1)
+        self.loop.run_until(0.0)
+        # The next evaluation runs 350 ms late: the slots at 0.2, 0.3 and 0.4 are skipped, not burst
+        self.loop.run_until(0.1, late=0.35)
+        self.assertEqual(stream.skipped, 3)
+        self.assertAlmostEqual(stream.deadline, 0.5)
+        self.assertAlmostEqual(stream.late_max, 0.35)
+        self.loop.run_until(0.5)
+        self.assertEqual([round(deadline, 6) for deadline, _, _ in self.sent], [0.0, 0.1, 0.5])
+
+    def test_heartbeat_every_2_seconds(self):
+        self.add(0.1, sample=lambda t: 42)
+        self.loop.run_until(4.5)
+        self.assertEqual([(round(deadline, 6), value, reason) for deadline, value, reason in self.sent],
+                         [(0.0, 42, REASON_CHANGE), (2.0, 42, REASON_HEARTBEAT), (4.0, 42, REASON_HEARTBEAT)])
+
+    def test_change_of_5_degrees_sends_at_once(self):
+        self.add(0.1, sample=lambda t: 0 if t < 0.45 else 4 if t < 0.95 else 9)
+        self.loop.run_until(1.5)
+        # The 4 degree move is held back; the next evaluation after reaching 9 sends
+        self.assertEqual([(round(deadline, 6), value, reason) for deadline, value, reason in self.sent],
+                         [(0.0, 0, REASON_CHANGE), (1.0, 9, REASON_CHANGE)])
+
+    def test_tp2_streams_are_capped_at_20_per_second(self):
+        stream = self.add(0.001, sample=lambda t: 10 * round(t / TP2_MIN_INTERVAL) % 360)
+        self.assertEqual(stream.period, TP2_MIN_INTERVAL)
+        self.loop.run_until(0.999)
+        self.assertEqual(len(self.sent), 20)
+        self.assertTrue(all(reason == REASON_CHANGE for _, _, reason in self.sent))
+
+    def test_periodic_streams_are_not_capped(self):
+        self.add(0.01)
+        self.loop.run_until(0.999)
+        self.assertEqual(len(self.sent), 100)
+
+    def test_dropped_send_is_retried(self):
+        accept = iter([False, False, True])
+        stream = self.add(0.1, sample=lambda t: 30, on_send=lambda stream, value, reason: next(accept, True))
+        self.loop.run_until(0.25)
+        self.assertEqual(stream.dropped, 2)
+        self.assertEqual(stream.sent, 1)
+        self.assertAlmostEqual(stream.last_sent, 0.2)
+        self.assertEqual(stream.last_value, 30)
+
+    def test_failing_stream_stops_alone(self):
+        def sample(t):
+            if t > 0.25:
+                raise KeyError(t)
+            return 0
+        failing = self.add(0.1, sample=sample, key="failing")
+        periodic = self.add(0.1, key="periodic")
+        self.loop.run_until(1.0)
+        self.assertEqual(len(self.errors), 1)
+        self.assertFalse(failing.active)
+        self.assertEqual(list(self.scheduler.streams), ["periodic"])
+        self.assertEqual(periodic.sent, 11)
+
+    def test_removed_stream_stops(self):
+        stream = self.add(0.1)
+        self.loop.run_until(0.25)
+        self.scheduler.remove("test")
+        self.loop.run_until(1.0)
+        self.assertFalse(stream.active)
+        self.assertEqual(len(self.sent), 3)
+        self.assertIsNone(self.scheduler.timer)
+
+
+if __name__ == "__main__":
+    unittest.main()
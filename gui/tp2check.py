@@ -0,0 +1,130 @@
+import re
+import threading
+from collections import deque
+
+from tp2parser import FRAME_RX, tp2_group
+from txsched import TP2_MAX_RATE, TP2_HEARTBEAT, TP2_MIN_CHANGE
+
+# Violation kinds
+VIOLATION_MALFORMED = "malformed"  # TP2 ID with a payload that is not <R|C|O><1-4 ASCII chars>
+VIOLATION_RATE = "rate"            # More than TP2_MAX_RATE packets of one angle within a second
+VIOLATION_GAP = "gap"              # More than TP2_HEARTBEAT seconds without a packet of one angle
+VIOLATION_REDUNDANT = "redundant"  # Change below TP2_MIN_CHANGE sent well before the heartbeat was due
+VIOLATION_KINDS = (VIOLATION_MALFORMED, VIOLATION_RATE, VIOLATION_GAP, VIOLATION_REDUNDANT)
+
+# Times are arrival times, so some slack keeps read batching from looking like a violation
+GAP_TOLERANCE = 0.1        # s over TP2_HEARTBEAT before a gap is reported
+RATE_TOLERANCE = 0.02      # s under a second for TP2_MAX_RATE + 1 packets before the rate is reported
+REDUNDANT_BEFORE = 1.5     # s: unchanged angles sent earlier than this are redundant
+MAX_VIOLATIONS = 200       # Violations kept for the list
+
+# 'R-34', 'C0', 'O67', 'R+138', 'C-072', ... (angleVal is 1 to 4 bytes)
+_PAYLOAD = re.compile(rb"[RCO](?=.{1,4}\Z)[+-]?[0-9]+\Z", re.DOTALL)
+
+
+class AngleState:
+    """What the checker remembers of one (group, angle type): constant size"""
+
+    __slots__ = ("times", "next", "last_time", "last_value", "over_rate", "gap_reported")
+
+    def __init__(self):
+        self.times = [None] * TP2_MAX_RATE  # Arrival of the last TP2_MAX_RATE packets (ring)
+        self.next = 0
+        self.last_time = None
+        self.last_value = None
+        self.over_rate = False     # Rate violation reported and not over yet
+        self.gap_reported = False  # Silence already reported by poll()
+
+
+class TP2Checker:
+    """Streaming checker of the TP2 transmission rules, fed with every received frame.
+
+    Each (group, angle type) has an AngleState, so memory is constant per
+    node, and every frame costs a payload match and a few comparisons.
+    Violations are counted by kind and the latest MAX_VIOLATIONS are kept as
+    (time, group, angle type, kind, detail) for the UI, which takes them with
+    take_new(). poll() reports angles that went silent without waiting for
+    their next packet.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.states = {}  # (group, angle type) -> AngleState
+            self.counts = dict.fromkeys(VIOLATION_KINDS, 0)
+            self.violations = deque(maxlen=MAX_VIOLATIONS)
+            self.new = []
+            self.frames = 0
+
+    def report(self, now, group, angle_type, kind, detail):
+        violation = (now, group, angle_type, kind, detail)
+        self.counts[kind] += 1
+        self.violations.append(violation)
+        self.new.append(violation)
+        if len(self.new) > MAX_VIOLATIONS:
+            del self.new[:-MAX_VIOLATIONS]
+
+    def add_frames(self, now, frames):
+        """Checks a batch of decoded frames received at time now (seconds)"""
+        with self.lock:
+            for frame in frames:
+                if frame.kind != FRAME_RX:
+                    continue
+                group = tp2_group(frame)
+                if group is None:
+                    continue
+                self.frames += 1
+                data = frame.data
+                if not _PAYLOAD.match(data):
+                    self.report(now, group, None, VIOLATION_MALFORMED, f"payload {data!r}")
+                    continue
+                self.check(now, group, chr(data[0]), int(data[1:]))
+
+    def check(self, now, group, angle_type, value):
+        states = self.states
+        state = states.get((group, angle_type))
+        if state is None:
+            state = states[(group, angle_type)] = AngleState()
+
+        # Rate: with this one, TP2_MAX_RATE + 1 packets must span at least a second
+        oldest = state.times[state.next]  # TP2_MAX_RATE-th previous arrival
+        state.times[state.next] = now
+        state.next = (state.next + 1) % TP2_MAX_RATE
+        if oldest is not None and now - oldest < 1.0 - RATE_TOLERANCE:
+            if not state.over_rate:
+                state.over_rate = True
+                self.report(now, group, angle_type, VIOLATION_RATE,
+                            f"{TP2_MAX_RATE + 1} packets in {now - oldest:.2f} s")
+        else:
+            state.over_rate = False
+
+        last_time = state.last_time
+        if last_time is not None:
+            gap = now - last_time
+            if gap > TP2_HEARTBEAT + GAP_TOLERANCE and not state.gap_reported:
+                self.report(now, group, angle_type, VIOLATION_GAP, f"{gap:.2f} s without a packet")
+            elif abs(value - state.last_value) < TP2_MIN_CHANGE and gap < REDUNDANT_BEFORE:
+                self.report(now, group, angle_type, VIOLATION_REDUNDANT,
+                            f"{state.last_value}° -> {value}° after {1000 * gap:.0f} ms")
+        state.last_time = now
+        state.last_value = value
+        state.gap_reported = False
+
+    def poll(self, now):
+        """Reports angles silent for longer than the heartbeat (call at a low rate)"""
+        with self.lock:
+            limit = TP2_HEARTBEAT + GAP_TOLERANCE
+            for (group, angle_type), state in self.states.items():
+                if not state.gap_reported and now - state.last_time > limit:
+                    state.gap_reported = True
+                    self.report(now, group, angle_type, VIOLATION_GAP,
+                                f"silent for {now - state.last_time:.1f} s")
+
+    def take_new(self):
+        """Returns the violations reported since the last call"""
+        with self.lock:
+            new, self.new = self.new, []
+            return new
@@ -0,0 +1,155 @@
+# Decoder for the lines printed by the arducanmon firmware.
+#
+# Every line is turned into a compact Frame record. The line type is selected
+# with a single precompiled prefix match and a dispatch table; hex fields are
+# converted through a lookup table instead of int(..., 16) per byte.
+import re
+from collections import namedtuple
+
+# Frame kinds
+FRAME_RX = "rx"                      # CAN_RX_<id>_<len>_<b0>_..._<bn>[_TP2_<type>_<value>]
+FRAME_TX = "tx"                      # CAN_TX_OK_<id>_<b0>_..._<bn>
+FRAME_TX_FAIL = "tx_fail"            # CAN_TX_FAIL
+FRAME_MODE = "mode"                  # MODE_SET_NORMAL / MODE_SET_LOOPBACK
+FRAME_ANGLE_SENT = "angle_sent"      # TP2_ANGLE_SENT_OK / TP2_ANGLE_SENT_FAIL
+FRAME_UNKNOWN_COMMAND = "unknown_command"
+FRAME_CMD_ERROR = "cmd_error"        # CMD_INVALID / CMD_OVERFLOW (command rejected by the firmware)
+FRAME_MALFORMED = "malformed"        # Known prefix but fields could not be decoded
+FRAME_STATUS = "status"              # Anything else (banners, AUTO_SEND_*, ...)
+
+ANGLE_TYPES = (ord('R'), ord('C'), ord('O'))
+
+# device_time is only known for frames from the binary output mode (microseconds)
+Frame = namedtuple("Frame", "kind can_id dlc data angle_type angle_value detail text device_time",
+                   defaults=(None,))
+
+# "5", "05", "2d", "2D", ... -> int
+_HEX_VALUES = {}
+for _value in range(256):
+    for _text in (f"{_value:X}", f"{_value:02X}", f"{_value:x}", f"{_value:02x}"):
+        _HEX_VALUES[_text] = _value
+
+# Bytes outside the printable ASCII range are dropped from angle values
+_NON_PRINTABLE = bytes(b for b in range(256) if not 32 <= b <= 126)
+
+_PREFIX = re.compile(r"CAN_RX_|CAN_TX_OK_|CAN_TX_FAIL|MODE_SET_|TP2_ANGLE_SENT_|UNKNOWN_COMMAND|CMD_")
+
+
+def decode_angle(data):
+    """Returns (angle_type, angle_value) for a TP2 payload or (None, None)"""
+    if len(data) >= 2 and data[0] in ANGLE_TYPES:
+        value = data[1:].translate(None, _NON_PRINTABLE).decode("ascii")
+        if value:
+            return chr(data[0]), value
+    return None, None
+
+
+def _malformed(line):
+    return Frame(FRAME_MALFORMED, None, 0, b"", None, None, None, line)
+
+
+def _parse_rx(line):
+    # CAN_RX_<id>_<len>_<bytes...>; the optional _TP2_ suffix is redundant with the payload
+    parts = line[7:].split("_")
+    try:
+        can_id = int(parts[0], 16)
+        dlc = int(parts[1])
+        fields = parts[2:2 + dlc]
+        if len(fields) != dlc or dlc > 8:
+            return _malformed(line)
+        hex_values = _HEX_VALUES
+        data = bytes([hex_values[field] for field in fields])
+    except (ValueError, IndexError, KeyError):
+        return _malformed(line)
+    angle_type, angle_value = decode_angle(data)
+    return Frame(FRAME_RX, can_id, dlc, data, angle_type, angle_value, None, line)
+
+
+def _parse_tx(line):
+    # CAN_TX_OK_<id>_<bytes...> (no length field)
+    parts = line[10:].split("_")
+    try:
+        can_id = int(parts[0], 16)
+        hex_values = _HEX_VALUES
+        data = bytes([hex_values[field] for field in parts[1:] if field])
+    except (ValueError, KeyError):
+        return _malformed(line)
+    if len(data) > 8:
+        return _malformed(line)
+    angle_type, angle_value = decode_angle(data)
+    return Frame(FRAME_TX, can_id, len(data), data, angle_type, angle_value, None, line)
+
+
+def _parse_tx_fail(line):
+    return Frame(FRAME_TX_FAIL, None, 0, b"", None, None, None, line)
+
+
+def _parse_mode(line):
+    return Frame(FRAME_MODE, None, 0, b"", None, None, line[9:], line)
+
+
+def _parse_angle_sent(line):
+    return Frame(FRAME_ANGLE_SENT, None, 0, b"", None, None, line[15:], line)
+
+
+def _parse_unknown_command(line):
+    return Frame(FRAME_UNKNOWN_COMMAND, None, 0, b"", None, None, None, line)
+
+
+def _parse_cmd_error(line):
+    return Frame(FRAME_CMD_ERROR, None, 0, b"", None, None, line[4:], line)
+
+
+_DISPATCH = {
+    "CAN_RX_": _parse_rx,
+    "CAN_TX_OK_": _parse_tx,
+    "CAN_TX_FAIL": _parse_tx_fail,
+    "MODE_SET_": _parse_mode,
+    "TP2_ANGLE_SENT_": _parse_angle_sent,
+    "UNKNOWN_COMMAND": _parse_unknown_command,
+    "CMD_": _parse_cmd_error,
+}
+
+
+def parse_line(line, _match=_PREFIX.match, _dispatch=_DISPATCH):
+    """Decodes one firmware line into a Frame"""
+    m = _match(line)
+    if m is None:
+        return Frame(FRAME_STATUS, None, 0, b"", None, None, None, line)
+    return _dispatch[m.group()](line)
+
+
+def parse_lines(lines, _match=_PREFIX.match, _dispatch=_DISPATCH):
+    """Decodes a batch of firmware lines into a list of Frames"""
+    frames = []
+    append = frames.append
+    for line in lines:
+        m = _match(line)
+        if m is None:
+            append(Frame(FRAME_STATUS, None, 0, b"", None, None, None, line))
+        else:
+            append(_dispatch[m.group()](line))
+    return frames
+
+
+def tp2_group(frame):
+    """Returns the TP2 group number (0-7) of a frame or None"""
+    if frame.can_id is None:
+        return None
+    group_id = frame.can_id - 0x100
+    return group_id if 0 <= group_id <= 7 else None
+
+
+def format_rx_line(can_id, data):
+    """Builds the CAN_RX_ line the firmware prints for a received frame"""
+    line = f"CAN_RX_{can_id:X}_{len(data)}" + "".join(f"_{b:X}" for b in data)
+    if len(data) >= 2 and data[0] in ANGLE_TYPES:
+        # The firmware prints the payload as a C string, stopping at the first NUL
+        value = bytes(data[1:8]).split(b"\0", 1)[0].decode("latin-1")
+        line += f"_TP2_{chr(data[0])}_{value}"
+    return line
+
+
+def format_tx_line(can_id, data):
+    """Builds the CAN_TX_OK_ line the firmware prints after a successful send"""
+    return f"CAN_TX_OK_{can_id:X}_" + "_".join(f"{b:X}" for b in data)
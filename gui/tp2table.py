@@ -0,0 +1,157 @@
+import heapq
+import threading
+import time
+
+TP2_GROUPS = 8
+STALE_AFTER = 3.0  # Seconds without updates before a row is shown as stale
+
+# Column of each angle type in the model rows (the fourth time is "any")
+ANGLE_COLUMNS = {'R': 0, 'C': 1, 'O': 2}
+ANY = 3
+
+EMPTY_CELLS = ('--', 'Never', '--', 'Never', '--', 'Never', 'Never')
+
+
+def format_elapsed(seconds):
+    """Elapsed time as shown in the table ("Now", "12s", "3m 4s", "1h 2m")"""
+    if seconds < 1:
+        return "Now"
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60}s"
+    return f"{seconds // 3600}h {(seconds % 3600) // 60}m"
+
+
+def until_text_changes(seconds):
+    """Seconds until format_elapsed(seconds) shows something different"""
+    if seconds < 3600:
+        return 1.0 - seconds % 1.0
+    return 60.0 - seconds % 60.0
+
+
+class TP2TableModel:
+    """Latest angle and monotonic update time per TP2 group and angle type.
+
+    update() is called for every frame from the reader thread and only marks
+    the group dirty; the Tk thread collects the dirty rows with take_dirty().
+    """
+
+    def __init__(self, groups=TP2_GROUPS):
+        self.groups = groups
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.values = [[None] * 3 for _ in range(self.groups)]
+            self.times = [[None] * 4 for _ in range(self.groups)]
+            self.dirty = set(range(self.groups))
+
+    def update(self, group, angle_type, value, now=None):
+        column = ANGLE_COLUMNS[angle_type]
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            self.values[group][column] = value
+            times = self.times[group]
+            times[column] = times[ANY] = now
+            self.dirty.add(group)
+
+    def take_dirty(self):
+        """Returns {group: (values, times)} for the groups updated since the last call"""
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+            return {group: (tuple(self.values[group]), tuple(self.times[group])) for group in dirty}
+
+
+class TP2TableView:
+    """Renders a TP2TableModel into a ttk.Treeview.
+
+    flush() runs once per UI frame: every row that changed in the model, or
+    whose elapsed times/stale state are due to change, is rendered and sent
+    to Tk with a single item() call, and only if its cells or tag differ from
+    what is displayed. Time-driven refreshes come from a heap of monotonic
+    deadlines, so idle rows cost nothing.
+    """
+
+    def __init__(self, tree, model, stale_after=STALE_AFTER):
+        self.tree = tree
+        self.model = model
+        self.stale_after = stale_after
+        self.item_ids = [tree.insert('', 'end', values=(group,) + EMPTY_CELLS, tags=('stale',))
+                         for group in range(model.groups)]
+        self.reset()
+
+    def reset(self):
+        groups = self.model.groups
+        self.rows = [None] * groups  # (values, times) last taken from the model
+        self.displayed = [None] * groups  # (cells, tag) shown in the tree; None = unknown
+        self.next_refresh = [None] * groups
+        self.deadlines = []  # Heap of (deadline, group); entries not in next_refresh are obsolete
+        self.item_calls = 0
+
+    def flush(self, now=None):
+        """Applies pending changes; returns the number of Tk item() calls made"""
+        if now is None:
+            now = time.monotonic()
+        due = set()
+        for group, row in self.model.take_dirty().items():
+            self.rows[group] = row
+            due.add(group)
+
+        deadlines = self.deadlines
+        while deadlines and deadlines[0][0] <= now:
+            deadline, group = heapq.heappop(deadlines)
+            if self.next_refresh[group] == deadline:
+                self.next_refresh[group] = None
+                due.add(group)
+
+        calls = 0
+        for group in due:
+            calls += self.render(group, now)
+        self.item_calls += calls
+        return calls
+
+    def render(self, group, now):
+        row = self.rows[group]
+        next_change = None
+        if row is None:
+            cells = (group,) + EMPTY_CELLS
+            tag = 'stale'
+        else:
+            values, times = row
+            cells = [group]
+            for column in range(3):
+                value, updated = values[column], times[column]
+                cells.append('--' if value is None else value + "°")
+                if updated is None:
+                    cells.append('Never')
+                    continue
+                cells.append(format_elapsed(now - updated))
+            last = times[ANY]
+            cells.append('Never' if last is None else format_elapsed(now - last))
+            cells = tuple(cells)
+
+            for updated in times:
+                if updated is not None:
+                    wait = until_text_changes(now - updated)
+                    next_change = wait if next_change is None else min(next_change, wait)
+            stale = last is None or now - last >= self.stale_after
+            tag = 'stale' if stale else 'active'
+            if not stale:
+                wait = last + self.stale_after - now
+                next_change = wait if next_change is None else min(next_change, wait)
+
+        if next_change is not None:
+            deadline = now + next_change
+            if self.next_refresh[group] is None or deadline < self.next_refresh[group]:
+                self.next_refresh[group] = deadline
+                heapq.heappush(self.deadlines, (deadline, group))
+
+        if self.displayed[group] == (cells, tag):
+            return 0
+        self.displayed[group] = (cells, tag)
+        self.tree.item(self.item_ids[group], values=cells, tags=(tag,))
+        return 1
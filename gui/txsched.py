@@ -0,0 +1,197 @@
+import heapq
+import itertools
+import math
+
+# TP2 transmission rules (tp2/assignment2025.txt), per group and angle type
+TP2_MAX_RATE = 20        # Packets per second when the angle keeps changing
+TP2_MIN_INTERVAL = 1.0 / TP2_MAX_RATE
+TP2_HEARTBEAT = 2.0      # Longest time without sending an angle
+TP2_MIN_CHANGE = 5       # Degrees that count as a change
+
+REASON_CHANGE = "≥5° change"
+REASON_HEARTBEAT = "2s timeout"
+REASON_PERIOD = "period"
+
+
+class TXStream:
+    """One scheduled transmission stream and its timing statistics.
+
+    TP2 streams (sample is a function of the loop time returning the angle)
+    are evaluated every `period` seconds, at most TP2_MAX_RATE times per
+    second, and send when the angle moved TP2_MIN_CHANGE degrees or after
+    TP2_HEARTBEAT seconds of silence. Periodic streams (sample=None) send on
+    every period. Deadlines are multiples of the period from the start, so
+    the schedule does not drift with load.
+    """
+
+    def __init__(self, key, on_send, period, sample=None):
+        self.key = key
+        # on_send(stream, value, reason), called in the loop thread; returns False if the frame was dropped
+        self.on_send = on_send
+        self.sample = sample
+        self.period = max(period, TP2_MIN_INTERVAL) if sample is not None else period
+        self.active = True
+        self.deadline = None
+        self.last_value = None
+        self.last_sent = None
+
+        # Statistics: frames sent and lateness of the evaluations (Welford)
+        self.started = None
+        self.sent = 0
+        self.evaluations = 0
+        self.late_mean = 0.0
+        self.late_m2 = 0.0
+        self.late_max = 0.0
+        self.skipped = 0  # Deadlines missed by more than a period
+        self.dropped = 0  # Sends refused by a full write queue
+
+    def evaluate(self, t):
+        """Returns (value, reason) if the stream has to send at its deadline t, else None"""
+        if self.sample is None:
+            return None, REASON_PERIOD
+        value = self.sample(t)
+        if self.last_sent is None or abs(value - self.last_value) >= TP2_MIN_CHANGE:
+            return value, REASON_CHANGE
+        if t - self.last_sent >= TP2_HEARTBEAT - 1e-6:
+            return value, REASON_HEARTBEAT
+        return None
+
+    def record_lateness(self, late):
+        self.evaluations += 1
+        delta = late - self.late_mean
+        self.late_mean += delta / self.evaluations
+        self.late_m2 += delta * (late - self.late_mean)
+        self.late_max = max(self.late_max, late)
+
+    @property
+    def jitter(self):
+        """Standard deviation of the evaluation lateness, in seconds"""
+        return math.sqrt(self.late_m2 / self.evaluations) if self.evaluations > 1 else 0.0
+
+    def rate(self, now):
+        """Frames per second achieved since the stream started"""
+        if self.started is None or now <= self.started:
+            return 0.0
+        return self.sent / (now - self.started)
+
+
+class TXScheduler:
+    """Deadline scheduler for transmission streams, running on an IOEngine loop.
+
+    A heap holds the next deadline of every stream and a single loop timer
+    is armed for the earliest one, so nothing runs between due frames no
+    matter how many streams there are. add()/remove() may be called from any
+    thread. A stream whose sample or on_send raises is stopped and reported
+    to on_error; the others keep running.
+    """
+
+    def __init__(self, engine, on_error=None):
+        self.engine = engine
+        self.on_error = on_error  # Called from the loop thread with (stream, exception)
+        self.streams = {}
+        self.heap = []  # (deadline, tie breaker, stream)
+        self.counter = itertools.count()
+        self.timer = None
+        self.timer_deadline = None
+
+    def add(self, stream):
+        """Starts a stream (replacing one with the same key); its first deadline is now"""
+        self.engine.call_soon(self._add, stream)
+
+    def remove(self, key):
+        self.engine.call_soon(self._remove, key)
+
+    def clear(self):
+        self.engine.call_soon(self._clear)
+
+    def _add(self, stream):
+        self._remove(stream.key)
+        now = self.engine.loop.time()
+        stream.started = stream.deadline = now
+        self.streams[stream.key] = stream
+        self._push(stream)
+
+    def _remove(self, key):
+        stream = self.streams.pop(key, None)
+        if stream is not None:
+            stream.active = False
+
+    def _clear(self):
+        for key in list(self.streams):
+            self._remove(key)
+
+    def _push(self, stream):
+        heapq.heappush(self.heap, (stream.deadline, next(self.counter), stream))
+        self._arm()
+
+    def _arm(self):
+        """Arms the loop timer for the earliest pending deadline"""
+        heap = self.heap
+        while heap and not heap[0][2].active:
+            heapq.heappop(heap)
+        deadline = heap[0][0] if heap else None
+        if deadline == self.timer_deadline:
+            return
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer_deadline = deadline
+        self.timer = self.engine.loop.call_at(deadline, self._run) if deadline is not None else None
+
+    def _run(self):
+        loop = self.engine.loop
+        self.timer = self.timer_deadline = None
+        heap = self.heap
+        now = loop.time()
+        try:
+            while heap and heap[0][0] <= now:
+                deadline, _, stream = heapq.heappop(heap)
+                if not stream.active:
+                    continue
+                stream.record_lateness(now - deadline)
+                try:
+                    self._fire(stream, deadline)
+                except Exception as e:
+                    self._fail(stream, e)
+                    continue
+                self._reschedule(stream, deadline, now)
+                now = loop.time()
+        finally:
+            self._arm()
+
+    def _fire(self, stream, deadline):
+        # Rules and values use the deadline, so late evaluations do not shift the schedule
+        decision = stream.evaluate(deadline)
+        if decision is not None:
+            value, reason = decision
+            if stream.on_send(stream, value, reason) is False:
+                # Dropped by the port writer: the next evaluation tries again
+                stream.dropped += 1
+            else:
+                stream.last_sent = deadline
+                if value is not None:
+                    stream.last_value = value
+                stream.sent += 1
+
+    def _fail(self, stream, error):
+        """Stops a stream whose sample or send raised"""
+        if self.streams.get(stream.key) is stream:
+            del self.streams[stream.key]
+        stream.active = False
+        if self.on_error:
+            self.on_error(stream, error)
+
+    def _reschedule(self, stream, deadline, now):
+        stream.deadline = deadline + stream.period
+        if stream.deadline <= now:
+            # More than a period late: skip the missed slots instead of bursting
+            missed = int((now - stream.deadline) / stream.period) + 1
+            stream.skipped += missed
+            stream.deadline += missed * stream.period
+        if stream.active:
+            heapq.heappush(self.heap, (stream.deadline, next(self.counter), stream))
+
+    def stats(self):
+        """Returns [(key, frames/s, sent, mean lateness, jitter, max lateness)], times in seconds"""
+        now = self.engine.loop.time()
+        return [(key, stream.rate(now), stream.sent, stream.late_mean, stream.jitter, stream.late_max)
+                for key, stream in list(self.streams.items())]
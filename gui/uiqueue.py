@@ -0,0 +1,63 @@
+import time
+from collections import deque
+
+
+class UIUpdateQueue:
+    """Thread-safe queue of log records drained in batches by the Tk thread.
+
+    Reader and transmission threads push records with push(); a single periodic
+    Tk callback calls drain() and inserts everything pending at once. deque
+    append/popleft are atomic in CPython, so no extra lock is needed.
+    """
+
+    def __init__(self, max_batch=5000):
+        self._items = deque()
+        self.max_batch = max_batch  # Upper bound of records handled per drain
+
+        # Statistics (written only by the draining thread)
+        self.drained_total = 0
+        self.max_depth = 0
+        self.last_batch_size = 0
+        self.last_latency = 0.0  # Age of the oldest record in the last drain (s)
+        self.max_latency = 0.0
+
+    def push(self, timestamp, text, tag):
+        """Queues one log line (callable from any thread)"""
+        self._items.append((time.monotonic(), timestamp, text, tag))
+
+    def push_many(self, records):
+        """Queues several (timestamp, text, tag) records with a single enqueue time"""
+        now = time.monotonic()
+        self._items.extend((now, timestamp, text, tag) for timestamp, text, tag in records)
+
+    def depth(self):
+        """Number of records waiting to be drained"""
+        return len(self._items)
+
+    def drain(self):
+        """Pops up to max_batch pending records and returns them as (timestamp, text, tag)"""
+        items = self._items
+        pending = len(items)
+        if pending > self.max_depth:
+            self.max_depth = pending
+        if not pending:
+            self.last_batch_size = 0
+            self.last_latency = 0.0
+            return []
+
+        count = min(pending, self.max_batch)
+        popleft = items.popleft
+        batch = [popleft() for _ in range(count)]
+
+        latency = time.monotonic() - batch[0][0]
+        self.last_latency = latency
+        if latency > self.max_latency:
+            self.max_latency = latency
+        self.last_batch_size = count
+        self.drained_total += count
+        return [(timestamp, text, tag) for _, timestamp, text, tag in batch]
+
+    def reset_stats(self):
+        """Clears the peak depth/latency counters"""
+        self.max_depth = 0
+        self.max_latency = 0.0